@@ -143,6 +143,48 @@ CACHES = {
 }
 
 
+# Dedup Bloom filter (repo.utils.dedup), sized for the expected number of stored games + identities.
+# Changing either value starts a new empty filter: run `manage.py rebuild_dedup_filter` afterwards.
+DEDUP_BLOOM_CAPACITY = config('DEDUP_BLOOM_CAPACITY', default=10_000_000, cast=int)
+DEDUP_BLOOM_ERROR_RATE = config('DEDUP_BLOOM_ERROR_RATE', default=0.01, cast=float)
+
+
+# Player profile enrichment (repo.utils.enrichment / manage.py enrich_players)
+PLAYER_ENRICHMENT_WORKERS = config('PLAYER_ENRICHMENT_WORKERS', default=4, cast=int)
+# Enriched profiles are refreshed after this many days
+PLAYER_ENRICHMENT_TTL_DAYS = config('PLAYER_ENRICHMENT_TTL_DAYS', default=30, cast=int)
+# Profiles that were not found are not asked for again before this many days
+PLAYER_ENRICHMENT_NEGATIVE_TTL_DAYS = config('PLAYER_ENRICHMENT_NEGATIVE_TTL_DAYS', default=7, cast=int)
+
+
+# Lichess broadcast ingestion (repo.utils.lichess.ledger)
+# Rounds finished less than this many hours ago are fetched again on every run, for games finished or relayed late
+LICHESS_ROUND_RECHECK_HOURS = config('LICHESS_ROUND_RECHECK_HOURS', default=6, cast=int)
+# The broadcast scan stops after this many consecutive fully ingested tours
+LICHESS_BROADCAST_STOP_AFTER = config('LICHESS_BROADCAST_STOP_AFTER', default=5, cast=int)
+
+
+# Chess.com API budget, shared by every request of the process (repo.utils.chesscom.api)
+CHESSCOM_REQUESTS_PER_SECOND = config('CHESSCOM_REQUESTS_PER_SECOND', default=5.0, cast=float)
+# Players whose archives are downloaded in parallel by manage.py sync_chesscom_players
+CHESSCOM_SYNC_WORKERS = config('CHESSCOM_SYNC_WORKERS', default=4, cast=int)
+# Page cache of the chess.com players crawler (manage.py crawl_chesscom_players)
+CHESSCOM_CRAWLER_CACHE_DIR = config('CHESSCOM_CRAWLER_CACHE_DIR', default=str(BASE_DIR / '.cache' / 'chesscom_crawler'))
+
+
+# Postgres partitioning of the games table (repo.utils.partitioning / manage.py partition_games):
+# monthly partitions go back at most this many months, older games stay in the default partition
+GAMES_PARTITION_MONTHS_BACK = config('GAMES_PARTITION_MONTHS_BACK', default=24, cast=int)
+
+
+# Raw archive of fetched PGN payloads (repo.utils.raw_archive / manage.py replay_raw_archive)
+# Off by default: every fetch of a changed payload is kept, which grows without bound unless pruned
+RAW_ARCHIVE_ENABLED = config('RAW_ARCHIVE_ENABLED', default=False, cast=bool)
+RAW_ARCHIVE_DIR = config('RAW_ARCHIVE_DIR', default=str(BASE_DIR / 'raw_archive'))
+# Fetches older than this many days are deleted by manage.py prune_raw_archive (0: kept forever)
+RAW_ARCHIVE_RETENTION_DAYS = config('RAW_ARCHIVE_RETENTION_DAYS', default=30, cast=int)
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,70 @@
+import io
+import chess.pgn
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from repo.models import Game
+from repo.utils.compact_pgn import PGN_COLUMNS
+from repo.utils.dedup import canonical_key, commit_seen
+from repo.utils.pgn import generate_canonical_hash, generate_move_key
+
+
+class Command(BaseCommand):
+    help = "Computes canonical_hash for stored games that do not have one yet (or all games), in id-ordered batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Games read and updated per batch.")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many games.")
+        parser.add_argument('--recompute', action='store_true', help="Recompute the hash of every game, e.g. after its definition changed.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        limit = options['limit']
+        last_id = 0
+        processed = 0
+        updated = 0
+
+        while limit is None or processed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            # keyset pagination: cheap on any table size, unlike OFFSET
+            games = Game.objects.filter(id__gt=last_id)
+            if not options['recompute']:
+                games = games.filter(canonical_hash__isnull=True)
+            batch = list(
+                games.select_related('pgn_data', 'white', 'black')
+                .order_by('id')
+                .only('id', 'result', 'canonical_hash', 'white', 'black', 'white__name', 'black__name', *PGN_COLUMNS)[:size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            processed += len(batch)
+
+            changed = []
+            for game in batch:
+                try:
+                    parsed = chess.pgn.read_game(io.StringIO(game.pgn_text))
+                except Exception as e:
+                    continue
+                if parsed is None:
+                    continue
+                canonical_hash = generate_canonical_hash(generate_move_key(parsed), parsed.headers, game.white, game.black)
+                if canonical_hash and canonical_hash != game.canonical_hash:
+                    game.canonical_hash = canonical_hash
+                    changed.append(game)
+
+            Game.objects.bulk_update(changed, ['canonical_hash'])
+            # like at ingest, a live game's hash is only marked seen once the game is finished
+            commit_seen(canonical_key(game.canonical_hash) for game in changed if game.result != '*')
+            updated += len(changed)
+            self.stdout.write(f"Processed {processed} games (up to id {last_id}), {updated} hashed")
+
+        duplicates = (
+            Game.objects.exclude(canonical_hash__isnull=True)
+            .values('canonical_hash')
+            .annotate(rows=Count('id'))
+            .filter(rows__gt=1)
+            .count()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {updated} of {processed} games hashed. {duplicates} canonical hashes are shared by more than one stored game."
+        ))
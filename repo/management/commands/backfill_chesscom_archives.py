@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.chesscom.api import CHESSCOM_API
+from repo.utils.chesscom.sync import DEFAULT_PLAYERS_FILE, backfill_players, tracked_chesscom_usernames
+from repo.utils.http import RateLimiter
+
+
+class Command(BaseCommand):
+    help = "Ingests the past monthly chess.com archives of tracked players. Interrupted runs resume where they stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help="Chess.com usernames (default: every tracked player).")
+        parser.add_argument('--players-file', nargs='?', const=str(DEFAULT_PLAYERS_FILE), default=None,
+                            help="Read usernames from a players JSON file (data/players.json if no path is given) instead of the Player table.")
+        parser.add_argument('--since', default=None, help="Oldest month to ingest, as YYYY-MM.")
+        parser.add_argument('--workers', type=int, default=None, help="Concurrent archive downloads (default: CHESSCOM_SYNC_WORKERS).")
+        parser.add_argument('--rps', type=float, default=None, help="Requests per second budget (default: CHESSCOM_REQUESTS_PER_SECOND).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                year, month = map(int, options['since'].split('-'))
+            except ValueError:
+                raise CommandError("--since must be given as YYYY-MM")
+            since = (year, month)
+        if options['rps']:
+            CHESSCOM_API.http.rate_limiter = RateLimiter(options['rps'])
+
+        usernames = options['usernames'] or tracked_chesscom_usernames(options['players_file'])
+        self.stdout.write(f"Backfilling {len(usernames)} chess.com players")
+
+        started = time.monotonic()
+        statuses, counts = backfill_players(usernames, self.stdout, since=since, max_workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{statuses['fetched']} archives fetched, {statuses['not_modified']} unchanged, {statuses['completed']} already done, "
+            f"{statuses['failed']} failed, {statuses['no_archive_list']} players without archive list "
+            f"in {time.monotonic() - started:.1f}s: {counts['created']} games created, {counts['updated']} updated, "
+            f"{counts['skipped']} skipped, {counts['error']} errors"
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from repo.models import Game
+from repo.utils.feed import invalidate_daily_feeds
+from repo.utils.pgn import rating_fields
+
+RATING_FIELDS = ['white_rating', 'black_rating', 'combined_rating']
+
+
+class Command(BaseCommand):
+    help = "Fills the integer rating columns of stored games from their Elo headers, in id-ordered batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Games read and updated per batch.")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many games.")
+        parser.add_argument('--all', action='store_true', help="Recompute every game, not only those without a combined rating.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        limit = options['limit']
+        last_id = 0
+        processed = 0
+
+        games = Game.objects.all() if options['all'] else Game.objects.filter(combined_rating__isnull=True)
+        while limit is None or processed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            # keyset pagination: cheap on any table size, unlike OFFSET
+            batch = list(
+                games.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'date', 'whiteelo', 'blackelo')[:size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            processed += len(batch)
+
+            for game in batch:
+                for field, value in rating_fields(game.whiteelo, game.blackelo).items():
+                    setattr(game, field, value)
+            Game.objects.bulk_update(batch, RATING_FIELDS)
+            # the stored daily feeds are ordered by combined rating
+            invalidate_daily_feeds({game.date for game in batch if game.date})
+            self.stdout.write(f"Processed {processed} games (up to id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: ratings filled for {processed} games."))
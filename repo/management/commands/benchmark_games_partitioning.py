@@ -0,0 +1,87 @@
+import datetime
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from repo.utils.partitioning import add_months, is_postgres
+
+PLAIN_TABLE = 'benchmark_games_plain'
+PARTITIONED_TABLE = 'benchmark_games_partitioned'
+# Roughly the width of a games row without its PGN (see GamePgn)
+COLUMNS = "id bigint NOT NULL, date date, combined_rating integer, tournament varchar(255), padding text"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares single-day queries and month retention on a plain and a monthly partitioned copy of a "
+        "synthetic games table (Postgres only, scratch tables are dropped afterwards unless --keep)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help="Rows in each table.")
+        parser.add_argument('--months', type=int, default=36, help="Months the rows are spread over.")
+        parser.add_argument('--queries', type=int, default=200, help="Single-day queries per table.")
+        parser.add_argument('--keep', action='store_true', help="Keep the scratch tables (and skip the retention comparison).")
+
+    def _timed(self, cursor, sql, params=None) -> float:
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        if cursor.description:
+            cursor.fetchall()
+        return time.perf_counter() - started
+
+    def _create_tables(self, cursor, rows, first_month, months):
+        days = (add_months(first_month, months) - first_month).days
+        cursor.execute(f"DROP TABLE IF EXISTS {PLAIN_TABLE}, {PARTITIONED_TABLE}")
+        cursor.execute(f"CREATE TABLE {PLAIN_TABLE} ({COLUMNS})")
+        cursor.execute(f"CREATE TABLE {PARTITIONED_TABLE} ({COLUMNS}) PARTITION BY RANGE (date)")
+        for month in range(months):
+            start = add_months(first_month, month)
+            cursor.execute(
+                f"CREATE TABLE {PARTITIONED_TABLE}_{start:%Y%m} PARTITION OF {PARTITIONED_TABLE} "
+                f"FOR VALUES FROM ('{start}') TO ('{add_months(start, 1)}')"
+            )
+        for table in (PLAIN_TABLE, PARTITIONED_TABLE):
+            elapsed = self._timed(
+                cursor,
+                f"INSERT INTO {table} SELECT n, %s::date + (n %% %s)::integer, (random() * 5000)::integer, "
+                f"'tournament ' || (n %% 500), repeat(md5(n::text), 4) FROM generate_series(1, %s) AS n",
+                [first_month, days, rows],
+            )
+            self.stdout.write(f"Filled {table} with {rows:,} rows in {elapsed:.1f}s")
+            cursor.execute(f"CREATE INDEX ON {table} (date, combined_rating DESC NULLS LAST)")
+            cursor.execute(f"ANALYZE {table}")
+        return days
+
+    def handle(self, *args, **options):
+        if not is_postgres():
+            raise CommandError("The partitioning benchmark needs PostgreSQL.")
+        rows, months = options['rows'], options['months']
+        first_month = add_months(datetime.date.today().replace(day=1), -months + 1)
+
+        with connection.cursor() as cursor:
+            days = self._create_tables(cursor, rows, first_month, months)
+            sample_days = [first_month + datetime.timedelta(days=random.randrange(days)) for _ in range(options['queries'])]
+            # the index page query: one day, strongest games first
+            query = "SELECT id, combined_rating, tournament FROM {table} WHERE date = %s ORDER BY combined_rating DESC NULLS LAST"
+
+            for table in (PLAIN_TABLE, PARTITIONED_TABLE):
+                self._timed(cursor, query.format(table=table), [sample_days[0]])  # warm up
+                timings = sorted(self._timed(cursor, query.format(table=table), [day]) * 1000 for day in sample_days)
+                cursor.execute("EXPLAIN " + query.format(table=table), [sample_days[0]])
+                plan = [row[0] for row in cursor.fetchall()]
+                scanned = sum(1 for line in plan if ' on ' in line and 'Scan' in line)
+                self.stdout.write(
+                    f"{table}: median {statistics.median(timings):.2f} ms, "
+                    f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, {scanned} relation(s) scanned per query"
+                )
+
+            if options['keep']:
+                return
+            # retention: dropping the oldest month of games
+            cutoff = add_months(first_month, 1)
+            delete_time = self._timed(cursor, f"DELETE FROM {PLAIN_TABLE} WHERE date < %s", [cutoff])
+            detach_time = self._timed(cursor, f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {PARTITIONED_TABLE}_{first_month:%Y%m}")
+            self.stdout.write(f"Removing the oldest month: DELETE {delete_time * 1000:.0f} ms, DETACH PARTITION {detach_time * 1000:.0f} ms")
+            cursor.execute(f"DROP TABLE IF EXISTS {PLAIN_TABLE}, {PARTITIONED_TABLE}, {PARTITIONED_TABLE}_{first_month:%Y%m}")
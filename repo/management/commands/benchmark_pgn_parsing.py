@@ -0,0 +1,50 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.pgn import DEDUP_BATCH_SIZE, iter_parsed_batches, iter_pgn_texts
+
+
+class Command(BaseCommand):
+    help = "Measures PGN parsing throughput (no cache or database work) for several process counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="PGN file.")
+        parser.add_argument('--workers', default=None, help="Comma separated process counts (default: 1, 2, 4, ... up to the CPU count).")
+        parser.add_argument('--repeat', type=int, default=1, help="Parse the file's games this many times per run, for a larger sample.")
+        parser.add_argument('--batch-size', type=int, default=DEDUP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f"{options['path']} does not exist")
+        if options['workers']:
+            worker_counts = [int(count) for count in options['workers'].split(',')]
+        else:
+            cpu_count = os.cpu_count() or 1
+            worker_counts = [count for count in (1, 2, 4, 8, 16, 32) if count < cpu_count] + [cpu_count]
+
+        with open(options['path'], 'rb') as pgn_file:
+            game_texts = [game_text.rstrip('\n') + '\n\n' for game_text in iter_pgn_texts(pgn_file)] * options['repeat']
+        batch_size = options['batch_size']
+        self.stdout.write(f"{len(game_texts)} games, batches of {batch_size}")
+
+        baseline = None
+        baseline_hashes = None
+        for workers in worker_counts:
+            started = time.perf_counter()
+            hashes = [
+                parsed_game.pgn_hash
+                for batch in iter_parsed_batches(iter(game_texts), batch_size=batch_size, workers=workers)
+                for _, parsed_game in batch
+            ]
+            elapsed = time.perf_counter() - started
+            parsed = len(hashes)
+            # every process count must produce the same games, in the same order
+            baseline_hashes = baseline_hashes or hashes
+            if hashes != baseline_hashes:
+                raise CommandError(f"{workers} processes parsed different games than {worker_counts[0]}")
+            rate = parsed / elapsed if elapsed else 0
+            baseline = baseline or rate
+            self.stdout.write(
+                f"{workers:>3} processes: {parsed} games in {elapsed:.2f}s, {rate:,.0f} games/s, "
+                f"{rate / baseline:.2f}x (ideal {workers / worker_counts[0]:.0f}x)"
+            )
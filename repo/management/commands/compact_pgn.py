@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from repo.models import GamePgn
+from repo.utils.compact_pgn import COMPACT_FIELDS, PGN_FIELDS, compact_size, decode_pgn, encode_pgn
+
+
+class Command(BaseCommand):
+    help = "Converts stored PGN text to the compact move/clock encoding in id-ordered batches (or back with --expand)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Games read and updated per batch.")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many games.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report the size that would be saved.")
+        parser.add_argument('--expand', action='store_true', help="Turn compact games back into PGN text.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        limit = options['limit']
+        last_id = 0
+        processed = converted = 0
+        text_bytes = compact_bytes = 0
+
+        if options['expand']:
+            pgns = GamePgn.objects.filter(pgn_moves__isnull=False)
+        else:
+            pgns = GamePgn.objects.filter(pgn_moves__isnull=True).exclude(pgn='')
+        pgns = pgns.only('game_id', *PGN_FIELDS)
+
+        while limit is None or processed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            # keyset pagination: cheap on any table size, unlike OFFSET
+            batch = list(pgns.filter(game_id__gt=last_id).order_by('game_id')[:size])
+            if not batch:
+                break
+            last_id = batch[-1].game_id
+            processed += len(batch)
+
+            changed = []
+            for pgn_data in batch:
+                if options['expand']:
+                    pgn_data.pgn = decode_pgn(pgn_data.pgn_moves, pgn_data.pgn_clocks, pgn_data.pgn_layout)
+                    pgn_data.pgn_moves = pgn_data.pgn_clocks = pgn_data.pgn_layout = None
+                    changed.append(pgn_data)
+                    continue
+                encoded = encode_pgn(pgn_data.pgn)
+                if encoded is None:
+                    continue
+                text_bytes += len(pgn_data.pgn.encode('utf-8'))
+                compact_bytes += compact_size(*encoded)
+                pgn_data.pgn_moves, pgn_data.pgn_clocks, pgn_data.pgn_layout = encoded
+                pgn_data.pgn = ''
+                changed.append(pgn_data)
+
+            if not options['dry_run']:
+                GamePgn.objects.bulk_update(changed, ['pgn', *COMPACT_FIELDS])
+            converted += len(changed)
+            self.stdout.write(f"Processed {processed} games (up to id {last_id}), {converted} converted")
+
+        if options['expand']:
+            self.stdout.write(self.style.SUCCESS(f"Done: {converted} games expanded back to PGN text."))
+            return
+        saved = text_bytes - compact_bytes
+        ratio = compact_bytes / text_bytes if text_bytes else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {converted} of {processed} games {'would be ' if options['dry_run'] else ''}converted "
+            f"({processed - converted} kept as text). PGN {text_bytes:,} bytes -> {compact_bytes:,} bytes compact, "
+            f"{saved:,} bytes saved ({ratio:.1%} of the original size)."
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from repo.utils.chesscom.crawler import CHESSCOM_CRAWLER
+
+
+class Command(BaseCommand):
+    help = "Crawls the chess.com titled players listing into the Player table (and optionally data/players.json)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=None, help=f"Listing pages to crawl (default: {CHESSCOM_CRAWLER.MAX_PAGES}).")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent requests to chess.com.")
+        parser.add_argument('--rps', type=float, default=2.0, help="Requests per second.")
+        parser.add_argument('--write-json', action='store_true', help="Also write the crawled list to the players JSON file.")
+        parser.add_argument('--output', default=None, help="Players JSON file (default: data/players.json).")
+
+    def handle(self, *args, **options):
+        crawler = CHESSCOM_CRAWLER(max_pages=options['pages'], workers=options['workers'], requests_per_second=options['rps'])
+        counts = crawler.main(output_file=options['output'], write_json=options['write_json'])
+        self.stdout.write(self.style.SUCCESS(f"{counts['created']} players created, {counts['updated']} updated"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.partitioning import ensure_partitions, is_partitioned, is_postgres
+
+
+class Command(BaseCommand):
+    help = "Creates the monthly partitions of the games table up to some months ahead (run it daily, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help="Create partitions up to this many months from now.")
+
+    def handle(self, *args, **options):
+        if not is_postgres() or not is_partitioned():
+            raise CommandError("The games table is not partitioned (see partition_games).")
+        created = ensure_partitions(options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {len(created)} partitions created{': ' + ', '.join(created) if created else ''}."
+        ))
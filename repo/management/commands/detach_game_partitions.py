@@ -0,0 +1,31 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.partitioning import detach_partitions_before, is_partitioned, is_postgres, list_partitions, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Detaches (archives) the monthly partitions of the games table before a month, instead of deleting "
+        "their rows. The PGNs of their games move to a <partition>_pgns table next to each one. Run rebuild_tournaments afterwards to drop their games from the tournament counters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help="First month to keep, as YYYY-MM.")
+        parser.add_argument('--drop', action='store_true', help="Drop the detached partitions and the PGNs of their games.")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the partitions that would be detached.")
+
+    def handle(self, *args, **options):
+        if not is_postgres() or not is_partitioned():
+            raise CommandError("The games table is not partitioned (see partition_games).")
+        try:
+            cutoff = datetime.datetime.strptime(options['before'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError("--before must be given as YYYY-MM")
+
+        if options['dry_run']:
+            names = [name for name, first_of_month in list_partitions() if first_of_month < month_start(cutoff)]
+            self.stdout.write(f"Would detach {len(names)} partitions: {', '.join(names) or '-'}")
+            return
+        detached = detach_partitions_before(cutoff, drop=options['drop'])
+        action = 'dropped' if options['drop'] else 'detached'
+        self.stdout.write(self.style.SUCCESS(f"Done: {len(detached)} partitions {action}: {', '.join(detached) or '-'}."))
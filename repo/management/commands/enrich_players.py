@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from repo.utils.enrichment import enrich_players
+
+
+class Command(BaseCommand):
+    help = "Fetches chess.com / FIDE profiles for players flagged needs_enrichment or due for a refresh."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help="Players processed per run.")
+        parser.add_argument('--workers', type=int, default=None, help="Concurrent profile requests (default: PLAYER_ENRICHMENT_WORKERS).")
+        parser.add_argument('--loop', action='store_true', help="Keep running as a background worker.")
+        parser.add_argument('--interval', type=int, default=60, help="Seconds to sleep between runs when the queue is empty or a run enriched nobody (with --loop).")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = enrich_players(limit=options['limit'], workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Enriched {counts['enriched']} players, {counts['missing']} not found, "
+                f"{counts['cached_miss']} skipped (known missing), {counts['error']} errors"
+            ))
+            if not options['loop']:
+                break
+            # a full run of misses and errors would otherwise be retried without a pause
+            if counts['enriched'] == 0 or sum(counts.values()) < options['limit']:
+                time.sleep(options['interval'])
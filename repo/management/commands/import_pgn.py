@@ -0,0 +1,27 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.ingest import ingest_pgn
+
+
+class Command(BaseCommand):
+    help = "Ingests the games of a PGN file, streaming it in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="PGN file.")
+        parser.add_argument('--source', choices=['chesscom', 'lichess'], required=True)
+        parser.add_argument('--tournament', default=None, help="Tournament name for lichess games (default: the Event header).")
+        parser.add_argument('--parse-workers', type=int, default=None, help="Parse in this many processes (default: in this process).")
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f"{options['path']} does not exist")
+        with open(options['path'], 'rb') as pgn_file:
+            counts = ingest_pgn(
+                pgn_file, options['source'], self.stdout,
+                tournament_name=options['tournament'],
+                source_info=options['path'],
+                parse_workers=options['parse_workers'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['path']}: {counts['created']} games created, {counts['updated']} updated, {counts['skipped']} skipped, {counts['error']} errors"
+        ))
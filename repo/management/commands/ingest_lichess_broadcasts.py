@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from repo.utils.ingest import ingest_lichess_broadcasts
+
+
+class Command(BaseCommand):
+    help = "Fetches newly finished lichess broadcast rounds (per the round ledger) in parallel and saves their new games."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Round PGNs downloaded concurrently.")
+        parser.add_argument('--full-scan', action='store_true', help="Walk the whole broadcast list instead of stopping at already ingested tours.")
+        parser.add_argument('--parse-processes', type=int, default=0, help="Parse in this many processes (default: on the pipeline's parse thread).")
+
+    def handle(self, *args, **options):
+        counts = ingest_lichess_broadcasts(self.stdout, max_workers=options['workers'], full_scan=options['full_scan'], parse_processes=options['parse_processes'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Lichess broadcasts: {counts['created']} games created, {counts['updated']} updated, {counts['skipped']} skipped, {counts['error']} errors"
+        ))
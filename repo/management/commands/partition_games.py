@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.partitioning import convert_games_table, is_postgres
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts the games table to a Postgres table partitioned by month of date (Postgres 15+). "
+        "Stop ingestion first; an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000, help="Rows copied per transaction.")
+        parser.add_argument('--months-ahead', type=int, default=3, help="Also create the partitions of this many future months.")
+        parser.add_argument('--drop-old', action='store_true', help="Drop the original table once every row is copied.")
+
+    def handle(self, *args, **options):
+        if not is_postgres():
+            raise CommandError("Partitioning the games table needs PostgreSQL.")
+        try:
+            counts = convert_games_table(
+                self.stdout,
+                batch_size=options['batch_size'],
+                months_ahead=options['months_ahead'],
+                drop_old=options['drop_old'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {counts['copied']} games copied, {counts['partitions']} partitions created."
+        ))
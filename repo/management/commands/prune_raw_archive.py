@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from repo.utils.raw_archive import prune_raw_archive
+
+
+class Command(BaseCommand):
+    help = "Deletes archived fetches older than the retention period, and the payloads no longer referenced (run it daily, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Keep this many days of fetches (default: RAW_ARCHIVE_RETENTION_DAYS).")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted.")
+
+    def handle(self, *args, **options):
+        counts = prune_raw_archive(options['days'], dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {counts['fetches']} fetches and {counts['payloads']} payloads ({counts['bytes']:,} bytes) "
+            f"{'would be ' if options['dry_run'] else ''}deleted."
+        ))
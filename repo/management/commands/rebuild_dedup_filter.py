@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.dedup import get_bloom_filter, iter_stored_keys
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the Redis dedup Bloom filter from every pgn hash and identity in the games table (e.g. after a Redis flush)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Rows streamed from the database and keys sent to Redis per round trip.")
+
+    def handle(self, *args, **options):
+        bloom = get_bloom_filter()
+        if bloom is None:
+            raise CommandError("The default cache is not Redis (django-redis), there is no Bloom filter to rebuild.")
+
+        self.stdout.write(
+            f"Rebuilding {bloom.key}: {bloom.size} bits ({bloom.size / 8 / 1024 / 1024:.1f} MiB), "
+            f"{bloom.hash_count} hashes, capacity {bloom.capacity} at {bloom.error_rate:.2%} false positives"
+        )
+        total = bloom.rebuild(iter_stored_keys(options['chunk_size']), batch_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {total} keys, estimated false-positive rate now {bloom.estimated_error_rate(total):.4%}"
+        ))
+        if total > bloom.capacity:
+            self.stdout.write(self.style.WARNING(
+                "The filter holds more keys than its capacity, raise DEDUP_BLOOM_CAPACITY and rebuild."
+            ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from repo.models import Game, Tournament
+from repo.utils.feed import invalidate_daily_feeds
+from repo.utils.tournaments import COUNTER_FIELDS, link_tournaments, record_tournament_games
+
+
+class Command(BaseCommand):
+    help = "Links every stored game to its Tournament and recomputes all tournament counters from scratch, in id-ordered batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Games read and updated per batch.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        processed = 0
+
+        with transaction.atomic():
+            Tournament.players.through.objects.all().delete()
+            Tournament.objects.update(**dict.fromkeys(COUNTER_FIELDS, 0))
+
+        while True:
+            # keyset pagination: cheap on any table size, unlike OFFSET
+            batch = list(
+                Game.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'tournament', 'tournament_url', 'date', 'tournament_group', 'white', 'black', 'white_rating', 'black_rating')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            processed += len(batch)
+
+            with transaction.atomic():
+                link_tournaments(batch)
+                Game.objects.bulk_update(batch, ['tournament_group'])
+                record_tournament_games(batch)
+            self.stdout.write(f"Processed {processed} games (up to id {last_id})")
+
+        # tournaments whose games are all gone
+        deleted, _ = Tournament.objects.filter(game_count=0).delete()
+        # every stored daily feed was ordered with the old strengths
+        invalidate_daily_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {processed} games linked to {Tournament.objects.count()} tournaments ({deleted} empty tournaments removed)."
+        ))
@@ -0,0 +1,39 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from repo.utils.ingest import replay_raw_archive
+
+
+def _parse_date(value):
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Re-ingests archived PGN payloads from the raw archive, without any network access."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['chesscom', 'lichess'], default=None)
+        parser.add_argument('--since', default=None, help="Only payloads fetched on or after this date (YYYY-MM-DD).")
+        parser.add_argument('--until', default=None, help="Only payloads fetched before this date (YYYY-MM-DD).")
+        parser.add_argument('--all-fetches', action='store_true', help="Replay every fetch of a URL, not only the latest one.")
+        parser.add_argument('--read-workers', type=int, default=2, help="Payloads read from disk concurrently.")
+        parser.add_argument('--parse-processes', type=int, default=0, help="Parse in this many processes (default: on the pipeline's parse thread).")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = replay_raw_archive(
+            self.stdout,
+            source=options['source'],
+            since=_parse_date(options['since']) if options['since'] else None,
+            until=_parse_date(options['until']) if options['until'] else None,
+            latest_only=not options['all_fetches'],
+            read_workers=options['read_workers'],
+            parse_processes=options['parse_processes'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed in {time.monotonic() - started:.1f}s: {counts['created']} games created, {counts['updated']} updated, "
+            f"{counts['skipped']} skipped, {counts['error']} errors"
+        ))
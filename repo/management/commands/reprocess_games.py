@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from repo.utils.reprocess import REPROCESS_FIELDS, reprocess_games
+
+
+class Command(BaseCommand):
+    help = f"Re-derives {', '.join(REPROCESS_FIELDS)} of every stored game from its PGN and saves the rows that changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Games read and updated per chunk.")
+        parser.add_argument('--processes', type=int, default=0, help="Derive in this many processes (default: in this process).")
+        parser.add_argument('--resume', action='store_true', help="Start after the last chunk written by an interrupted run.")
+        parser.add_argument('--after-id', type=int, default=0, help="Start after this game id.")
+
+    def handle(self, *args, **options):
+        counts = reprocess_games(
+            self.stdout,
+            chunk_size=options['chunk_size'],
+            processes=options['processes'],
+            resume=options['resume'],
+            after_id=options['after_id'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {counts['updated']} of {counts['processed']} games updated (up to id {counts['last_id']})."
+        ))
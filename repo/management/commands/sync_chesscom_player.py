@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from repo.utils.chesscom.sync import sync_player_current_month, sync_player_month
+
+
+class Command(BaseCommand):
+    help = "Incrementally ingests a chess.com player's monthly archive (current month by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="Chess.com username.")
+        parser.add_argument('--year', type=int, default=None)
+        parser.add_argument('--month', type=int, default=None)
+
+    def handle(self, *args, **options):
+        username = options['username']
+        if options['year'] and options['month']:
+            status, counts = sync_player_month(username, options['year'], options['month'], self.stdout)
+        else:
+            status, counts = sync_player_current_month(username, self.stdout)
+
+        if status == 'not_modified':
+            self.stdout.write(f"{username}: archive unchanged since the last fetch")
+        elif status == 'failed':
+            self.stdout.write(self.style.ERROR(f"{username}: archive could not be fetched"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{username}: {counts['created']} games created, {counts['updated']} updated, {counts['skipped']} skipped, {counts['error']} errors"
+            ))
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from repo.utils.chesscom.sync import DEFAULT_PLAYERS_FILE, sync_players, tracked_chesscom_usernames
+
+
+class Command(BaseCommand):
+    help = "Incrementally ingests the monthly chess.com archives of every tracked player in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players-file', nargs='?', const=str(DEFAULT_PLAYERS_FILE), default=None,
+                            help="Read usernames from a players JSON file (data/players.json if no path is given) instead of the Player table.")
+        parser.add_argument('--year', type=int, default=None)
+        parser.add_argument('--month', type=int, default=None)
+        parser.add_argument('--workers', type=int, default=None, help="Concurrent archive downloads (default: CHESSCOM_SYNC_WORKERS).")
+
+    def handle(self, *args, **options):
+        usernames = tracked_chesscom_usernames(options['players_file'])
+        self.stdout.write(f"Syncing {len(usernames)} chess.com players")
+
+        started = time.monotonic()
+        statuses, counts = sync_players(
+            usernames, self.stdout,
+            year=options['year'], month=options['month'],
+            max_workers=options['workers'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{statuses['fetched']} archives fetched, {statuses['not_modified']} unchanged, {statuses['failed']} failed "
+            f"in {time.monotonic() - started:.1f}s: {counts['created']} games created, {counts['updated']} updated, "
+            f"{counts['skipped']} skipped, {counts['error']} errors"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0011_remove_game_games_endtime_c7faad_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="identity_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0012_game_identity_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="canonical_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:50
+
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def mark_existing_players(apps, schema_editor):
+    # Players that already have a name were enriched inline at ingest time, and players
+    # without a chess.com username or FIDE ID have nothing to look up
+    Player = apps.get_model("repo", "Player")
+    Player.objects.filter(
+        Q(name__gt="")
+        | (Q(chesscom_username__isnull=True) | Q(chesscom_username=""))
+        & (Q(fide_id__isnull=True) | Q(fide_id=""))
+    ).update(needs_enrichment=False, last_enrichment_at=F("last_updated"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0013_game_canonical_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="player",
+            name="last_enrichment_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="player",
+            name="needs_enrichment",
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.RunPython(mark_existing_players, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0014_player_enrichment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChesscomArchiveState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("username", models.CharField(max_length=100)),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                ("etag", models.CharField(blank=True, max_length=255, null=True)),
+                (
+                    "last_modified",
+                    models.CharField(blank=True, max_length=64, null=True),
+                ),
+                ("last_end_time", models.DateTimeField(blank=True, null=True)),
+                ("last_fetched_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Chess.com Archive State",
+                "verbose_name_plural": "Chess.com Archive States",
+                "db_table": "chesscom_archive_states",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("username", "year", "month"),
+                        name="unique_chesscom_archive_month",
+                    )
+                ],
+            },
+        ),
+    ]
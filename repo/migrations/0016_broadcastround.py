@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0015_chesscomarchivestate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BroadcastRound",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("round_id", models.CharField(max_length=32, unique=True)),
+                ("tour_id", models.CharField(db_index=True, max_length=32)),
+                ("tour_name", models.CharField(max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("recheck", "Re-check"),
+                            ("ingested", "Ingested"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("ingested_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Broadcast Round",
+                "verbose_name_plural": "Broadcast Rounds",
+                "db_table": "broadcast_rounds",
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0016_broadcastround"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="ply_count",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0017_game_ply_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chesscomarchivestate",
+            name="completed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
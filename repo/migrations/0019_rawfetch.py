@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0018_chesscomarchivestate_completed_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RawFetch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=20)),
+                ("url", models.URLField(max_length=500)),
+                ("fetched_at", models.DateTimeField(db_index=True)),
+                ("sha256", models.CharField(db_index=True, max_length=64)),
+                ("size", models.PositiveBigIntegerField()),
+                (
+                    "tournament_name",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+            ],
+            options={
+                "verbose_name": "Raw Fetch",
+                "verbose_name_plural": "Raw Fetches",
+                "db_table": "raw_fetches",
+                "indexes": [
+                    models.Index(
+                        fields=["source", "url", "fetched_at"],
+                        name="raw_fetches_source_08858e_idx",
+                    )
+                ],
+            },
+        ),
+    ]
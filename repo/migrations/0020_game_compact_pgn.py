@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0019_rawfetch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="pgn_clocks",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="pgn_layout",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="pgn_moves",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="game",
+            name="pgn",
+            field=models.TextField(blank=True),
+        ),
+    ]
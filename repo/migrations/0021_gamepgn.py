@@ -0,0 +1,97 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Games copied per query, so existing rows are moved without loading the table into memory
+BATCH_SIZE = 2000
+PGN_FIELDS = ["pgn", "pgn_moves", "pgn_clocks", "pgn_layout"]
+
+
+def copy_pgns_to_side_table(apps, schema_editor):
+    Game = apps.get_model("repo", "Game")
+    GamePgn = apps.get_model("repo", "GamePgn")
+    last_id = 0
+    while True:
+        # keyset pagination over the games table
+        rows = list(
+            Game.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values("id", *PGN_FIELDS)[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        last_id = rows[-1]["id"]
+        GamePgn.objects.bulk_create(
+            [GamePgn(game_id=row.pop("id"), **row) for row in rows],
+            ignore_conflicts=True,
+        )
+
+
+def copy_pgns_back(apps, schema_editor):
+    Game = apps.get_model("repo", "Game")
+    GamePgn = apps.get_model("repo", "GamePgn")
+    last_id = 0
+    while True:
+        rows = list(
+            GamePgn.objects.filter(game_id__gt=last_id)
+            .order_by("game_id")
+            .values("game_id", *PGN_FIELDS)[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        last_id = rows[-1]["game_id"]
+        Game.objects.bulk_update(
+            [Game(id=row.pop("game_id"), **row) for row in rows], PGN_FIELDS
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0020_game_compact_pgn"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GamePgn",
+            fields=[
+                (
+                    "game",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="pgn_data",
+                        serialize=False,
+                        to="repo.game",
+                    ),
+                ),
+                ("pgn", models.TextField(blank=True)),
+                ("pgn_moves", models.BinaryField(blank=True, null=True)),
+                ("pgn_clocks", models.BinaryField(blank=True, null=True)),
+                ("pgn_layout", models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Game PGN",
+                "verbose_name_plural": "Game PGNs",
+                "db_table": "game_pgns",
+            },
+        ),
+        migrations.RunPython(copy_pgns_to_side_table, copy_pgns_back),
+        migrations.RemoveField(
+            model_name="game",
+            name="pgn",
+        ),
+        migrations.RemoveField(
+            model_name="game",
+            name="pgn_clocks",
+        ),
+        migrations.RemoveField(
+            model_name="game",
+            name="pgn_layout",
+        ),
+        migrations.RemoveField(
+            model_name="game",
+            name="pgn_moves",
+        ),
+    ]
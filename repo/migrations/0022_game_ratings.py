@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0021_gamepgn"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="black_rating",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="combined_rating",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="white_rating",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["date", "-combined_rating"], name="games_date_1d0bb3_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["-combined_rating"], name="games_combine_19e357_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0022_game_ratings"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tournament",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("game_count", models.PositiveIntegerField(default=0)),
+                ("player_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveBigIntegerField(default=0)),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("title_weight_sum", models.PositiveIntegerField(default=0)),
+                ("strength", models.FloatField(db_index=True, default=0)),
+                (
+                    "players",
+                    models.ManyToManyField(
+                        blank=True, related_name="tournaments", to="repo.player"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tournament",
+                "verbose_name_plural": "Tournaments",
+                "db_table": "tournaments",
+                "ordering": ["-strength"],
+            },
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="tournament_group",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="games",
+                to="repo.tournament",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0023_tournament"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyFeed",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True)),
+                ("tournaments", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Daily feed",
+                "verbose_name_plural": "Daily feeds",
+                "db_table": "daily_feeds",
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+def copy_names_to_keys(apps, schema_editor):
+    # existing tournaments keep one edition per name until rebuild_tournaments has run
+    Tournament = apps.get_model("repo", "Tournament")
+    Tournament.objects.update(key=models.F("name"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0024_dailyfeed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="tournament_url",
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name="tournament",
+            name="key",
+            field=models.CharField(max_length=500, null=True),
+        ),
+        migrations.RunPython(copy_names_to_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="tournament",
+            name="key",
+            field=models.CharField(max_length=500, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="tournament",
+            name="name",
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+RATING_INDEXES = [
+    models.Index(
+        models.F("date"),
+        models.OrderBy(models.F("combined_rating"), descending=True, nulls_last=True),
+        name="games_date_rating_idx",
+    ),
+    models.Index(
+        models.OrderBy(models.F("combined_rating"), descending=True, nulls_last=True),
+        name="games_rating_idx",
+    ),
+]
+# SQLite has no NULLS LAST in indexes, and sorts NULL last in DESC order anyway
+FALLBACK_INDEXES = [
+    models.Index(fields=["date", "-combined_rating"], name="games_date_rating_idx"),
+    models.Index(fields=["-combined_rating"], name="games_rating_idx"),
+]
+
+
+def _indexes(schema_editor):
+    return RATING_INDEXES if schema_editor.connection.vendor == "postgresql" else FALLBACK_INDEXES
+
+
+def create_rating_indexes(apps, schema_editor):
+    Game = apps.get_model("repo", "Game")
+    for index in _indexes(schema_editor):
+        schema_editor.add_index(Game, index)
+
+
+def drop_rating_indexes(apps, schema_editor):
+    Game = apps.get_model("repo", "Game")
+    for index in _indexes(schema_editor):
+        schema_editor.remove_index(Game, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0025_tournament_editions"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="game",
+            name="games_date_1d0bb3_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="game",
+            name="games_combine_19e357_idx",
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name="game", index=index) for index in RATING_INDEXES],
+            database_operations=[migrations.RunPython(create_rating_indexes, drop_rating_indexes)],
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:05
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+# Tags compact layouts used to leave out (null value) and rebuild from these Game columns
+HEADER_COLUMNS = {
+    "Event": "event",
+    "Site": "site",
+    "Round": "round",
+    "White": "white_username",
+    "Black": "black_username",
+    "Result": "result",
+    "WhiteElo": "whiteelo",
+    "BlackElo": "blackelo",
+    "ECO": "eco",
+    "TimeControl": "timecontrol",
+    "Variant": "variant",
+    "Link": "link",
+    "GameUrl": "link",
+}
+
+
+def store_tag_values(apps, schema_editor):
+    """Writes the column values into the layouts, so later column updates leave the PGN alone."""
+    GamePgn = apps.get_model("repo", "GamePgn")
+    columns = sorted(set(HEADER_COLUMNS.values()))
+    pgns = (
+        GamePgn.objects.filter(pgn_layout__isnull=False)
+        .select_related("game")
+        .only("game_id", "pgn_layout", *(f"game__{column}" for column in columns))
+    )
+    last_id = 0
+    while True:
+        batch = list(pgns.filter(game_id__gt=last_id).order_by("game_id")[:BATCH_SIZE])
+        if not batch:
+            return
+        last_id = batch[-1].game_id
+        changed = []
+        for pgn_data in batch:
+            if all(value is not None for _, value in pgn_data.pgn_layout):
+                continue
+            pgn_data.pgn_layout = [
+                [tag, getattr(pgn_data.game, HEADER_COLUMNS[tag]) if value is None else value]
+                for tag, value in pgn_data.pgn_layout
+            ]
+            changed.append(pgn_data)
+        GamePgn.objects.bulk_update(changed, ["pgn_layout"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0026_game_rating_nulls_last"),
+    ]
+
+    operations = [
+        # the filled-in layouts still decode the same with the previous code
+        migrations.RunPython(store_tag_values, migrations.RunPython.noop),
+    ]
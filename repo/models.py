@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models import F
 import re
 import datetime
 from django.core.exceptions import ValidationError
+from repo.utils.compact_pgn import decode_pgn
 
 # Custom DateField if it's not already defined elsewhere or if you want it specific to this app's models
 class ChessDateField(models.DateField):
@@ -37,9 +39,18 @@ class Game(models.Model):
     eco = models.CharField(max_length=10, blank=True, null=True)
     whiteelo = models.CharField(blank=True, null=True)
     blackelo = models.CharField(blank=True, null=True)
+    # Typed copies of the Elo headers (see repo.utils.pgn.rating_fields), for sorting and range filters in the database
+    white_rating = models.PositiveSmallIntegerField(blank=True, null=True)
+    black_rating = models.PositiveSmallIntegerField(blank=True, null=True)
+    # white_rating + black_rating, unknown ratings counted as 0; null until backfill_ratings has run
+    combined_rating = models.PositiveIntegerField(blank=True, null=True)
     event = models.CharField(max_length=255, blank=True, null=True)
     site = models.CharField(max_length=255, blank=True, null=True)
     tournament = models.CharField(max_length=255, blank=True, null=True)
+    # The source's page of the tournament (chess.com "Tournament", lichess "BroadcastURL" header), telling its editions apart
+    tournament_url = models.URLField(max_length=500, blank=True, null=True)
+    # The Tournament edition the game is grouped under on the index page, resolved from `tournament`, `tournament_url` and `date` at ingest
+    tournament_group = models.ForeignKey('Tournament', on_delete=models.SET_NULL, related_name='games', null=True, blank=True)
 
     # PGN "Round" - represents the round number in the tournament
     round = models.CharField(max_length=100, blank=True, null=True)
@@ -59,8 +70,14 @@ class Game(models.Model):
     variant = models.CharField(max_length=100, blank=True, null=True)
 
     link = models.URLField(max_length=500, blank=True, null=True, unique=False) 
-    pgn = models.TextField()
+    # The PGN itself lives in GamePgn (pgn_data), see pgn_text
+    # Number of half-moves in the mainline, to tell which of two versions of a live game is longer
+    ply_count = models.PositiveIntegerField(blank=True, null=True)
     pgn_hash = models.CharField(max_length=64, unique=True, db_index=True)
+    # Header-derived identity, stable while a live game grows (see repo.utils.pgn.generate_game_identity)
+    identity_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # Cross-source hash of moves, players and date (see repo.utils.pgn.generate_canonical_hash)
+    canonical_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
     source = models.CharField(max_length=20, db_index=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -69,6 +86,20 @@ class Game(models.Model):
     def __str__(self):
         return f"{self.white or 'N/A'} vs {self.black or 'N/A'} - {self.date or 'Unknown Date'}"
 
+    @property
+    def pgn_text(self):
+        """
+        The game's PGN, rebuilt from the compact fields if it is stored compactly.
+        Reads pgn_data, so load it with select_related('pgn_data') (see repo.utils.compact_pgn.PGN_COLUMNS).
+        """
+        try:
+            pgn_data = self.pgn_data
+        except GamePgn.DoesNotExist:
+            return ''
+        if pgn_data.pgn_moves is None:
+            return pgn_data.pgn
+        return decode_pgn(pgn_data.pgn_moves, pgn_data.pgn_clocks, pgn_data.pgn_layout)
+
     class Meta:
         ordering = ['-date', '-endtime']
         db_table = 'games'
@@ -76,6 +107,10 @@ class Game(models.Model):
         verbose_name_plural = 'Games'
         indexes = [
             models.Index(fields=['date']),
+            # daily listing: one date, strongest games first, games without ratings last
+            models.Index(F('date'), F('combined_rating').desc(nulls_last=True), name='games_date_rating_idx'),
+            # "top games" across dates
+            models.Index(F('combined_rating').desc(nulls_last=True), name='games_rating_idx'),
             # models.Index(fields=['date', 'endtime']),
             # models.Index(fields=['white']),
             # models.Index(fields=['black']),
@@ -84,6 +119,30 @@ class Game(models.Model):
         ]
 
 
+
+class GamePgn(models.Model):
+    """
+    The PGN of a game, in its own table so the games table only holds narrow metadata rows:
+    listing queries never read the move text, only the PGN endpoint, the download and the
+    maintenance commands join it.
+    """
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, primary_key=True, related_name='pgn_data')
+    # Empty once the game is stored compactly, see Game.pgn_text
+    pgn = models.TextField(blank=True)
+    # Compact PGN storage (repo.utils.compact_pgn): move indexes, packed clocks, tags
+    pgn_moves = models.BinaryField(blank=True, null=True)
+    pgn_clocks = models.BinaryField(blank=True, null=True)
+    pgn_layout = models.JSONField(blank=True, null=True)
+
+    def __str__(self):
+        return f"PGN of game {self.game_id}"
+
+    class Meta:
+        db_table = 'game_pgns'
+        verbose_name = 'Game PGN'
+        verbose_name_plural = 'Game PGNs'
+
+
 class Player(models.Model):
     name = models.CharField(max_length=255, blank=True, null=True)
     fide_id = models.CharField(max_length=50, unique=True, blank=True, null=True)
@@ -93,6 +152,11 @@ class Player(models.Model):
     lichess_username = models.CharField(max_length=100, unique=True, blank=True, null=True)
     last_updated = models.DateTimeField(auto_now=True)
 
+    # Profile enrichment queue (see repo.utils.enrichment)
+    needs_enrichment = models.BooleanField(default=True, db_index=True)
+    # Last enrichment attempt, successful or not
+    last_enrichment_at = models.DateTimeField(blank=True, null=True)
+
     def __str__(self):
         return self.name or self.username
     
@@ -100,4 +164,167 @@ class Player(models.Model):
         ordering = ['name']
         db_table = 'players'
         verbose_name = 'Player'
-        verbose_name_plural = 'Players'
\ No newline at end of file
+        verbose_name_plural = 'Players'
+
+
+
+class Tournament(models.Model):
+    """
+    One edition of a tournament as games are grouped on the index page (Game.tournament,
+    stripped), with aggregates kept up to date as games are saved (see repo.utils.tournaments),
+    so pages read ready-made ordering data instead of recomputing it per request.
+    """
+    # The edition: its source URL, or its name and date (see repo.utils.tournaments.tournament_edition)
+    key = models.CharField(max_length=500, unique=True)
+    name = models.CharField(max_length=255, db_index=True)
+    # Every player who played a game of the tournament, for the unique player count
+    players = models.ManyToManyField('Player', related_name='tournaments', blank=True)
+    game_count = models.PositiveIntegerField(default=0)
+    player_count = models.PositiveIntegerField(default=0)
+    # Sum and number of the known ratings of all games, for the average Elo
+    rating_sum = models.PositiveBigIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # Sum of the title weights of the players (see repo.utils.tournaments.get_title_weight)
+    title_weight_sum = models.PositiveIntegerField(default=0)
+    strength = models.FloatField(default=0, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    class Meta:
+        ordering = ['-strength']
+        db_table = 'tournaments'
+        verbose_name = 'Tournament'
+        verbose_name_plural = 'Tournaments'
+
+
+
+class DailyFeed(models.Model):
+    """
+    Snapshot of the index page of one date: the day's games grouped by tournament, strongest
+    tournament and games first, as JSON (see repo.utils.feed). Kept current by ingestion and
+    deleted when something it shows changes otherwise; the page rebuilds a missing snapshot.
+    """
+    date = models.DateField(unique=True)
+    tournaments = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Feed of {self.date}"
+
+    class Meta:
+        db_table = 'daily_feeds'
+        verbose_name = 'Daily feed'
+        verbose_name_plural = 'Daily feeds'
+
+
+class ChesscomArchiveState(models.Model):
+    """
+    Fetch state of one chess.com monthly archive (player, month): the HTTP validators of the
+    last successful fetch, for conditional requests, and the end time of the latest game saved
+    from it, so only newer games are parsed on the next fetch.
+    """
+    username = models.CharField(max_length=100)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    etag = models.CharField(max_length=255, blank=True, null=True)
+    last_modified = models.CharField(max_length=64, blank=True, null=True)
+    # EndDate/EndTime of the latest game processed from this archive
+    last_end_time = models.DateTimeField(blank=True, null=True)
+    last_fetched_at = models.DateTimeField(blank=True, null=True)
+    # Set once a past month has been fully ingested; the backfill never fetches it again
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.username} {self.year}-{self.month:02d}"
+
+    class Meta:
+        db_table = 'chesscom_archive_states'
+        verbose_name = 'Chess.com Archive State'
+        verbose_name_plural = 'Chess.com Archive States'
+        constraints = [
+            models.UniqueConstraint(fields=['username', 'year', 'month'], name='unique_chesscom_archive_month'),
+        ]
+
+
+
+class BroadcastRound(models.Model):
+    """
+    Ledger of lichess broadcast rounds seen by the ingester, so each run only fetches
+    rounds that are new or still inside their re-check window.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RECHECK = 'recheck'
+    STATUS_INGESTED = 'ingested'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        # finished recently: ingested, but fetched again for games the relay finished or added late.
+        # Games already stored as finished are skipped by identity, so later corrections of them are not picked up
+        (STATUS_RECHECK, 'Re-check'),
+        (STATUS_INGESTED, 'Ingested'),
+    ]
+
+    round_id = models.CharField(max_length=32, unique=True)
+    tour_id = models.CharField(max_length=32, db_index=True)
+    tour_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    ingested_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.tour_name} - {self.round_id} ({self.status})"
+
+    class Meta:
+        db_table = 'broadcast_rounds'
+        verbose_name = 'Broadcast Round'
+        verbose_name_plural = 'Broadcast Rounds'
+
+
+class RawFetch(models.Model):
+    """
+    One fetched PGN payload kept in the raw archive (see repo.utils.raw_archive). The payload itself
+    is stored gzip-compressed on disk under its sha256, so identical payloads are stored once.
+    """
+    source = models.CharField(max_length=20)
+    url = models.URLField(max_length=500)
+    fetched_at = models.DateTimeField(db_index=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    # Uncompressed size in bytes
+    size = models.PositiveBigIntegerField()
+    # Passed back to the ingestion on replay (lichess games take it from the broadcast, not the PGN)
+    tournament_name = models.CharField(max_length=255, blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.source} {self.url} @ {self.fetched_at}"
+
+    class Meta:
+        db_table = 'raw_fetches'
+        verbose_name = 'Raw Fetch'
+        verbose_name_plural = 'Raw Fetches'
+        indexes = [
+            models.Index(fields=['source', 'url', 'fetched_at']),
+        ]
+
+
+class JobCheckpoint(models.Model):
+    """
+    Progress of a resumable maintenance job over the games table (e.g. reprocess_games): the id of
+    the last game it wrote back, saved in the transaction of that write.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at game {self.last_id}"
+
+    class Meta:
+        db_table = 'job_checkpoints'
+        verbose_name = 'Job Checkpoint'
+        verbose_name_plural = 'Job Checkpoints'
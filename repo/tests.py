@@ -1,3 +1,894 @@
-from django.test import TestCase
+import contextlib
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
 
-# Create your tests here.
+import chess.pgn
+import fakeredis
+import requests
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from repo.models import BroadcastRound, ChesscomArchiveState, DailyFeed, Game, GamePgn, JobCheckpoint, Player, RawFetch, Tournament
+from repo.utils.chesscom.crawler import CHESSCOM_CRAWLER
+from repo.utils.chesscom.sync import backfill_players, sync_players
+from repo.utils.compact_pgn import decode_pgn, encode_pgn
+from repo.utils.dedup import RedisBloomFilter
+from repo.utils.enrichment import due_players, enrich_players
+from repo.utils.feed import build_daily_feed, get_daily_feed
+from repo.utils.http import HttpClient, RateLimiter
+from repo.utils.ingest import ingest_pgn, replay_raw_archive
+from repo.utils.lichess.ledger import mark_round_ingested, scan_rounds_to_ingest
+from repo.utils import partitioning
+from repo.utils.pgn import PgnPrefilter, _scan_headers, extract_games_from_pgn_string, generate_game_identity, iter_parsed_batches, iter_pgn_texts, parse_game_texts
+from repo.utils.pipeline import IngestJob, ingest_jobs
+from repo.utils.raw_archive import prune_raw_archive, read_raw_fetch, store_raw_fetch
+from repo.utils.reprocess import CHECKPOINT_NAME, reprocess_games
+from repo.utils.save import resolve_chesscom_players, save_game_data
+from repo.utils.tournaments import relink_tournament_games
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+LIVE_GAME = """[Event "Live Chess"]
+[Site "Chess.com"]
+[Date "2025.05.06"]
+[Round "-"]
+[White "PlayerOne"]
+[Black "PlayerTwo"]
+[Result "{result}"]
+[WhiteElo "2800"]
+[BlackElo "2750"]
+[TimeControl "180"]
+[EndTime "12:03:00"]
+[Link "https://www.chess.com/game/live/123456"]
+
+1. e4 {{[%clk 0:02:59]}} e5 {{[%clk 0:02:58]}} 2. Qh5 {{[%clk 0:02:57]}} Nc6 {{[%clk 0:02:56]}} 3. Bc4 {{[%clk 0:02:55]}} Nf6 {{[%clk 0:02:54]}} 4. Qxf7# {{[%clk 0:02:53]}} {result}
+"""
+
+
+class IterPgnTextsTests(SimpleTestCase):
+    def test_splits_games_after_a_result(self):
+        texts = list(iter_pgn_texts('[Event "A"]\n\n1. e4 e5 1-0\n[Event "B"]\n\n1. d4 *\n\n[Event "C"]\n\n1. c4 *\n'))
+        self.assertEqual([text.splitlines()[0] for text in texts], ['[Event "A"]', '[Event "B"]', '[Event "C"]'])
+
+    def test_multi_line_comment_does_not_split_a_game(self):
+        pgn = '[Event "A"]\n\n1. e4 { a comment wrapped over\n\n[%clk 0:01:00] } e5\n[Note "annotation"] 2. Nf3 1-0\n'
+        self.assertEqual(list(iter_pgn_texts(pgn)), [pgn])
+
+    def test_chunks_split_inside_lines(self):
+        pgn = LIVE_GAME.format(result='1-0') * 3
+        data = pgn.encode('utf-8')
+        chunks = (data[start:start + 7] for start in range(0, len(data), 7))
+        self.assertEqual(list(iter_pgn_texts(chunks)), [LIVE_GAME.format(result='1-0')] * 3)
+
+
+def game_pgn(number, white, black, result='1-0', date='2025.05.06'):
+    return (
+        LIVE_GAME.format(result=result)
+        .replace('PlayerOne', white).replace('PlayerTwo', black)
+        .replace('2025.05.06', date).replace('123456', str(number))
+    )
+
+
+class ListWriter:
+    def __init__(self):
+        self.messages = []
+
+    def write(self, message):
+        self.messages.append(message)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LiveGameTests(TestCase):
+    def setUp(self):
+        # the dedup keys of the other tests' games
+        cache.clear()
+
+    def ingest(self, pgn):
+        return ingest_pgn(pgn, 'chesscom', ListWriter())
+
+    def test_finished_version_replaces_live_game_with_same_moves(self):
+        self.assertEqual(self.ingest(LIVE_GAME.format(result='*'))['created'], 1)
+        counts = self.ingest(LIVE_GAME.format(result='1-0'))
+        self.assertEqual(counts['updated'], 1)
+        game = Game.objects.get()
+        self.assertEqual(game.result, '1-0')
+        self.assertIn('1-0', game.pgn_text)
+
+    def test_finished_game_is_not_ingested_twice(self):
+        self.ingest(LIVE_GAME.format(result='1-0'))
+        counts = self.ingest(LIVE_GAME.format(result='1-0'))
+        self.assertEqual(counts, {'created': 0, 'updated': 0, 'skipped': 0, 'error': 0})
+        self.assertEqual(Game.objects.count(), 1)
+
+    def test_rematch_with_the_same_moves_is_kept(self):
+        counts = self.ingest(game_pgn(1, 'PlayerOne', 'PlayerTwo') + '\n' + game_pgn(2, 'PlayerOne', 'PlayerTwo'))
+        self.assertEqual(counts['created'], 2)
+
+
+LICHESS_GAME = """[Event "Norway Chess 2025"]
+[Site "Stavanger"]
+[Date "2025.05.06"]
+[Round "3.1"]
+[White "Carlsen, Magnus"]
+[Black "Nakamura, Hikaru"]
+[Result "1-0"]
+[WhiteFideId "1503014"]
+[BlackFideId "2016192"]
+[GameUrl "https://lichess.org/broadcast/norway-chess-2025/round-3/abcd1234/efgh5678"]
+
+1. e4 {{[%clk 1:59:50]}} e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+"""
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CrossSourceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # enriched chess.com profiles carry the players' real names
+        Player.objects.create(chesscom_username='MagnusCarlsen', name='Magnus Carlsen', needs_enrichment=False)
+        Player.objects.create(chesscom_username='Hikaru', name='Hikaru Nakamura', needs_enrichment=False)
+
+    def chesscom_pgn(self):
+        return game_pgn(1, 'MagnusCarlsen', 'Hikaru')
+
+    def test_lichess_relay_of_a_stored_chesscom_game_is_not_saved(self):
+        ingest_pgn(self.chesscom_pgn(), 'chesscom', ListWriter())
+        counts = ingest_pgn(LICHESS_GAME.format(), 'lichess', ListWriter())
+        self.assertEqual(counts['created'], 0)
+        self.assertEqual(Game.objects.count(), 1)
+
+    def test_chesscom_copy_of_a_stored_lichess_game_is_not_saved(self):
+        ingest_pgn(LICHESS_GAME.format(), 'lichess', ListWriter())
+        ingest_pgn(self.chesscom_pgn(), 'chesscom', ListWriter())
+        self.assertEqual(list(Game.objects.values_list('source', flat=True)), ['lichess'])
+
+
+# the pipeline stages write from their own threads and database connections
+@override_settings(CACHES=LOCMEM_CACHE)
+class PipelineTests(TransactionTestCase):
+    def test_jobs_are_saved_and_done(self):
+        done = []
+        jobs = [IngestJob(lambda: LIVE_GAME.format(result='1-0'), 'chesscom', on_done=done.append)]
+        counts = ingest_jobs(jobs, ListWriter())
+        self.assertEqual(counts['created'], 1)
+        self.assertEqual(done, [counts])
+
+    def test_stage_error_is_reported_to_the_writer(self):
+        def fail():
+            raise RuntimeError("fetch failed")
+
+        writer = ListWriter()
+        job = IngestJob(fail, 'chesscom')
+        counts = ingest_jobs([job], writer)
+        self.assertEqual(counts['created'], 0)
+        self.assertFalse(job.done)
+        self.assertEqual(writer.messages, ["Pipeline stage 'fetch' failed: fetch failed"])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DailyFeedTests(TestCase):
+    day = datetime.date(2025, 5, 6)
+
+    def ingest(self, pgn):
+        return ingest_pgn(pgn, 'chesscom', ListWriter())
+
+    def game_ids(self, tournaments):
+        return sorted(game['id'] for group in tournaments for game in group['games'])
+
+    def test_snapshot_is_stored_on_request_and_updated_by_ingest(self):
+        self.ingest(game_pgn(1, 'PlayerOne', 'PlayerTwo'))
+        self.assertFalse(DailyFeed.objects.exists())
+        self.assertEqual(len(self.game_ids(get_daily_feed(self.day))), 1)
+
+        self.ingest(game_pgn(2, 'PlayerThree', 'PlayerFour'))
+        feed = DailyFeed.objects.get(date=self.day)
+        self.assertEqual(self.game_ids(feed.tournaments), self.game_ids(build_daily_feed(self.day)))
+        self.assertEqual(len(self.game_ids(get_daily_feed(self.day))), 2)
+
+    def test_ingest_leaves_dates_without_a_snapshot_alone(self):
+        self.ingest(game_pgn(1, 'PlayerOne', 'PlayerTwo'))
+        self.ingest(game_pgn(2, 'PlayerThree', 'PlayerFour', date='2025.05.07'))
+        self.assertFalse(DailyFeed.objects.exists())
+
+    def test_empty_days_are_not_stored(self):
+        # the snapshot lookup and the games check, no row is inserted or locked
+        with self.assertNumQueries(2):
+            self.assertEqual(get_daily_feed(self.day), [])
+        self.assertFalse(DailyFeed.objects.exists())
+
+    def test_other_days_take_the_strength_of_their_own_edition(self):
+        Player.objects.create(chesscom_username='GmOne', title='GM', needs_enrichment=False)
+        Player.objects.create(chesscom_username='GmTwo', title='GM', needs_enrichment=False)
+
+        def edition_game(number, date, tournament_id, white, black):
+            return titled_tuesday_pgn(number, date, tournament_id).replace('PlayerOne', white).replace('PlayerTwo', black)
+
+        # two editions of the same name with games on one day
+        self.ingest(edition_game(1, '2025.05.06', 1, 'GmOne', 'GmTwo') + '\n' + edition_game(2, '2025.05.06', 2, 'Amateur', 'Novice'))
+        self.assertEqual(len(get_daily_feed(self.day)), 1)
+        self.ingest(edition_game(3, '2025.05.07', 1, 'GmOne', 'GmTwo') + '\n' + edition_game(4, '2025.05.07', 2, 'Amateur', 'Novice'))
+
+        strengths = dict(Tournament.objects.values_list('id', 'strength'))
+        self.assertEqual(len(set(strengths.values())), 2)
+        [group] = DailyFeed.objects.get(date=self.day).tournaments
+        self.assertEqual(group['strength'], strengths[group['tournament_id']])
+
+    def test_games_are_ordered_by_rating_with_unrated_games_last(self):
+        def ordered_numbers(tournaments):
+            links = dict(Game.objects.values_list('id', 'link'))
+            return [int(links[game['id']].rsplit('/', 1)[1]) for group in tournaments for game in group['games']]
+
+        self.ingest(game_pgn(1, 'PlayerOne', 'PlayerTwo'))
+        self.ingest(game_pgn(2, 'PlayerThree', 'PlayerFour').replace('[WhiteElo "2800"]\n', '').replace('[BlackElo "2750"]\n', ''))
+        self.ingest(game_pgn(3, 'PlayerFive', 'PlayerSix').replace('"2800"', '"2000"'))
+        self.ingest(game_pgn(4, 'PlayerSeven', 'PlayerEight'))
+        # saved before the rating columns were backfilled; Postgres sorts NULL first in DESC order
+        Game.objects.filter(link__endswith='/4').update(combined_rating=None)
+        self.assertEqual(ordered_numbers(build_daily_feed(self.day)), [1, 3, 2, 4])
+        self.assertEqual(ordered_numbers(get_daily_feed(self.day)), [1, 3, 2, 4])
+
+        # the snapshot update keeps the order
+        self.ingest(game_pgn(5, 'PlayerNine', 'PlayerTen').replace('"2800"', '"2900"'))
+        self.assertEqual(ordered_numbers(DailyFeed.objects.get(date=self.day).tournaments), [5, 1, 3, 2, 4])
+
+    def test_unbuilt_snapshot_row_is_built_on_request(self):
+        self.ingest(game_pgn(1, 'PlayerOne', 'PlayerTwo'))
+        # left by a request that did not finish building it
+        DailyFeed.objects.create(date=self.day)
+        self.assertEqual(len(self.game_ids(get_daily_feed(self.day))), 1)
+        self.assertEqual(len(self.game_ids(DailyFeed.objects.get(date=self.day).tournaments)), 1)
+
+    def test_ingest_drops_unbuilt_snapshot_rows(self):
+        DailyFeed.objects.create(date=self.day)
+        self.ingest(game_pgn(1, 'PlayerOne', 'PlayerTwo'))
+        self.assertFalse(DailyFeed.objects.exists())
+        self.assertEqual(len(self.game_ids(get_daily_feed(self.day))), 1)
+
+
+class ChesscomPlayerTests(TestCase):
+    def test_crawled_username_matches_display_case_player(self):
+        player = Player.objects.create(chesscom_username='MagnusCarlsen', needs_enrichment=False)
+        counts = CHESSCOM_CRAWLER.upsert_players([{'chesscom_username': 'magnuscarlsen', 'name': 'GM Magnus Carlsen'}])
+        self.assertEqual(counts, {'created': 0, 'updated': 1})
+        player.refresh_from_db()
+        self.assertEqual((player.chesscom_username, player.title), ('MagnusCarlsen', 'GM'))
+
+    def test_crawled_player_takes_the_case_of_the_pgn(self):
+        CHESSCOM_CRAWLER.upsert_players([{'chesscom_username': 'magnuscarlsen', 'name': 'GM Magnus Carlsen'}])
+        player = resolve_chesscom_players(['MagnusCarlsen'])['MagnusCarlsen']
+        self.assertEqual(Player.objects.get().pk, player.pk)
+        self.assertEqual(Player.objects.get().chesscom_username, 'MagnusCarlsen')
+
+
+class FakeProfileApi:
+    """Answers chess.com profile requests from `profiles` {username: profile}; None means 404, an exception is raised."""
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.requests = []
+
+    def get_player_profile(self, username):
+        self.requests.append(username)
+        profile = self.profiles.get(username)
+        if isinstance(profile, Exception):
+            raise profile
+        return profile
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EnrichmentQueueTests(TestCase):
+    day = datetime.date(2025, 5, 6)
+
+    def setUp(self):
+        # the negative cache and the dedup keys of the other tests' games
+        cache.clear()
+
+    def use_api(self, profiles):
+        api = FakeProfileApi(profiles)
+        self.enterContext(mock.patch('repo.utils.enrichment.CHESSCOM_API', return_value=api))
+        return api
+
+    def test_ingest_queues_new_players(self):
+        ingest_pgn(game_pgn(1, 'PlayerOne', 'PlayerTwo'), 'chesscom', ListWriter())
+        Player.objects.create(chesscom_username='Enriched', needs_enrichment=False, last_enrichment_at=timezone.now())
+        self.assertEqual(sorted(player.chesscom_username for player in due_players()), ['PlayerOne', 'PlayerTwo'])
+
+    def test_enriched_players_leave_the_queue_until_the_refresh(self):
+        Player.objects.create(chesscom_username='PlayerOne')
+        self.use_api({'PlayerOne': {'name': 'Player One', 'title': 'GM', 'country': 'https://api.chess.com/pub/country/NO'}})
+
+        before = timezone.now()
+        self.assertEqual(enrich_players()['enriched'], 1)
+        player = Player.objects.get()
+        self.assertEqual((player.name, player.title, player.country), ('Player One', 'GM', 'NO'))
+        self.assertFalse(player.needs_enrichment)
+        self.assertGreaterEqual(player.last_enrichment_at, before)
+        self.assertEqual(list(due_players()), [])
+
+        stale = timezone.now() - datetime.timedelta(days=settings.PLAYER_ENRICHMENT_TTL_DAYS + 1)
+        Player.objects.update(last_enrichment_at=stale)
+        self.assertEqual(list(due_players()), [player])
+
+    def test_missing_profiles_are_negatively_cached(self):
+        Player.objects.create(chesscom_username='Closed')
+        api = self.use_api({'Closed': None})
+
+        self.assertEqual(enrich_players()['missing'], 1)
+        player = Player.objects.get()
+        self.assertFalse(player.needs_enrichment)
+        self.assertIsNotNone(player.last_enrichment_at)
+
+        # due for a refresh, but the miss is still cached
+        Player.objects.update(last_enrichment_at=timezone.now() - datetime.timedelta(days=settings.PLAYER_ENRICHMENT_TTL_DAYS + 1))
+        self.assertEqual(enrich_players()['cached_miss'], 1)
+        self.assertEqual(api.requests, ['Closed'])
+        self.assertEqual(list(due_players()), [])
+
+    def test_failed_players_move_to_the_back_of_the_queue(self):
+        Player.objects.create(chesscom_username='Failing')
+        Player.objects.create(chesscom_username='Waiting')
+        self.use_api({'Failing': requests.ConnectionError('down'), 'Waiting': requests.ConnectionError('down')})
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(enrich_players(limit=1)['error'], 1)
+        failing = Player.objects.get(chesscom_username='Failing')
+        # still queued, but attempted
+        self.assertTrue(failing.needs_enrichment)
+        self.assertIsNotNone(failing.last_enrichment_at)
+        self.assertEqual([player.chesscom_username for player in due_players()], ['Waiting', 'Failing'])
+
+    def test_changed_profiles_invalidate_the_feeds_of_their_games(self):
+        ingest_pgn(game_pgn(1, 'PlayerOne', 'PlayerTwo'), 'chesscom', ListWriter())
+        get_daily_feed(self.day)
+        self.use_api({'PlayerOne': {'name': 'Player One'}, 'PlayerTwo': {'name': 'Player Two'}})
+        enrich_players()
+        self.assertFalse(DailyFeed.objects.exists())
+
+        get_daily_feed(self.day)
+        [game] = [game for group in DailyFeed.objects.get(date=self.day).tournaments for game in group['games']]
+        self.assertEqual(game['white']['name'], 'Player One')
+
+        # a refresh that changes nothing keeps the snapshot
+        Player.objects.update(needs_enrichment=True)
+        self.assertEqual(enrich_players()['enriched'], 2)
+        self.assertTrue(DailyFeed.objects.exists())
+
+
+def titled_tuesday_pgn(number, date, tournament_id):
+    month_day = datetime.datetime.strptime(date, '%Y.%m.%d').strftime('%b-%d-%Y').lower()
+    url = f"https://www.chess.com/tournament/live/late-titled-tuesday-blitz-{month_day}-{tournament_id}"
+    return game_pgn(number, 'PlayerOne', 'PlayerTwo', date=date).replace(
+        '[Round "-"]\n', f'[Round "-"]\n[Tournament "{url}"]\n'
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TournamentTests(TestCase):
+    def test_editions_of_a_recurring_tournament_are_separate(self):
+        ingest_pgn(
+            titled_tuesday_pgn(1, '2025.05.06', 5632457) + '\n' + titled_tuesday_pgn(2, '2025.05.13', 5650001),
+            'chesscom', ListWriter(),
+        )
+        tournaments = Tournament.objects.order_by('id')
+        self.assertEqual([tournament.name for tournament in tournaments], ['Late Titled Tuesday Blitz'] * 2)
+        self.assertEqual([tournament.game_count for tournament in tournaments], [1, 1])
+        self.assertEqual(
+            {game.tournament_group.key for game in Game.objects.all()},
+            {game.tournament_url for game in Game.objects.all()},
+        )
+
+    def test_games_without_a_tournament_url_are_grouped_by_date(self):
+        ingest_pgn(game_pgn(1, 'A', 'B') + '\n' + game_pgn(2, 'C', 'D') + '\n' + game_pgn(3, 'A', 'B', date='2025.05.07'), 'chesscom', ListWriter())
+        self.assertEqual(
+            sorted(Tournament.objects.values_list('key', 'game_count')),
+            [('Online Chess|2025-05-06', 2), ('Online Chess|2025-05-07', 1)],
+        )
+
+    def assertCountersMoved(self):
+        self.assertEqual(
+            sorted(Tournament.objects.values_list('name', 'game_count', 'player_count', 'rating_count')),
+            [('Late Titled Tuesday Blitz', 1, 2, 2), ('Online Chess', 0, 0, 0)],
+        )
+        self.assertEqual(Game.objects.get().tournament_group.name, 'Late Titled Tuesday Blitz')
+
+    def test_upsert_moves_a_game_to_its_new_tournament(self):
+        ingest_pgn(game_pgn(1, 'PlayerOne', 'PlayerTwo', result='*'), 'chesscom', ListWriter())
+        # the finished version names the tournament the live one did not
+        self.assertEqual(ingest_pgn(titled_tuesday_pgn(1, '2025.05.06', 5632457), 'chesscom', ListWriter())['updated'], 1)
+        self.assertCountersMoved()
+
+    def test_per_game_upsert_moves_a_game_to_its_new_tournament(self):
+        ingest_pgn(game_pgn(1, 'PlayerOne', 'PlayerTwo', result='*'), 'chesscom', ListWriter())
+        [game_data] = extract_games_from_pgn_string(titled_tuesday_pgn(1, '2025.05.06', 5632457), 'chesscom')
+        self.assertEqual(save_game_data(game_data, ListWriter()), 'updated')
+        self.assertCountersMoved()
+
+    def test_reprocess_moves_a_game_to_its_new_tournament(self):
+        ingest_pgn(game_pgn(1, 'A', 'B'), 'chesscom', ListWriter())
+        game = Game.objects.get()
+        # as stored by an older tournament name derivation
+        game.tournament = 'Old Name'
+        relink_tournament_games([game], {game.id: 'Online Chess'})
+        Game.objects.filter(id=game.id).update(tournament='Old Name')
+        self.assertEqual(get_daily_feed(datetime.date(2025, 5, 6))[0]['name'], 'Old Name')
+
+        self.assertEqual(reprocess_games(ListWriter())['updated'], 1)
+        self.assertEqual(
+            sorted(Tournament.objects.values_list('key', 'game_count', 'player_count', 'rating_count')),
+            [('Old Name|2025-05-06', 0, 0, 0), ('Online Chess|2025-05-06', 1, 2, 2)],
+        )
+        self.assertEqual(Game.objects.get().tournament_group.key, 'Online Chess|2025-05-06')
+        feed = get_daily_feed(datetime.date(2025, 5, 6))
+        self.assertEqual([group['name'] for group in feed], ['Online Chess'])
+
+
+class PartitionedIndexSqlTests(SimpleTestCase):
+    def test_unique_indexes_get_the_partition_key(self):
+        self.assertEqual(
+            partitioning._partitioned_index_sql('games_hash', 'CREATE UNIQUE INDEX games_hash_old ON public.games_unpartitioned USING btree (pgn_hash) NULLS NOT DISTINCT'),
+            'CREATE UNIQUE INDEX IF NOT EXISTS games_hash ON games USING btree (pgn_hash, date) NULLS NOT DISTINCT',
+        )
+
+    def test_partial_indexes_keep_their_predicate(self):
+        self.assertEqual(
+            partitioning._partitioned_index_sql(
+                'games_live', "CREATE INDEX games_live_old ON public.games_unpartitioned USING btree (date) INCLUDE (result) WHERE ((result)::text = '*'::text)"
+            ),
+            "CREATE INDEX IF NOT EXISTS games_live ON games USING btree (date) INCLUDE (result) WHERE ((result)::text = '*'::text)",
+        )
+
+    def test_unsupported_definitions_are_refused(self):
+        with self.assertRaises(ValueError):
+            partitioning._partitioned_index_sql('games_x', 'CREATE INDEX games_x_old ON ONLY public.games_unpartitioned USING btree (date)')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "partitioning needs PostgreSQL")
+class PartitioningTests(TransactionTestCase):
+    """Converts a copy of the games tables in a scratch schema, ahead of the real ones in the search path."""
+
+    def setUp(self):
+        today = datetime.date.today()
+        self.dates = [today - datetime.timedelta(days=30 * months) for months in range(6)] + [today.replace(year=today.year - 10)]
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE SCHEMA partition_test")
+            cursor.execute("SET search_path TO partition_test, public")
+            cursor.execute("CREATE TABLE games (LIKE public.games INCLUDING ALL)")
+            cursor.execute("CREATE TABLE game_pgns (LIKE public.game_pgns INCLUDING ALL)")
+            cursor.execute("ALTER TABLE game_pgns ADD FOREIGN KEY (game_id) REFERENCES games (id)")
+            cursor.execute("CREATE INDEX games_live_idx ON games (date) WHERE result = '*'")
+            for number, day in enumerate(self.dates, 1):
+                cursor.execute(
+                    "INSERT INTO games (id, date, result, pgn_hash, source, created_at, updated_at) VALUES (%s, %s, '1-0', %s, 'lichess', now(), now())",
+                    [number, day, f'hash{number}'],
+                )
+                cursor.execute("INSERT INTO game_pgns (game_id, pgn) VALUES (%s, '1. e4 1-0')", [number])
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP SCHEMA partition_test CASCADE")
+            cursor.execute("RESET search_path")
+
+    def test_interrupted_conversion_resumes(self):
+        with connection.cursor() as cursor:
+            # stopped after the table swap and the first batch, before any monthly partition existed
+            with transaction.atomic():
+                partitioning._create_partitioned_table(cursor)
+            partitioning._copy_batch(cursor, 0, 2)
+
+            partitioning.convert_games_table(ListWriter(), batch_size=2)
+
+            cursor.execute("SELECT count(*) FROM games")
+            self.assertEqual(cursor.fetchone()[0], len(self.dates))
+            cursor.execute(f"SELECT id FROM {partitioning.DEFAULT_PARTITION}")
+            self.assertEqual(cursor.fetchall(), [(len(self.dates),)])
+            cursor.execute("SELECT pg_get_indexdef(to_regclass('games_pkey'))")
+            self.assertTrue(cursor.fetchone()[0].endswith('(id, date)'))
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'games_live_idx'")
+            self.assertIn('WHERE', cursor.fetchone()[0])
+        names = [name for name, _ in partitioning.list_partitions()]
+        self.assertIn(partitioning.partition_name(partitioning.month_start(self.dates[5])), names)
+        self.assertNotIn(partitioning.partition_name(partitioning.month_start(self.dates[6])), names)
+
+    def test_games_without_a_date_stop_the_conversion(self):
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE games SET date = NULL WHERE id = 1")
+        with self.assertRaises(ValueError):
+            partitioning.convert_games_table(ListWriter())
+        self.assertFalse(partitioning.is_partitioned())
+
+    def test_detached_partitions_take_their_pgns_along(self):
+        partitioning.convert_games_table(ListWriter())
+        cutoff = partitioning.month_start(self.dates[0])
+        detached = partitioning.detach_partitions_before(cutoff)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT game_id FROM game_pgns ORDER BY game_id")
+            kept = [row[0] for row in cursor.fetchall()]
+            cursor.execute(" UNION ALL ".join(f"SELECT game_id FROM {name}_pgns" for name in detached))
+            archived = [row[0] for row in cursor.fetchall()]
+        self.assertEqual(kept, [number for number, day in enumerate(self.dates, 1) if day >= cutoff or number == len(self.dates)])
+        self.assertEqual(sorted(kept + archived), list(range(1, len(self.dates) + 1)))
+
+
+def exported(pgn):
+    """The PGN as stored at ingest: python-chess's export of it."""
+    return str(chess.pgn.read_game(io.StringIO(pgn)))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CompactPgnTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def assertRoundTrips(self, pgn):
+        encoded = encode_pgn(pgn)
+        self.assertIsNotNone(encoded)
+        self.assertEqual(decode_pgn(*encoded), pgn)
+
+    def test_clocks_round_trip(self):
+        pgn = exported(LIVE_GAME.format(result='1-0').replace('0:02:58]', '0:02:58.1]').replace('0:02:56]', '0:02:56.25]'))
+        self.assertRoundTrips(pgn.replace(' { [%clk 0:02:54] }', ''))
+
+    def test_non_standard_tags_round_trip_in_order(self):
+        self.assertRoundTrips(exported(LICHESS_GAME.format().replace('[Event ', '[Annotator "lichess"]\n[Event ')))
+
+    def test_variations_and_comments_are_kept_as_text(self):
+        self.assertIsNone(encode_pgn(exported(LIVE_GAME.format(result='1-0').replace('2. Qh5', '2. Qh5 (2. Nf3 Nc6)'))))
+        self.assertIsNone(encode_pgn(exported(LIVE_GAME.format(result='1-0').replace('[%clk 0:02:57]', 'a threat'))))
+
+    def test_column_updates_leave_the_pgn_alone(self):
+        ingest_pgn(LIVE_GAME.format(result='1-0'), 'chesscom', ListWriter())
+        game = Game.objects.get()
+        original = game.pgn_text
+        pgn_data = GamePgn.objects.get(game=game)
+        pgn_data.pgn_moves, pgn_data.pgn_clocks, pgn_data.pgn_layout = encode_pgn(pgn_data.pgn)
+        pgn_data.pgn = ''
+        pgn_data.save()
+
+        Game.objects.filter(id=game.id).update(whiteelo='2900', white_username='Renamed', round='5', link='https://example.com')
+        game = Game.objects.select_related('pgn_data').get()
+        self.assertEqual(game.pgn_text, original)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReprocessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ingest_pgn(game_pgn(1, 'A', 'B') + '\n' + game_pgn(2, 'C', 'D'), 'chesscom', ListWriter())
+        self.first, self.second = Game.objects.order_by('id')
+        self.format = self.first.format
+        # as stored by an older format derivation
+        Game.objects.update(format='unknown')
+
+    def test_compact_pgns_are_decoded_in_the_workers(self):
+        pgn_data = GamePgn.objects.get(game=self.first)
+        pgn_data.pgn_moves, pgn_data.pgn_clocks, pgn_data.pgn_layout = encode_pgn(pgn_data.pgn)
+        pgn_data.pgn = ''
+        pgn_data.save()
+
+        self.assertEqual(reprocess_games(ListWriter(), processes=2)['updated'], 2)
+        self.assertEqual(list(Game.objects.values_list('format', flat=True).distinct()), [self.format])
+
+    def test_resume_starts_after_the_stored_checkpoint(self):
+        JobCheckpoint.objects.create(name=CHECKPOINT_NAME, last_id=self.first.id)
+        counts = reprocess_games(ListWriter(), resume=True)
+        self.assertEqual((counts['processed'], counts['last_id']), (1, self.second.id))
+        self.assertEqual(Game.objects.get(id=self.first.id).format, 'unknown')
+        # a finished run leaves no checkpoint behind
+        self.assertFalse(JobCheckpoint.objects.exists())
+
+
+class FakeBroadcastApi:
+    def __init__(self, broadcasts):
+        self.broadcasts = broadcasts
+
+    def iter_broadcasts(self):
+        return iter(self.broadcasts)
+
+
+def broadcast(tour_id, *rounds):
+    """A /api/broadcast entry; rounds are (round id, finished) pairs."""
+    return {
+        'tour': {'id': tour_id, 'name': f"Tour {tour_id}"},
+        'rounds': [{'id': round_id, 'finished': finished} for round_id, finished in rounds],
+    }
+
+
+class BroadcastLedgerTests(TestCase):
+    def ingested(self, round_id, hours_ago=48):
+        broadcast_round = BroadcastRound.objects.create(
+            round_id=round_id, tour_id=round_id, tour_name=round_id,
+            finished_at=timezone.now() - datetime.timedelta(hours=hours_ago),
+        )
+        mark_round_ingested(broadcast_round)
+        return broadcast_round
+
+    def test_finished_rounds_are_recorded_as_pending(self):
+        rounds = scan_rounds_to_ingest(FakeBroadcastApi([broadcast('t1', ('r1', True), ('r2', False))]))
+        self.assertEqual([broadcast_round.round_id for broadcast_round in rounds], ['r1'])
+        self.assertEqual(BroadcastRound.objects.get().status, BroadcastRound.STATUS_PENDING)
+
+    def test_recently_finished_rounds_are_fetched_again(self):
+        self.assertEqual(self.ingested('r1', hours_ago=1).status, BroadcastRound.STATUS_RECHECK)
+        self.assertEqual(self.ingested('r2').status, BroadcastRound.STATUS_INGESTED)
+        rounds = scan_rounds_to_ingest(FakeBroadcastApi([broadcast('t1', ('r1', True), ('r2', True))]))
+        self.assertEqual([broadcast_round.round_id for broadcast_round in rounds], ['r1'])
+
+    def test_tours_without_rounds_do_not_end_the_scan(self):
+        self.ingested('r1')
+        self.ingested('r2')
+        broadcasts = [broadcast('t1', ('r1', True)), broadcast('t2'), broadcast('t3', ('r2', True)), broadcast('t4', ('r3', True))]
+        rounds = scan_rounds_to_ingest(FakeBroadcastApi(broadcasts), stop_after=2)
+        self.assertEqual([broadcast_round.round_id for broadcast_round in rounds], ['r3'])
+
+
+# the pipeline stages write from their own threads and database connections
+@override_settings(CACHES=LOCMEM_CACHE)
+class RawArchiveTests(TransactionTestCase):
+    url = "https://api.chess.com/pub/player/playerone/games/2025/05/pgn"
+
+    def setUp(self):
+        cache.clear()
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+        self.enterContext(self.settings(RAW_ARCHIVE_ENABLED=True, RAW_ARCHIVE_DIR=archive_dir))
+
+    def test_fetched_payloads_are_replayed(self):
+        payload = LIVE_GAME.format(result='1-0')
+        ingest_jobs([IngestJob(lambda: payload, 'chesscom', url=self.url)], ListWriter())
+        self.assertEqual(read_raw_fetch(RawFetch.objects.get()), payload)
+
+        Game.objects.all().delete()
+        cache.clear()
+        counts = replay_raw_archive(ListWriter())
+        self.assertEqual(counts['created'], 1)
+        self.assertEqual(RawFetch.objects.count(), 1)
+
+    def test_prune_keeps_payloads_of_recent_fetches(self):
+        shared = store_raw_fetch('chesscom', self.url, 'shared payload')
+        store_raw_fetch('chesscom', self.url, 'shared payload')
+        expired = store_raw_fetch('chesscom', self.url, 'expired payload')
+        RawFetch.objects.filter(id__in=[shared.id, expired.id]).update(fetched_at=timezone.now() - datetime.timedelta(days=40))
+
+        counts = prune_raw_archive(30)
+        self.assertEqual((counts['fetches'], counts['payloads']), (2, 1))
+        self.assertEqual(read_raw_fetch(RawFetch.objects.get()), 'shared payload')
+        self.assertEqual(len([name for _, _, names in os.walk(settings.RAW_ARCHIVE_DIR) for name in names]), 1)
+
+
+class RedisBloomFilterTests(SimpleTestCase):
+    def setUp(self):
+        self.bloom = RedisBloomFilter(fakeredis.FakeStrictRedis(), capacity=1000, error_rate=0.001)
+
+    def test_added_items_are_found(self):
+        self.assertEqual(self.bloom.add_many(['a', 'b']), 2)
+        self.assertEqual(self.bloom.add_many(['b', 'c']), 1)
+        self.assertEqual(self.bloom.contains_many(['a', 'b', 'c', 'd']), {'a', 'b', 'c'})
+        self.assertEqual(self.bloom.count(), 3)
+
+    def test_rebuild_replaces_the_filter(self):
+        self.bloom.add_many(['deleted'])
+        self.assertEqual(self.bloom.rebuild(iter(['a', 'b']), batch_size=1), 2)
+        self.assertEqual(self.bloom.contains_many(['a', 'b', 'deleted']), {'a', 'b'})
+        self.assertEqual(self.bloom.count(), 2)
+
+    def test_keys_committed_during_a_rebuild_are_kept(self):
+        def stored_keys():
+            yield 'a'
+            # a game saved by an ingest after the rebuild read its rows
+            self.bloom.add_many(['saved meanwhile'])
+            self.assertIn('saved meanwhile', self.bloom.contains_many(['saved meanwhile']))
+            yield 'b'
+
+        self.bloom.rebuild(stored_keys(), batch_size=1)
+        self.assertEqual(self.bloom.contains_many(['a', 'b', 'saved meanwhile']), {'a', 'b', 'saved meanwhile'})
+        self.assertEqual(self.bloom.count(), 3)
+        # later commits only go to the live filter
+        self.bloom.add_many(['after'])
+        self.assertFalse(self.bloom.client.exists(self.bloom.rebuild_key))
+
+
+def http_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b'')
+    return response
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() only advances monotonic()."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class HttpClientTests(SimpleTestCase):
+    url = "https://api.chess.com/pub/player/hikaru/games/2025/05/pgn"
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.enterContext(mock.patch('repo.utils.http.time', self.clock))
+        self.client = HttpClient(max_retries=2, backoff_factor=1.0, max_backoff=30)
+        self.client.session = mock.Mock()
+
+    def respond(self, *responses):
+        self.client.session.request.side_effect = list(responses)
+
+    def test_429_waits_for_retry_after(self):
+        self.respond(http_response(429, {'Retry-After': '7'}), http_response(200))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.clock.sleeps, [7.0])
+
+    def test_server_errors_back_off_exponentially(self):
+        self.respond(http_response(503), http_response(502), http_response(200))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        # backoff_factor * 2 ** attempt, plus up to backoff_factor of jitter
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertTrue(1 <= self.clock.sleeps[0] <= 2 and 2 <= self.clock.sleeps[1] <= 3)
+
+    def test_exhausted_retries_return_the_last_response(self):
+        self.respond(http_response(500), http_response(500), http_response(500))
+        self.assertEqual(self.client.get(self.url).status_code, 500)
+        self.assertEqual(self.client.session.request.call_count, 3)
+
+    def test_exhausted_retries_raise_network_errors(self):
+        self.respond(*[requests.exceptions.ConnectionError("reset")] * 3)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.client.get(self.url)
+        self.assertEqual(len(self.clock.sleeps), 2)
+
+    def test_not_modified_is_returned_without_retrying(self):
+        self.respond(http_response(304))
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': '"abc"'}).status_code, 304)
+        self.assertEqual(self.client.session.request.call_count, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_rate_limiter_spaces_requests_after_a_burst(self):
+        limiter = RateLimiter(rate=2, burst=2)
+        for _ in range(4):
+            limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [0.5, 0.5])
+
+
+class FakeChesscomApi:
+    """Serves monthly archives from `archives` {(year, month): (etag, pgn)}, answering 304 to a matching ETag."""
+
+    def __init__(self, archives):
+        self.archives = archives
+        self.requests = []
+        self.http = self
+
+    def fetch_many(self, items, fetch, max_workers=8):
+        return ((item, fetch(item)) for item in items)
+
+    def get_player_archives(self, username):
+        return sorted(self.archives)
+
+    def month_pgn_url(self, username, year, month):
+        return f"https://api.chess.com/pub/player/{username}/games/{year:04d}/{month:02d}/pgn"
+
+    def get_player_games_month_pgn(self, username, year, month, etag=None, last_modified=None):
+        self.requests.append((year, month, etag))
+        current_etag, pgn = self.archives[(year, month)]
+        if etag == current_etag:
+            return {'status': 304, 'pgn': None, 'etag': etag, 'last_modified': last_modified}
+        return {'status': 200, 'pgn': pgn, 'etag': current_etag, 'last_modified': None}
+
+
+# the pipeline stages write from their own threads and database connections
+@override_settings(CACHES=LOCMEM_CACHE)
+class ChesscomSyncTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.current = (now.year, now.month)
+        self.current_date = f"{now.year}.{now.month:02d}.01"
+
+    def use_api(self, archives):
+        api = FakeChesscomApi(archives)
+        self.enterContext(mock.patch('repo.utils.chesscom.sync.CHESSCOM_API', return_value=api))
+        return api
+
+    def test_unchanged_archive_costs_a_304(self):
+        api = self.use_api({self.current: ('"v1"', game_pgn(1, 'PlayerOne', 'PlayerTwo', date=self.current_date))})
+        statuses, counts = sync_players(['playerone'], ListWriter())
+        self.assertEqual((statuses['fetched'], counts['created']), (1, 1))
+
+        statuses, counts = sync_players(['playerone'], ListWriter())
+        self.assertEqual((statuses['not_modified'], counts['created']), (1, 0))
+        self.assertEqual(api.requests, [(*self.current, None), (*self.current, '"v1"')])
+
+    def test_current_month_is_fetched_again_when_it_changed(self):
+        api = self.use_api({self.current: ('"v1"', game_pgn(1, 'PlayerOne', 'PlayerTwo', date=self.current_date))})
+        sync_players(['playerone'], ListWriter())
+        api.archives[self.current] = ('"v2"', api.archives[self.current][1] + '\n' + game_pgn(2, 'PlayerOne', 'PlayerTwo', date=self.current_date))
+
+        statuses, counts = sync_players(['playerone'], ListWriter())
+        self.assertEqual((statuses['fetched'], counts['created']), (1, 1))
+        state = ChesscomArchiveState.objects.get()
+        self.assertEqual(state.etag, '"v2"')
+        # the current month still changes, it is never checkpointed as completed
+        self.assertIsNone(state.completed_at)
+
+    def test_backfill_skips_completed_months_and_the_current_month(self):
+        api = self.use_api({
+            (2025, 4): ('"a"', game_pgn(1, 'PlayerOne', 'PlayerTwo', date='2025.04.01')),
+            (2025, 5): ('"b"', game_pgn(2, 'PlayerOne', 'PlayerTwo', date='2025.05.01')),
+            self.current: ('"c"', game_pgn(3, 'PlayerOne', 'PlayerTwo', date=self.current_date)),
+        })
+        ChesscomArchiveState.objects.create(username='playerone', year=2025, month=4, completed_at=timezone.now())
+
+        statuses, counts = backfill_players(['playerone'], ListWriter())
+        self.assertEqual((statuses['completed'], statuses['fetched'], counts['created']), (1, 1, 1))
+        self.assertEqual(api.requests, [(2025, 5, None)])
+        self.assertIsNotNone(ChesscomArchiveState.objects.get(year=2025, month=5).completed_at)
+
+
+class ParsedBatchesTests(SimpleTestCase):
+    def test_pooled_parsing_matches_serial_parsing(self):
+        pgn = '\n'.join(
+            [game_pgn(number, f'White{number}', f'Black{number}', result='*' if number % 4 == 0 else '1-0') for number in range(10)]
+            + [LICHESS_GAME.format()]
+        )
+        serial = list(iter_parsed_batches(pgn, batch_size=3, workers=1))
+        pooled = list(iter_parsed_batches(pgn, batch_size=3, workers=2))
+        self.assertEqual(len(serial), 4)
+        self.assertEqual(pooled, serial)
+
+
+class PgnPrefilterTests(SimpleTestCase):
+    def headers(self, pgn):
+        return chess.pgn.read_headers(io.StringIO(pgn))
+
+    def test_rules(self):
+        game = self.headers(LIVE_GAME.format(result='1-0'))
+        self.assertTrue(PgnPrefilter(min_elo=2750, players=['playerone'], formats=['blitz', 'bullet']).matches(game))
+        self.assertFalse(PgnPrefilter(min_elo=2790).matches(game))
+        self.assertFalse(PgnPrefilter(titled_only=True).matches(game))
+        self.assertFalse(PgnPrefilter(players=['someone']).matches(game))
+        self.assertFalse(PgnPrefilter(variants=['chess960']).matches(game))
+
+    def test_ended_after_lets_games_without_an_end_time_through(self):
+        ended_after = datetime.datetime(2025, 5, 6, 13, tzinfo=datetime.timezone.utc)
+        ended = LIVE_GAME.format(result='1-0').replace('[EndTime', '[EndDate "2025.05.06"]\n[EndTime')
+        self.assertFalse(PgnPrefilter(ended_after=ended_after).matches(self.headers(ended)))
+        self.assertTrue(PgnPrefilter(ended_after=ended_after).matches(self.headers(LICHESS_GAME.format())))
+
+    def test_filtered_games_are_never_fully_parsed(self):
+        weak = game_pgn(1, 'PlayerOne', 'PlayerTwo').replace('"2800"', '"1200"')
+        strong = game_pgn(2, 'PlayerOne', 'PlayerTwo')
+        with mock.patch.object(chess.pgn, 'read_game', wraps=chess.pgn.read_game) as read_game:
+            parsed = parse_game_texts([weak, strong], PgnPrefilter(min_elo=2000))
+        # read_headers goes through read_game too, with a headers-only visitor
+        full_parses = [call for call in read_game.call_args_list if 'Visitor' not in call.kwargs]
+        self.assertEqual(len(full_parses), 1)
+        self.assertEqual([parsed_game.headers['Link'] for _, parsed_game in parsed], ['https://www.chess.com/game/live/2'])
+
+    def test_unfinished_games_pass_without_an_identity(self):
+        unfinished = LIVE_GAME.format(result='*')
+        finished = game_pgn(2, 'PlayerOne', 'PlayerTwo')
+        candidates = _scan_headers([unfinished, finished], PgnPrefilter(min_elo=2000))
+        self.assertEqual(
+            [identity for _, identity in candidates],
+            [None, generate_game_identity(self.headers(finished))],
+        )
@@ -1,15 +1,88 @@
 import requests
+from django.conf import settings
+from repo.utils.http import HttpClient, RateLimiter
 import datetime
 import chess # Ensure this is imported if type hints use it
 import chess.pgn
 import io
-# import json # No longer needed in this file with the removal of archive list fetching
 
 class CHESSCOM_API:
     BASE_URL = "https://api.chess.com/pub/player"
     HEADERS = {
         'User-Agent': 'Chessrepo/1.0 (akinxwumi@proton.me)'
     }
+    # One pooled client shared by every instance (keep-alive, timeouts, retries, per-host limit),
+    # so all threads draw on the same CHESSCOM_REQUESTS_PER_SECOND budget
+    http = HttpClient(headers=HEADERS, rate_limiter=RateLimiter(settings.CHESSCOM_REQUESTS_PER_SECOND))
+
+    def get_player_archives(self, username: str) -> list | None:
+        """
+        Lists the months a player has games in, from the /games/archives endpoint.
+
+        Returns:
+            A sorted list of (year, month) tuples, an empty list if the player does not exist (404),
+            or None if the list could not be fetched.
+        """
+        url = f"{self.BASE_URL}/{username}/games/archives"
+        try:
+            response = self.http.get(url)
+        except requests.exceptions.RequestException as req_err:
+            print(f"An error occurred while requesting the archive list of {username}: {req_err}")
+            return None
+        if response.status_code == 404:
+            return []
+        if response.status_code != 200:
+            print(f"HTTP error occurred while fetching the archive list of {username}: Status: {response.status_code}")
+            return None
+        months = []
+        for archive_url in response.json().get('archives', []):
+            # .../games/YYYY/MM
+            year, month = archive_url.rstrip('/').split('/')[-2:]
+            months.append((int(year), int(month)))
+        return sorted(months)
+
+    def month_pgn_url(self, username: str, year: int, month: int) -> str:
+        return f"{self.BASE_URL}/{username}/games/{year:04d}/{month:02d}/pgn"
+
+    def get_player_games_month_pgn(self, username: str, year: int, month: int, etag: str = None, last_modified: str = None) -> dict:
+        """
+        Retrieves a player's monthly archive as PGN, as a conditional request when the validators
+        of a previous fetch are given.
+
+        Args:
+            username: The Chess.com username of the player.
+            year, month: The archive month.
+            etag, last_modified: ETag / Last-Modified of the previous fetch of this archive, if any.
+
+        Returns:
+            A dict with 'status' (HTTP status, or None on network error), 'pgn' (the archive text,
+            None unless status is 200) and the new 'etag' / 'last_modified' validators.
+            A 304 status means the archive has not changed since the given validators.
+        """
+        url = self.month_pgn_url(username, year, month)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        result = {'status': None, 'pgn': None, 'etag': etag, 'last_modified': last_modified}
+        try:
+            response = self.http.get(url, headers=headers)
+        except requests.exceptions.RequestException as req_err:
+            print(f"An error occurred while requesting games for {username}: {req_err}")
+            return result
+
+        result['status'] = response.status_code
+        if response.status_code == 200:
+            result['pgn'] = response.text
+            result['etag'] = response.headers.get('ETag')
+            result['last_modified'] = response.headers.get('Last-Modified')
+        elif response.status_code == 404:
+            print(f"No games found for {username} for {year:04d}-{month:02d} (404 Not Found). URL: {url}")
+        elif response.status_code != 304:
+            print(f"HTTP error occurred while fetching games for {username}: Status: {response.status_code}")
+        return result
 
     def get_player_games_current_month_pgn(self, username: str) -> str | None:
         """
@@ -23,26 +96,8 @@ class CHESSCOM_API:
             A string containing the games in PGN format, or None if an error occurs.
         """
         now = datetime.datetime.now()
-        year_str = now.strftime("%Y")
-        month_str = now.strftime("%m") # Format MM (e.g., 01, 11)
-
-        url = f"{self.BASE_URL}/{username}/games/{year_str}/{month_str}/pgn"
-        
-        print(f"Fetching games for {username} for {year_str}-{month_str} from {url}")
-        
-        try:
-            response = requests.get(url, headers=self.HEADERS)
-            response.raise_for_status() 
-            return response.text
-        except requests.exceptions.HTTPError as http_err:
-            if response.status_code == 404:
-                print(f"No games found for {username} for {year_str}-{month_str} (404 Not Found). URL: {url}")
-            else:
-                print(f"HTTP error occurred while fetching games for {username}: {http_err} - Status: {response.status_code}")
-        except requests.exceptions.RequestException as req_err:
-            print(f"An error occurred while requesting games for {username}: {req_err}")
-        
-        return None
+        print(f"Fetching games for {username} for {now.year}-{now.month:02d}")
+        return self.get_player_games_month_pgn(username, now.year, now.month)['pgn']
 
     def get_player_profile(self, username: str) -> dict | None:
         """
@@ -50,17 +105,14 @@ class CHESSCOM_API:
         Args:
             username: The Chess.com username of the player.
         Returns:
-            A dictionary containing the player's profile data, or None if an error occurs.
+            A dictionary containing the player's profile data, or None if the player does not exist (404).
+        Raises:
+            requests.exceptions.RequestException on any other HTTP or network error, so callers
+            can tell a missing player from a transient failure.
         """
         url = f"{self.BASE_URL}/{username}"
-        try:
-            response = requests.get(url, headers=self.HEADERS)
-            response.raise_for_status()
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Unexpected status code {response.status_code} while fetching profile for {username}")
-                return None
-        except requests.exceptions.HTTPError as http_err:
-            print(f"HTTP error occurred while fetching profile for {username}: {http_err}")
-
+        response = self.http.get(url)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
@@ -1,11 +1,64 @@
-# fetch chess.com player data depending on max page and save to json file
-import requests
-from bs4 import BeautifulSoup
+# fetch chess.com player data depending on max page and save to the Player table / a json file
+import hashlib
 import json
-import time
+import os
 import re
 
+import requests
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.db import transaction
+
+from repo.models import Player
+from repo.utils.http import HttpClient, RateLimiter
+from repo.utils.save import find_chesscom_players
+from repo.utils.feed import invalidate_player_feeds
+from repo.utils.tournaments import adjust_title_weights
+
+TITLES = ('GM', 'IM', 'FM', 'CM', 'NM', 'WGM', 'WIM', 'WFM', 'WCM', 'WNM')
+TITLED_NAME_RE = re.compile(rf"^({'|'.join(TITLES)})\s+(.+)$")
+
+
+class PageCache:
+    """
+    Disk cache of fetched pages keyed by URL, storing the body with the ETag / Last-Modified
+    validators of the response, so a page can be re-requested conditionally and read from disk on 304.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url: str) -> dict | None:
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, url: str, body: str, etag: str = None, last_modified: str = None):
+        entry = {'url': url, 'etag': etag, 'last_modified': last_modified, 'body': body}
+        # write then rename, so concurrent workers never read a partial file
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
 class CHESSCOM_CRAWLER:
+    """
+    Crawls the chess.com titled players listing (/players) and each player's detail page for their
+    /member/ profile URL and username.
+
+    Listing pages and detail pages are fetched in parallel through an HttpClient whose per-host
+    concurrency and rate limit act as the politeness scheduler. Pages are cached on disk with their
+    validators and re-requested conditionally, and detail pages of players whose profile URL is
+    already known are not fetched at all.
+    """
 
     BASE_URL = "https://www.chess.com"
     HEADERS = {
@@ -13,36 +66,53 @@ class CHESSCOM_CRAWLER:
     }
     PLAYERS_LIST_URL = f"{BASE_URL}/players"
     MAX_PAGES = 8
-    OUTPUT_FILE = "utils/chesscom_players.json"
+    OUTPUT_FILE = settings.BASE_DIR / 'data' / 'players.json'
 
-    def get_soup(url):
-        """Fetches a URL and returns a BeautifulSoup object."""
+    def __init__(self, max_pages: int = None, workers: int = 4, requests_per_second: float = 2.0, cache_dir=None):
+        self.max_pages = max_pages or self.MAX_PAGES
+        self.workers = workers
+        self.http = HttpClient(
+            headers=self.HEADERS,
+            timeout=(5, 10),
+            per_host_concurrency=workers,
+            rate_limiter=RateLimiter(requests_per_second),
+        )
+        self.cache = PageCache(cache_dir or settings.CHESSCOM_CRAWLER_CACHE_DIR)
+        self.failed_pages = []
+
+    def get_soup(self, url: str) -> BeautifulSoup | None:
+        """Fetches a URL (conditionally, if it is cached) and returns a BeautifulSoup object."""
+        cached = self.cache.get(url)
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
         try:
-            response = requests.get(url, headers=HEADERS, timeout=10)
+            response = self.http.get(url, headers=headers)
+            if response.status_code == 304 and cached:
+                return BeautifulSoup(cached['body'], 'html.parser')
             response.raise_for_status()  # Raise an exception for HTTP errors
-            return BeautifulSoup(response.content, 'html.parser')
         except requests.exceptions.RequestException as e:
             print(f"Error fetching {url}: {e}")
             return None
+        self.cache.set(url, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return BeautifulSoup(response.text, 'html.parser')
 
-    def extract_player_profile_url(player_page_url):
-        """Extracts the /member/username URL from a player's detail page."""
-        if not player_page_url.startswith('http'):
-            player_page_url = BASE_URL + player_page_url
+    def _absolute(self, url: str) -> str:
+        return url if url.startswith('http') else self.BASE_URL + url
 
-        soup = get_soup(player_page_url)
+    def extract_player_profile_url(self, player_page_url: str):
+        """Extracts the /member/username URL from a player's detail page."""
+        soup = self.get_soup(self._absolute(player_page_url))
         if not soup:
             return None, None
 
         # Look for a link that contains "/member/" in its href
         # This is a common pattern, but might need adjustment if the structure is changed
         profile_link_tag = soup.find('a', href=re.compile(r'/member/'))
-        
         if profile_link_tag and profile_link_tag.get('href'):
-            profile_url = profile_link_tag['href']
-            if not profile_url.startswith('http'):
-                profile_url = BASE_URL + profile_url
-            
+            profile_url = self._absolute(profile_link_tag['href'])
             # Extract username from the profile URL
             match = re.search(r'/member/([^/?]+)', profile_url)
             username = match.group(1) if match else None
@@ -51,126 +121,169 @@ class CHESSCOM_CRAWLER:
         print(f"Could not find profile URL on {player_page_url}")
         return None, None
 
+    def parse_listing(self, soup: BeautifulSoup) -> list:
+        """Returns the players of one listing page as dicts with name, ranking, rating and player_page_url."""
+        players = []
+        seen_links = set()
+        player_links = soup.find_all('a', class_=re.compile(r'master-players-player-name|user-username-component', re.IGNORECASE), href=re.compile(r'/players/'))
+        for player_link_tag in player_links:
+            player_page_link = self._absolute(player_link_tag['href'])
+            if player_page_link in seen_links:
+                continue  # Already processed this player (e.g. if name and username link separately)
+            seen_links.add(player_page_link)
 
-    def get_players_data():
-        all_players_data = []
+            # The rating and rank ("2837 | #1") sit in one of the first few parents of the name link
+            rating, ranking = None, None
+            current_element = player_link_tag
+            for _ in range(4):
+                current_element = current_element.parent
+                if current_element is None:
+                    break
+                text_content = current_element.get_text(separator=' ', strip=True)
+                rating_rank_match = re.search(r'(\d{3,4})\s*\|\s*#(\d+)', text_content)
+                if rating_rank_match:
+                    rating, ranking = rating_rank_match.groups()
+                    break
+                # Fallback: rating and rank in separate elements
+                rating_tag = current_element.find(class_=re.compile(r'master-players-rating', re.IGNORECASE))
+                rank_tag = current_element.find(class_=re.compile(r'master-players-rank', re.IGNORECASE))
+                if rating_tag and rank_tag:
+                    rating = rating_tag.get_text(strip=True)
+                    ranking = rank_tag.get_text(strip=True).replace('#', '')
+                    break
 
-        for page_num in range(1, MAX_PAGES + 1):
-            if page_num == 1:
-                url = PLAYERS_LIST_URL
-            else:
-                url = f"{PLAYERS_LIST_URL}?page={page_num}"
+            player_name = player_link_tag.get_text(strip=True)
+            if not rating or not ranking:
+                print(f"Could not find rating/rank for {player_name}. Structure might have changed.")
+            players.append({
+                "name": player_name,
+                "ranking": ranking,
+                "rating": rating,
+                "player_page_url": player_page_link,
+            })
+        return players
+
+    def get_players_data(self, known: dict = None) -> list:
+        """
+        Crawls the listing pages and the detail pages of new players.
+
+        Args:
+            known: {player_page_url: player dict} of previously crawled players; their profile URL
+                and username are reused instead of fetching their detail page again.
 
-            print(f"Scraping page: {url}")
-            soup = get_soup(url)
-            if not soup:
-                time.sleep(2) # Wait before retrying or moving to next page
+        Returns:
+            A list of player dicts in listing order, with chesscom_profile_url and chesscom_username.
+        """
+        known = known or {}
+        urls = [self.PLAYERS_LIST_URL if page_num == 1 else f"{self.PLAYERS_LIST_URL}?page={page_num}" for page_num in range(1, self.max_pages + 1)]
+
+        pages = {}
+        self.failed_pages = []
+        for url, soup in self.http.fetch_many(urls, self.get_soup, max_workers=self.workers):
+            if soup is None:
+                self.failed_pages.append(url)
                 continue
+            pages[url] = self.parse_listing(soup)
+            print(f"Scraped page {url}: {len(pages[url])} players")
+
+        all_players_data = []
+        seen_links = set()
+        for url in urls:
+            for player_data in pages.get(url, []):
+                if player_data['player_page_url'] not in seen_links:
+                    seen_links.add(player_data['player_page_url'])
+                    all_players_data.append(player_data)
 
-            # Find player entries. This selector needs to be accurate.
-            # Based on the web search results, players are listed.
-            # Common structure: <tr> for tables, or <div> for list items.
-            # Let's assume a structure like <div class="player-row"> or similar.
-            # We will look for elements that seem to contain player name, rating, and a link.
-            
-            # The search results show player items like:
-            # GM Magnus Carlsen 2837 | #1 Norway
-            # We need to find the container for each player.
-            # Let's try to find `<a>` tags with `/players/` in href, then go to parent.
-            
-            player_links = soup.find_all('a', class_=re.compile(r'master-players-player-name|user-username-component', re.IGNORECASE), href=re.compile(r'/players/'))
-
-            # if not player_links:
-            #      # Fallback: Try a more generic approach if specific classes are not found
-            #      # This looks for <tr> elements that seem to contain player data.
-            #      player_containers = soup.find_all('tr', class_=re.compile(r'master-players-table-row', re.IGNORECASE))
-            #      if not player_containers:
-            #          print(f"No player containers found on page {page_num} with common selectors. Trying generic divs.")
-            #          # A very generic attempt if specific table rows aren't found
-            #          player_containers = soup.find_all('div', class_=re.compile(r'player-preview-component|list-item-component', re.IGNORECASE))
-
-
-            processed_player_page_links = set()
-
-            for player_link_tag in player_links:
-                player_name = player_link_tag.get_text(strip=True)
-                player_page_link = player_link_tag['href']
-
-                if not player_page_link.startswith('http'):
-                    player_page_link = BASE_URL + player_page_link
-                
-                if player_page_link in processed_player_page_links:
-                    continue # Already processed this player (e.g. if name and username link separately)
-                processed_player_page_links.add(player_page_link)
-
-                # Find the parent element that contains rating and rank
-                # This often requires inspecting the HTML structure.
-                # Let's assume the rating/rank is near the player_name link.
-                # We might need to go up a few parent levels.
-                current_element = player_link_tag
-                player_info_container = None
-                for _ in range(4): # Try up to 4 parent elements
-                    if current_element.parent:
-                        current_element = current_element.parent
-                        # Look for text matching "rating | #rank" pattern
-                        text_content = current_element.get_text(separator=' ', strip=True)
-                        # Regex to find rating and rank like "2837 | #1"
-                        rating_rank_match = re.search(r'(\d{3,4})\s*\|\s*#(\d+)', text_content)
-                        if rating_rank_match:
-                            player_info_container = current_element
-                            break
-                    else:
-                        break
-                
-                rating = None
-                ranking = None
-
-                if player_info_container:
-                    text_content = player_info_container.get_text(separator=' ', strip=True)
-                    rating_rank_match = re.search(r'(\d{3,4})\s*\|\s*#(\d+)', text_content)
-                    if rating_rank_match:
-                        rating = rating_rank_match.group(1)
-                        ranking = rating_rank_match.group(2)
-                    else:
-                        # Fallback: try to find rating and rank in separate elements if not combined
-                        rating_tag = player_info_container.find(class_=re.compile(r'master-players-rating', re.IGNORECASE))
-                        rank_tag = player_info_container.find(class_=re.compile(r'master-players-rank', re.IGNORECASE))
-                        if rating_tag: rating = rating_tag.get_text(strip=True)
-                        if rank_tag: ranking = rank_tag.get_text(strip=True).replace('#','')
-                
-                if not rating or not ranking:
-                    print(f"Could not find rating/rank for {player_name} on page {page_num}. Structure might have changed.")
-
-
-                print(f"  Found player: {player_name}, Rating: {rating}, Rank: {ranking}, Page: {player_page_link}")
-
-                # Now, go to the player's page to get their /member/ URL
-                profile_url, username = None, None
-                if player_page_link:
-                    print(f"    Fetching profile URL from: {player_page_link}")
-                    profile_url, username = extract_player_profile_url(player_page_link)
-                    time.sleep(1) # Be respectful to the server
-
-                player_data = {
-                    "name": player_name,
-                    "ranking": ranking,
-                    "rating": rating,
-                    "player_page_url": player_page_link,
-                    "chesscom_profile_url": profile_url,
-                    "chesscom_username": username
-                }
-                all_players_data.append(player_data)
-                print(f"    Extracted: Username - {username}, Profile URL - {profile_url}")
-
-            time.sleep(2) # Wait a bit before fetching the next page
+        to_fetch = []
+        for player_data in all_players_data:
+            previous = known.get(player_data['player_page_url'])
+            if previous and previous.get('chesscom_profile_url'):
+                player_data['chesscom_profile_url'] = previous['chesscom_profile_url']
+                player_data['chesscom_username'] = previous.get('chesscom_username')
+            else:
+                to_fetch.append(player_data['player_page_url'])
+        print(f"{len(all_players_data)} players listed, fetching {len(to_fetch)} new profile URLs")
 
+        profiles = dict(self.http.fetch_many(to_fetch, self.extract_player_profile_url, max_workers=self.workers))
+        for player_data in all_players_data:
+            if player_data['player_page_url'] in profiles:
+                profile_url, username = profiles[player_data['player_page_url']] or (None, None)
+                player_data['chesscom_profile_url'] = profile_url
+                player_data['chesscom_username'] = username
         return all_players_data
-    
+
+    @staticmethod
+    def load_json(filename) -> list:
+        try:
+            with open(filename, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
     def save_to_json(data, filename):
         with open(filename, 'w') as f:
             json.dump(data, f, indent=4)
-    
-    def main():
-        players_data = get_players_data()
-        save_to_json(players_data, OUTPUT_FILE)
-        print(f"\nData for {len(players_data)} players saved to {OUTPUT_FILE}")
\ No newline at end of file
+
+    @staticmethod
+    def upsert_players(players_data) -> dict:
+        """
+        Creates a Player for every crawled username that is not stored yet (queued for enrichment)
+        and fills the name and title of stored players that have none, in three queries (plus the
+        strength update of the tournaments of players who got a title). Profile URLs only carry
+        lowercased usernames, so stored players are matched case-insensitively; new ones are
+        stored lowercased and take the display case of their first ingested game.
+
+        Returns:
+            dict: counts of 'created' and 'updated' players.
+        """
+        crawled = {}
+        for player_data in players_data:
+            username = (player_data.get('chesscom_username') or '').lower()
+            if not username:
+                continue
+            match = TITLED_NAME_RE.match(player_data.get('name') or '')
+            title, name = match.groups() if match else (None, player_data.get('name'))
+            crawled[username] = {'name': name, 'title': title}
+
+        existing = find_chesscom_players(crawled)
+        updated = []
+        title_changes = {}
+        for username, player in existing.items():
+            fields = {field: value for field, value in crawled[username].items() if value and not getattr(player, field)}
+            if fields:
+                if 'title' in fields:
+                    title_changes[player.id] = (player.title, fields['title'])
+                for field, value in fields.items():
+                    setattr(player, field, value)
+                updated.append(player)
+        if updated:
+            with transaction.atomic():
+                Player.objects.bulk_update(updated, ['name', 'title'])
+                tournament_ids = adjust_title_weights(title_changes)
+                invalidate_player_feeds([player.id for player in updated], tournament_ids)
+
+        new_players = [
+            Player(chesscom_username=username, needs_enrichment=True, **values)
+            for username, values in crawled.items()
+            if username not in existing
+        ]
+        Player.objects.bulk_create(new_players, ignore_conflicts=True)
+        return {'created': len(new_players), 'updated': len(updated)}
+
+    def main(self, output_file=None, write_json: bool = False) -> dict:
+        """
+        Crawls the players listing, upserts the players into the Player table and, with write_json,
+        writes the crawled list to output_file (default data/players.json), unless a listing page failed.
+        Players already in output_file keep their profile URL without a detail page fetch.
+        """
+        output_file = output_file or self.OUTPUT_FILE
+        known = {entry['player_page_url']: entry for entry in self.load_json(output_file) if entry.get('player_page_url')}
+        players_data = self.get_players_data(known)
+        counts = self.upsert_players(players_data)
+        if write_json and self.failed_pages:
+            print(f"\nNot writing {output_file}: {len(self.failed_pages)} listing pages could not be fetched")
+        elif write_json:
+            self.save_to_json(players_data, output_file)
+            print(f"\nData for {len(players_data)} players saved to {output_file}")
+        return counts
@@ -0,0 +1,189 @@
+import copy
+import datetime
+import json
+from collections import Counter
+from django.conf import settings
+from django.utils import timezone
+from repo.models import ChesscomArchiveState, Player
+from repo.utils.chesscom.api import CHESSCOM_API
+from repo.utils.pipeline import IngestJob, ingest_jobs
+from repo.utils.pgn import PgnPrefilter, parse_pgn_datetime
+
+DEFAULT_PLAYERS_FILE = settings.BASE_DIR / 'data' / 'players.json'
+
+
+def sync_player_month(username: str, year: int, month: int, stdout_writer, prefilter: PgnPrefilter = None):
+    """
+    Incrementally ingests one chess.com monthly archive.
+
+    The archive is requested with the ETag/Last-Modified of the previous fetch, so an unchanged
+    archive costs a 304 and nothing else. When it did change, only games that ended at or after
+    the stored watermark reach the parser. Validators and watermark are only advanced when every
+    game was saved, so a failed run is retried in full next time.
+
+    Returns:
+        tuple: (status, counts) where status is 'not_modified', 'fetched' or 'failed' and counts
+        holds the 'created', 'updated', 'skipped' and 'error' games.
+    """
+    statuses, counts = sync_players([username], stdout_writer, year, month, prefilter, max_workers=1)
+    status, = statuses
+    return status, counts
+
+
+def _month_job(chesscom_api: CHESSCOM_API, state: ChesscomArchiveState, prefilter: PgnPrefilter = None, mark_completed: bool = False):
+    """
+    Builds the pipeline job syncing one archive month as described in sync_player_month.
+    With `mark_completed`, the month is also checkpointed as completed once fully ingested.
+
+    Returns:
+        tuple: (job, outcome) where outcome['status'] ends up 'not_modified', 'fetched' or 'failed'.
+    """
+    username, year, month = state.username, state.year, state.month
+    outcome = {'status': 'failed'}
+    response = {}
+
+    rules = copy.copy(prefilter) if prefilter is not None else PgnPrefilter()
+    if state.last_end_time and (rules.ended_after is None or rules.ended_after < state.last_end_time):
+        rules.ended_after = state.last_end_time
+
+    end_times = [state.last_end_time] if state.last_end_time else []
+
+    def fetch():
+        response.update(chesscom_api.get_player_games_month_pgn(username, year, month, etag=state.etag, last_modified=state.last_modified))
+        state.last_fetched_at = timezone.now()
+        if response['status'] == 304:
+            outcome['status'] = 'not_modified'
+            update_fields = ['last_fetched_at']
+            # a 304 means the validators of an earlier error-free fetch still hold
+            if mark_completed:
+                state.completed_at = state.last_fetched_at
+                update_fields.append('completed_at')
+            state.save(update_fields=update_fields)
+            return None
+        return response['pgn']
+
+    def track_watermark(games_data):
+        for game_data in games_data:
+            ended_at = parse_pgn_datetime(game_data.get('enddate'), game_data.get('endtime'))
+            if ended_at:
+                end_times.append(ended_at)
+
+    def done(counts):
+        outcome['status'] = 'fetched'
+        if counts['error'] == 0:
+            state.etag = response['etag']
+            state.last_modified = response['last_modified']
+            state.last_end_time = max(end_times, default=None)
+            if mark_completed:
+                state.completed_at = timezone.now()
+        state.save()
+
+    job = IngestJob(
+        fetch, 'chesscom',
+        prefilter=rules,
+        source_info=f"chess.com {username} {year}-{month:02d}",
+        on_saved=track_watermark,
+        on_done=done,
+        url=chesscom_api.month_pgn_url(username, year, month),
+    )
+    return job, outcome
+
+
+def sync_player_current_month(username: str, stdout_writer, prefilter: PgnPrefilter = None):
+    """sync_player_month for the current UTC month."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return sync_player_month(username, now.year, now.month, stdout_writer, prefilter)
+
+
+def tracked_chesscom_usernames(players_file=None) -> list:
+    """
+    Returns the chess.com usernames to sync: the 'chesscom_username' entries of a players JSON
+    file (such as data/players.json) when one is given, otherwise every Player with a username.
+    """
+    if players_file:
+        with open(players_file, encoding='utf-8') as f:
+            usernames = [entry.get('chesscom_username') for entry in json.load(f)]
+    else:
+        usernames = Player.objects.exclude(chesscom_username__isnull=True).values_list('chesscom_username', flat=True)
+    return list(dict.fromkeys(username for username in usernames if username))
+
+
+def sync_players(usernames, stdout_writer, year: int = None, month: int = None, prefilter: PgnPrefilter = None, max_workers: int = None):
+    """
+    sync_player_month for many players at once (current UTC month by default).
+
+    Archive states are loaded with one query up front. The archives then go through the staged
+    ingestion pipeline (repo.utils.pipeline.ingest_jobs): `max_workers` downloads (default
+    CHESSCOM_SYNC_WORKERS) run in parallel, all drawing on the chess.com client's shared rate
+    budget, while the archives already downloaded are parsed and saved.
+
+    Returns:
+        tuple: (statuses, counts) where statuses counts the players per sync_player_month status
+        and counts sums the 'created', 'updated', 'skipped' and 'error' games.
+    """
+    if year is None or month is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        year, month = now.year, now.month
+    usernames = list(dict.fromkeys(usernames))
+
+    ChesscomArchiveState.objects.bulk_create(
+        [ChesscomArchiveState(username=username, year=year, month=month) for username in usernames],
+        ignore_conflicts=True,
+    )
+    states = ChesscomArchiveState.objects.filter(username__in=usernames, year=year, month=month)
+
+    chesscom_api = CHESSCOM_API()
+    jobs = [_month_job(chesscom_api, state, prefilter) for state in states]
+    counts = ingest_jobs((job for job, _ in jobs), stdout_writer, fetch_workers=max_workers or settings.CHESSCOM_SYNC_WORKERS)
+    return Counter(outcome['status'] for _, outcome in jobs), counts
+
+
+def backfill_players(usernames, stdout_writer, since: tuple = None, prefilter: PgnPrefilter = None, max_workers: int = None):
+    """
+    Ingests the past monthly archives of each player, resumably.
+
+    The players' archive lists are fetched first, then every past month (from `since`, a
+    (year, month) tuple, if given) that has no completed ChesscomArchiveState goes through the
+    ingestion pipeline like sync_players. A month is checkpointed as completed only once all of
+    its games were saved, so a crashed or interrupted run picks up the remaining months on the
+    next call. The current month is left to sync_players, as it still changes.
+
+    Returns:
+        tuple: (statuses, counts) as for sync_players, plus statuses['completed'] for months that
+        were already done and statuses['no_archive_list'] for players whose list could not be read.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    current_month = (now.year, now.month)
+    usernames = list(dict.fromkeys(usernames))
+    max_workers = max_workers or settings.CHESSCOM_SYNC_WORKERS
+    chesscom_api = CHESSCOM_API()
+
+    statuses = Counter()
+    months = []
+    for username, archives in chesscom_api.http.fetch_many(usernames, chesscom_api.get_player_archives, max_workers=max_workers):
+        if archives is None:
+            statuses['no_archive_list'] += 1
+            continue
+        months.extend(
+            (username, year, month) for year, month in archives
+            if (year, month) < current_month and (since is None or (year, month) >= tuple(since))
+        )
+
+    ChesscomArchiveState.objects.bulk_create(
+        [ChesscomArchiveState(username=username, year=year, month=month) for username, year, month in months],
+        ignore_conflicts=True,
+    )
+    states = {
+        (state.username, state.year, state.month): state
+        for state in ChesscomArchiveState.objects.filter(username__in=usernames)
+    }
+    jobs = []
+    for key in sorted(months):
+        if states[key].completed_at is None:
+            jobs.append(_month_job(chesscom_api, states[key], prefilter, mark_completed=True))
+        else:
+            statuses['completed'] += 1
+
+    counts = ingest_jobs((job for job, _ in jobs), stdout_writer, fetch_workers=max_workers)
+    statuses.update(outcome['status'] for _, outcome in jobs)
+    return statuses, counts
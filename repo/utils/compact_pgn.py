@@ -0,0 +1,117 @@
+"""
+Compact storage of a game's PGN (see GamePgn.pgn_moves / pgn_clocks / pgn_layout).
+
+The moves are stored as one byte per ply, the index of the move among the legal moves of the
+position sorted by UCI. The [%clk] comments are stored as a packed array of unsigned 32-bit
+integers. The tags are stored as they were in the original PGN, in the layout: Game columns
+derived from them (ratings, names, tournament...) change later, on enrichment, upserts or
+reprocessing, and the PGN must not. The PGN is rebuilt with python-chess's exporter, which is also
+what produced the stored text at ingest (pgn_to_dict stores str(game)). encode_pgn only accepts
+a game whose rebuilt text is byte-identical to the original.
+"""
+import io
+import json
+import re
+import struct
+
+import chess
+import chess.pgn
+
+COMPACT_FIELDS = ['pgn_moves', 'pgn_clocks', 'pgn_layout']
+# GamePgn fields holding a game's PGN, as text or compactly
+PGN_FIELDS = ['pgn', *COMPACT_FIELDS]
+# Game columns a Game needs loaded, with select_related('pgn_data'), to rebuild its PGN
+PGN_COLUMNS = [f'pgn_data__{field}' for field in PGN_FIELDS]
+
+CLOCK_RE = re.compile(r"\[%clk (\d+):(\d{2}):(\d{2})(?:\.(\d{1,3}))?\]")
+# Clock array entry of a move without a clock comment
+NO_CLOCK = 0xFFFFFFFF
+
+
+def _sorted_legal_moves(board: chess.Board) -> list:
+    # sorted, so the indexes do not depend on python-chess's move generation order
+    return sorted(board.legal_moves, key=lambda move: move.uci())
+
+
+def _encode_clock(comment: str) -> int | None:
+    if not comment:
+        return NO_CLOCK
+    match = CLOCK_RE.fullmatch(comment)
+    if not match:
+        return None
+    hours, minutes, seconds, fraction = match.groups()
+    fraction = fraction or ""
+    millis = ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, "0"))
+    # lowest two bits: how many fraction digits were written out (chess.com writes 0 to 3)
+    value = millis << 2 | len(fraction)
+    return value if value < NO_CLOCK else None
+
+
+def _decode_clock(value: int) -> str:
+    if value == NO_CLOCK:
+        return ""
+    digits = value & 3
+    millis = value >> 2
+    seconds = millis // 1000
+    clock = f"[%clk {seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return clock + (f".{millis % 1000:03d}"[:digits + 1] if digits else "") + "]"
+
+
+def decode_pgn(moves: bytes, clocks: bytes, layout: list) -> str:
+    """Rebuilds the PGN text of a compact game."""
+    game = chess.pgn.Game(headers=chess.pgn.Headers({}))
+    for tag, value in layout:
+        game.headers[tag] = value
+
+    board = game.board()
+    node = game
+    clock_values = struct.unpack(f"<{len(moves)}I", bytes(clocks))
+    for index, clock in zip(bytes(moves), clock_values):
+        move = _sorted_legal_moves(board)[index]
+        node = node.add_variation(move, comment=_decode_clock(clock))
+        board.push(move)
+    return str(game)
+
+
+def encode_pgn(pgn: str):
+    """
+    Encodes a stored PGN. Returns (moves, clocks, layout), or None if the game cannot be rebuilt
+    byte for byte (variations, NAGs, comments other than a clock, unparsable PGN, ...).
+    """
+    try:
+        game = chess.pgn.read_game(io.StringIO(pgn))
+    except Exception as e:
+        return None
+    if game is None or game.errors or game.comment:
+        return None
+
+    layout = [[tag, value] for tag, value in game.headers.items()]
+
+    move_indexes = []
+    clock_values = []
+    board = game.board()
+    node = game
+    while node.variations:
+        if len(node.variations) > 1:
+            return None
+        node = node.variations[0]
+        if node.nags or node.starting_comment:
+            return None
+        clock = _encode_clock(node.comment)
+        if clock is None:
+            return None
+        move_indexes.append(_sorted_legal_moves(board).index(node.move))
+        clock_values.append(clock)
+        board.push(node.move)
+
+    moves = bytes(move_indexes)
+    clocks = struct.pack(f"<{len(clock_values)}I", *clock_values)
+    # verify the round trip now rather than find out when the PGN is requested
+    if decode_pgn(moves, clocks, layout) != pgn:
+        return None
+    return moves, clocks, layout
+
+
+def compact_size(moves: bytes, clocks: bytes, layout: list) -> int:
+    """Stored bytes of a compact game, for size reports."""
+    return len(moves) + len(clocks) + len(json.dumps(layout))
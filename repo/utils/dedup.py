@@ -0,0 +1,286 @@
+import collections
+import hashlib
+import math
+from django.conf import settings
+from django.core.cache import cache
+from repo.models import Game
+
+# TTL of seen keys when the cache is not Redis and the per-key fallback is used
+DEDUP_TTL = 60 * 60 * 24 * 32  # 32 days
+
+BLOOM_KEY_PREFIX = "dedup:bloom"
+# Seconds a rebuild may go without finishing a batch before add_many stops writing to its filter
+REBUILD_MARKER_TTL = 60 * 10
+
+
+def _redis_client():
+    """Returns the raw redis client behind the default cache, or None if the cache is not django-redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except (ImportError, NotImplementedError):
+        return None
+
+
+class RedisBloomFilter:
+    """
+    Bloom filter stored in a single Redis bitmap, used as the membership structure for seen
+    pgn hashes and game identities. Memory is fixed by the capacity and error rate
+    (about 1.2 bytes per item at 1%) instead of one 64-char key per game.
+
+    Lookups and inserts for a whole batch are sent as one pipeline. A negative answer is exact;
+    a positive one is wrong with probability `error_rate` while the filter holds at most
+    `capacity` items, which is why callers confirm positives against the database.
+
+    The bitmap key embeds the filter geometry, so changing the capacity or error rate starts a
+    fresh (empty) filter; fill it with `manage.py rebuild_dedup_filter`.
+    """
+
+    def __init__(self, client, capacity: int, error_rate: float, prefix: str = BLOOM_KEY_PREFIX):
+        self.client = client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # m = -n ln(p) / ln(2)^2 and k = m / n ln(2); Redis bitmaps are limited to 2^32 bits
+        self.size = min(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 2 ** 32)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.key = f"{prefix}:{self.size}:{self.hash_count}"
+
+    @property
+    def count_key(self) -> str:
+        return f"{self.key}:count"
+
+    def _positions(self, item: str) -> list[int]:
+        # Kirsch-Mitzenmacher double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def contains_many(self, items) -> set:
+        """Returns the items that are (probably) in the filter, with one pipelined round trip."""
+        items = list(items)
+        if not items:
+            return set()
+        pipe = self.client.pipeline(transaction=False)
+        for item in items:
+            for position in self._positions(item):
+                pipe.getbit(self.key, position)
+        bits = pipe.execute()
+        k = self.hash_count
+        return {item for i, item in enumerate(items) if all(bits[i * k:(i + 1) * k])}
+
+    @property
+    def rebuild_key(self) -> str:
+        return f"{self.key}:rebuild"
+
+    @property
+    def rebuilding_key(self) -> str:
+        # set while rebuild() runs, so add_many writes to the filter being built as well
+        return f"{self.key}:rebuilding"
+
+    def add_many(self, items, key: str = None) -> int:
+        """
+        Adds items with one pipelined round trip and returns how many were not in the filter yet.
+        While a rebuild runs, the items also go to the filter being built, in the same MULTI so
+        they land on one side of the swap or the other, never between.
+        """
+        items = list(items)
+        if not items:
+            return 0
+        keys = [key] if key else [self.key]
+        if key is None and self.client.exists(self.rebuilding_key):
+            keys.append(self.rebuild_key)
+        pipe = self.client.pipeline(transaction=len(keys) > 1)
+        for item in items:
+            positions = self._positions(item)
+            for bitmap_key in keys:
+                for position in positions:
+                    pipe.setbit(bitmap_key, position, 1)
+        previous_bits = pipe.execute()
+        k = self.hash_count
+        counts = collections.Counter()
+        for i in range(len(items)):
+            for j, bitmap_key in enumerate(keys):
+                start = (i * len(keys) + j) * k
+                if not all(previous_bits[start:start + k]):
+                    counts[bitmap_key] += 1
+        for bitmap_key, added in counts.items():
+            self.client.incrby(f"{bitmap_key}:count", added)
+        return counts[keys[0]]
+
+    def count(self) -> int:
+        """Approximate number of distinct items added so far."""
+        return int(self.client.get(self.count_key) or 0)
+
+    def estimated_error_rate(self, count: int = None) -> float:
+        """False-positive probability for `count` items (defaults to the current count)."""
+        count = self.count() if count is None else count
+        return (1 - math.exp(-self.hash_count * count / self.size)) ** self.hash_count
+
+    def rebuild(self, items, batch_size: int = 10000) -> int:
+        """
+        Rebuilds the filter from an iterable of items into a scratch key and swaps it in atomically,
+        so deduplication keeps working from the old filter while the rebuild runs. Keys committed
+        meanwhile (add_many) are written to both filters, so the new one does not miss the games
+        saved after `items` was read. Returns the number of distinct items in the new filter.
+        """
+        scratch_key = self.rebuild_key
+        self.client.delete(scratch_key, f"{scratch_key}:count")
+        # expires if the rebuild dies, refreshed with every batch
+        self.client.set(self.rebuilding_key, 1, ex=REBUILD_MARKER_TTL)
+        total = 0
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                total += self.add_many(batch, key=scratch_key)
+                self.client.expire(self.rebuilding_key, REBUILD_MARKER_TTL)
+                batch = []
+        total += self.add_many(batch, key=scratch_key)
+
+        pipe = self.client.pipeline(transaction=True)
+        if total:
+            pipe.rename(scratch_key, self.key)
+            pipe.rename(f"{scratch_key}:count", self.count_key)
+        else:
+            pipe.delete(self.key, self.count_key, scratch_key, f"{scratch_key}:count")
+        pipe.delete(self.rebuilding_key)
+        pipe.execute()
+        return total
+
+
+def get_bloom_filter() -> RedisBloomFilter | None:
+    """Returns the dedup Bloom filter configured in settings, or None if the cache is not Redis."""
+    client = _redis_client()
+    if client is None:
+        return None
+    return RedisBloomFilter(client, settings.DEDUP_BLOOM_CAPACITY, settings.DEDUP_BLOOM_ERROR_RATE)
+
+
+def identity_key(identity: str) -> str:
+    # identity and canonical keys are namespaced so they never clash with pgn hashes
+    return f"identity:{identity}"
+
+
+def canonical_key(canonical_hash: str) -> str:
+    return f"canonical:{canonical_hash}"
+
+
+def find_maybe_seen(keys) -> set:
+    """Returns the subset of keys that may already have been committed, using one round trip."""
+    keys = list(keys)
+    if not keys:
+        return set()
+    bloom = get_bloom_filter()
+    if bloom is None:
+        # Non-redis cache backends (e.g. locmem in development): one key per item
+        return set(cache.get_many(keys).keys())
+    return bloom.contains_many(keys)
+
+
+def _find_new(values, field: str, make_key=None, stored_games=None) -> set:
+    """
+    Returns the values of a batch that are not stored in `field` of the games table yet.
+    Values the filter has never seen are new without touching the database; possible hits
+    (true duplicates or Bloom false positives) are confirmed with a single `field`__in query
+    against `stored_games` (all games by default).
+    """
+    values = set(values)
+    keys = {(make_key(value) if make_key else value): value for value in values}
+    maybe_seen = {keys[key] for key in find_maybe_seen(keys)}
+    if not maybe_seen:
+        return values
+    stored_games = Game.objects.all() if stored_games is None else stored_games
+    stored = set(stored_games.filter(**{f"{field}__in": maybe_seen}).values_list(field, flat=True))
+    return values - stored
+
+
+def find_new_pgn_hashes(pgn_hashes) -> set:
+    """Returns the pgn hashes of a batch that are not stored in the database yet (see _find_new)."""
+    return _find_new(pgn_hashes, 'pgn_hash')
+
+
+def find_new_identities(identities) -> set:
+    """
+    Same as find_new_pgn_hashes for header-derived game identities (see generate_game_identity).
+    Only finished stored games count: an identity stored as an unfinished game is still "new",
+    since the incoming version may complete it.
+    """
+    return _find_new(identities, 'identity_hash', identity_key, Game.objects.exclude(result='*'))
+
+
+def find_cross_source_duplicates(canonical_hashes, source: str) -> set:
+    """
+    Returns the canonical hashes of a batch (see generate_canonical_hash) that are stored for a game
+    of another source than `source`. Only possible hits of the filter are looked up, with one query.
+    A stored game of the same source is not a duplicate: it has its own identity_hash (otherwise
+    the identity dedup had dropped the game), so it is a rematch with the same moves.
+    """
+    keys = {canonical_key(canonical_hash): canonical_hash for canonical_hash in canonical_hashes}
+    maybe_seen = {keys[key] for key in find_maybe_seen(keys)}
+    if not maybe_seen:
+        return set()
+    return set(
+        Game.objects.filter(canonical_hash__in=maybe_seen).exclude(source=source).values_list('canonical_hash', flat=True)
+    )
+
+
+def find_unfinished_identities(identities) -> set:
+    """
+    Returns the identities of a batch that are stored as an unfinished game (result '*').
+    Only the database knows: identities of unfinished games are never added to the filter.
+    """
+    identities = set(identities)
+    if not identities:
+        return set()
+    return set(
+        Game.objects.filter(identity_hash__in=identities, result='*').values_list('identity_hash', flat=True)
+    )
+
+
+def commit_seen(keys):
+    """
+    Adds keys to the dedup filter, all in one pipelined round trip.
+    Must only be called once the corresponding rows are safely in the database.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    bloom = get_bloom_filter()
+    if bloom is None:
+        # add() is SET NX
+        for key in keys:
+            cache.add(key, True, timeout=DEDUP_TTL)
+        return
+    bloom.add_many(keys)
+
+
+def commit_saved_games(games_data):
+    """
+    Commits the pgn, identity and canonical hashes of games that were written (or already existed) to the filter.
+    Identity and canonical hashes are only committed for finished games: the finished version of a
+    live game has the same identity, and often the same moves, as the stored unfinished one.
+    """
+    keys = []
+    for game_data in games_data:
+        keys.append(game_data['pgn_hash'])
+        if game_data.get('result', '*') == '*':
+            continue
+        if game_data.get('identity_hash'):
+            keys.append(identity_key(game_data['identity_hash']))
+        if game_data.get('canonical_hash'):
+            keys.append(canonical_key(game_data['canonical_hash']))
+    commit_seen(keys)
+
+
+def iter_stored_keys(chunk_size: int = 10000):
+    """Streams every pgn, identity and canonical key stored in the games table, for rebuilding the filter."""
+    rows = Game.objects.order_by().values_list('pgn_hash', 'identity_hash', 'canonical_hash', 'result').iterator(chunk_size=chunk_size)
+    for pgn_hash, identity_hash, canonical_hash, result in rows:
+        yield pgn_hash
+        if result == '*':
+            continue
+        if identity_hash:
+            yield identity_key(identity_hash)
+        if canonical_hash:
+            yield canonical_key(canonical_hash)
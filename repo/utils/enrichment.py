@@ -0,0 +1,120 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+from repo.models import Player
+from repo.utils.chesscom.api import CHESSCOM_API
+from repo.utils.lichess.api import LICHESS_API
+from repo.utils.feed import invalidate_player_feeds
+from repo.utils.tournaments import adjust_title_weights
+
+# Player profiles are fetched here, off the ingestion path: ingestion only creates Player rows
+# flagged needs_enrichment, and `manage.py enrich_players` works through them with a bounded
+# thread pool. Profiles that are not found are negatively cached so they are not asked for
+# on every run, and leave the queue like enriched ones: both are refreshed after
+# PLAYER_ENRICHMENT_TTL_DAYS.
+
+
+def _negative_key(player) -> str:
+    if player.chesscom_username:
+        return f"enrichment:miss:chesscom:{player.chesscom_username}"
+    return f"enrichment:miss:fide:{player.fide_id}"
+
+
+def due_players(limit: int = None):
+    """
+    Players waiting for enrichment or due for a refresh, least recently attempted first,
+    so profiles that keep failing move to the back of the queue.
+    """
+    refresh_before = timezone.now() - datetime.timedelta(days=settings.PLAYER_ENRICHMENT_TTL_DAYS)
+    players = (
+        Player.objects.filter(Q(needs_enrichment=True) | Q(last_enrichment_at__lt=refresh_before))
+        .filter((Q(chesscom_username__isnull=False) & ~Q(chesscom_username="")) | (Q(fide_id__isnull=False) & ~Q(fide_id="")))
+        .order_by(F('last_enrichment_at').asc(nulls_first=True), 'id')
+    )
+    return players[:limit] if limit else players
+
+
+def _fetch_profile(player):
+    """Runs in a worker thread: HTTP only, no database access. Returns the profile dict or None if not found."""
+    if player.chesscom_username:
+        return CHESSCOM_API().get_player_profile(player.chesscom_username)
+    return LICHESS_API().get_player_fide_profile(player.fide_id)
+
+
+def _apply_profile(player, player_data):
+    if player.chesscom_username:
+        player.name = player_data.get('name', '')
+        player.country = player_data.get('country', '').split('/')[-1] if player_data.get('country') else None
+        player.title = player_data.get('title', '')
+    else:
+        player.name = player_data.get('name', '')
+        player.country = player_data.get('federation', '')
+        player.title = player_data.get('title', '')
+
+
+def enrich_players(limit: int = None, workers: int = None) -> dict:
+    """
+    Fetches the profiles of due players with at most `workers` concurrent HTTP requests
+    and saves them from the calling thread.
+
+    Returns:
+        dict: counts of 'enriched', 'missing' (not found, negatively cached), 'cached_miss'
+        (skipped because of an earlier miss) and 'error' players.
+    """
+    workers = workers or settings.PLAYER_ENRICHMENT_WORKERS
+    counts = {'enriched': 0, 'missing': 0, 'cached_miss': 0, 'error': 0}
+    players = list(due_players(limit))
+    if not players:
+        return counts
+
+    now = timezone.now()
+    known_misses = cache.get_many([_negative_key(player) for player in players])
+    to_fetch, missed = [], []
+    for player in players:
+        if _negative_key(player) in known_misses:
+            counts['cached_miss'] += 1
+            missed.append(player.id)
+        else:
+            to_fetch.append(player)
+    # out of the queue until the next refresh, or they would be selected again on every run
+    Player.objects.filter(id__in=missed).update(needs_enrichment=False, last_enrichment_at=now)
+
+    negative_ttl = settings.PLAYER_ENRICHMENT_NEGATIVE_TTL_DAYS * 24 * 60 * 60
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(player, executor.submit(_fetch_profile, player)) for player in to_fetch]
+        for player, future in futures:
+            try:
+                player_data = future.result()
+            except Exception as e:
+                print(f"Failed to fetch data for {player.chesscom_username or player.fide_id}: {e}")
+                counts['error'] += 1
+                player.last_enrichment_at = now
+                player.save(update_fields=['last_enrichment_at'])
+                continue
+
+            if not player_data:
+                cache.set(_negative_key(player), True, timeout=negative_ttl)
+                counts['missing'] += 1
+                player.needs_enrichment = False
+                player.last_enrichment_at = now
+                player.save(update_fields=['needs_enrichment', 'last_enrichment_at'])
+                continue
+
+            old_profile = (player.name, player.title, player.country)
+            _apply_profile(player, player_data)
+            player.needs_enrichment = False
+            player.last_enrichment_at = now
+            with transaction.atomic():
+                player.save()
+                # the player's tournaments were counted with the old title
+                tournament_ids = adjust_title_weights({player.id: (old_profile[1], player.title)})
+                # a refresh usually changes nothing, and then the stored feeds are still right
+                if tournament_ids or (player.name, player.title, player.country) != old_profile:
+                    invalidate_player_feeds([player.id], tournament_ids)
+            counts['enriched'] += 1
+
+    return counts
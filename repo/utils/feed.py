@@ -0,0 +1,228 @@
+import collections
+import datetime
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from repo.models import DailyFeed, Game, Tournament
+from repo.utils.tournaments import calculate_tournament_strength
+
+# Group of the games without a tournament
+UNCATEGORIZED = "Uncategorized"
+FEED_FIELDS = [
+    'id', 'result', 'tournament', 'endtime', 'combined_rating', 'tournament_group_id', 'tournament_group__strength',
+    'white__id', 'white__title', 'white__name', 'white_username',
+    'black__id', 'black__title', 'black__name', 'black_username',
+]
+
+
+def group_key(tournament) -> str:
+    """The index page group of a Game.tournament value."""
+    return (tournament or '').strip() or UNCATEGORIZED
+
+
+def _day_games(target_date, groups=None):
+    """
+    The games of a date (only those of the `groups` group keys if given) as FEED_FIELDS rows,
+    strongest first and unrated games last. The ordering is done by the database on the
+    (date, combined_rating DESC NULLS LAST) index; endtime breaks ties, and the order is kept
+    through the grouping.
+    """
+    games = Game.objects.filter(date=target_date)
+    if groups is not None:
+        condition = Q()
+        for group in groups:
+            if group == UNCATEGORIZED:
+                condition |= Q(tournament__isnull=True) | Q(tournament='')
+            else:
+                condition |= Q(tournament_group__name=group) | Q(tournament=group)
+        games = games.filter(condition)
+    rows = games.select_related('white', 'black').values(*FEED_FIELDS).order_by(F('combined_rating').desc(nulls_last=True), 'endtime')
+    return [row for row in rows if groups is None or group_key(row['tournament']) in groups]
+
+
+def _feed_game(game) -> dict:
+    """The template data of one game, JSON serializable."""
+    white_id = game['white__id']
+    black_id = game['black__id']
+    white_name = (game['white__name'] or game['white_username'] or '').lower().strip()
+    black_name = (game['black__name'] or game['black_username'] or '').lower().strip()
+
+    # Create a normalized player pair identifier using player IDs when available
+    tournament = game['tournament'] or ''
+    if white_id and black_id:
+        player_ids = sorted([white_id, black_id])
+        player_pair = f"id-{tournament}-{player_ids[0]}-{player_ids[1]}"
+    else:
+        players = sorted([white_name, black_name])
+        player_pair = f"name-{tournament}-{players[0]}-{players[1]}"
+
+    return {
+        'id': game['id'],
+        'white': {
+            'title': game['white__title'],
+            'name': game['white__name'],
+            'id': white_id,
+        },
+        'white_username': game['white_username'],
+        'black': {
+            'title': game['black__title'],
+            'name': game['black__name'],
+            'id': black_id,
+        },
+        'black_username': game['black_username'],
+        'result': game['result'],
+        'tournament': game['tournament'],
+        'endtime': game['endtime'].isoformat() if game['endtime'] else None,
+        'player_pair': player_pair,
+        'total_rating': game['combined_rating'] or 0,
+    }
+
+
+def _build_groups(rows) -> list:
+    """
+    Groups FEED_FIELDS rows by tournament; the tournament is part of player_pair, so a pair never
+    spans two groups. Each group has its strength: the precomputed Tournament.strength, with the
+    id of that Tournament, or computed from its games when they are not linked to a Tournament yet.
+    """
+    grouped_games = collections.defaultdict(list)
+    tournaments = {}
+    for row in rows:
+        key = group_key(row['tournament'])
+        grouped_games[key].append(_feed_game(row))
+        if row['tournament_group__strength'] is not None:
+            tournaments[key] = (row['tournament_group_id'], row['tournament_group__strength'])
+    return [
+        {
+            "name": name,
+            "tournament_id": tournaments[name][0] if name in tournaments else None,
+            "strength": tournaments[name][1] if name in tournaments else calculate_tournament_strength(games),
+            "games": games,
+        }
+        for name, games in grouped_games.items()
+    ]
+
+
+def _sort_groups(groups):
+    # strongest tournament first, by name between equally strong ones
+    groups.sort(key=lambda group: (-group['strength'], group['name']))
+
+
+def build_daily_feed(target_date) -> list:
+    """Builds the tournament groups of a date from the games table."""
+    groups = _build_groups(_day_games(target_date))
+    _sort_groups(groups)
+    return groups
+
+
+def get_daily_feed(target_date) -> list:
+    """
+    Returns the tournament groups of a date for the index page: the stored snapshot, built and
+    stored first if there is none. Game end times are returned as datetime.time. A date without
+    games returns no groups, without writing anything.
+
+    A missing snapshot is built while its row is inserted and locked: an ingest saving games of
+    that date waits for the row and then updates it (see update_daily_feeds), or the insert waits
+    for the ingest and the snapshot is built with its games. A stored snapshot is never rebuilt here.
+    """
+    feed = DailyFeed.objects.filter(date=target_date).first()
+    if feed is None and not Game.objects.filter(date=target_date).exists():
+        return []
+    if feed is None or not feed.tournaments:
+        with transaction.atomic():
+            DailyFeed.objects.get_or_create(date=target_date)
+            feed = DailyFeed.objects.select_for_update().get(date=target_date)
+            if not feed.tournaments:
+                feed.tournaments = build_daily_feed(target_date)
+                if feed.tournaments:
+                    feed.save(update_fields=['tournaments', 'updated_at'])
+                else:
+                    # no snapshot of empty days, any date can be requested
+                    feed.delete()
+    tournaments = feed.tournaments
+    for group in tournaments:
+        for game in group['games']:
+            if game['endtime']:
+                game['endtime'] = datetime.time.fromisoformat(game['endtime'])
+    return tournaments
+
+
+def update_daily_feeds(games):
+    """
+    Brings the stored snapshots up to date with saved games (Game instances, new or updated):
+    only the groups of the dates and tournaments the games belong to are rebuilt. Dates without
+    a snapshot are left alone, the page builds them when they are requested.
+    Must run in the transaction that saves the games.
+
+    Rows are inserted for the dates first and deleted again if they were not there: the insert
+    waits for a page request building one of them (see get_daily_feed), whose snapshot is then
+    updated here, and makes a request starting now wait until these games are committed.
+    """
+    affected = collections.defaultdict(set)
+    date_field = Game._meta.get_field('date')
+    for game in games:
+        # games built from pgn_to_dict still hold the PGN date string ("YYYY.MM.DD")
+        game_date = date_field.to_python(game.date)
+        if game_date:
+            affected[game_date].add(group_key(game.tournament))
+    if not affected:
+        return
+
+    # in date order, like the locks below, so two ingests never wait for each other crosswise
+    DailyFeed.objects.bulk_create([DailyFeed(date=game_date) for game_date in sorted(affected)], ignore_conflicts=True)
+    # row locks, so concurrent ingests update a snapshot one after the other
+    feeds = DailyFeed.objects.select_for_update().filter(date__in=affected).order_by('date')
+    unbuilt = []
+    for feed in feeds:
+        if not feed.tournaments:
+            unbuilt.append(feed.id)
+            continue
+        groups = affected[feed.date]
+        rebuilt = _build_groups(_day_games(feed.date, groups))
+        feed.tournaments = [group for group in feed.tournaments if group['name'] not in groups] + rebuilt
+        _sort_groups(feed.tournaments)
+        feed.save(update_fields=['tournaments', 'updated_at'])
+    DailyFeed.objects.filter(id__in=unbuilt).delete()
+
+    # the new games changed the strength of their tournaments on their other days too
+    tournament_ids = {game.tournament_group_id for game in games if game.tournament_group_id}
+    if not tournament_ids:
+        return
+    # by id: tournament names are not unique (one Tournament per edition)
+    strengths = dict(Tournament.objects.filter(id__in=tournament_ids).values_list('id', 'strength'))
+    other_feeds = (
+        DailyFeed.objects.select_for_update()
+        .filter(date__in=Game.objects.filter(tournament_group_id__in=tournament_ids).values('date'))
+        .exclude(date__in=affected)
+        .order_by('date')
+    )
+    for feed in other_feeds:
+        for group in feed.tournaments:
+            group['strength'] = strengths.get(group.get('tournament_id'), group['strength'])
+        _sort_groups(feed.tournaments)
+        feed.save(update_fields=['tournaments', 'updated_at'])
+
+
+def invalidate_daily_feeds(dates=None):
+    """
+    Deletes the snapshots of `dates` (a list or a queryset of dates, all snapshots if None),
+    e.g. after a change to the games or players they show; the page rebuilds them on request.
+    """
+    feeds = DailyFeed.objects.all()
+    if dates is not None:
+        feeds = feeds.filter(date__in=dates)
+    feeds.delete()
+
+
+def invalidate_player_feeds(player_ids, tournament_ids=()):
+    """
+    Deletes the snapshots of every date on which one of the players has a game (their names or
+    titles changed), or one of the tournaments has a game (their strength changed).
+    """
+    player_ids, tournament_ids = list(player_ids), list(tournament_ids)
+    if player_ids or tournament_ids:
+        invalidate_daily_feeds(
+            Game.objects.filter(
+                Q(white_id__in=player_ids) | Q(black_id__in=player_ids) | Q(tournament_group_id__in=tournament_ids)
+            ).values('date')
+        )
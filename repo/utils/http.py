@@ -0,0 +1,147 @@
+import email.utils
+import itertools
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying: rate limited or a transient server/gateway failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Returns the delay in seconds from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RateLimiter:
+    """
+    Token bucket shared between threads: allows `rate` acquisitions per second on average,
+    with bursts of up to `burst`. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+    """
+    Shared fetch layer for the external APIs: one pooled requests.Session (keep-alive),
+    a default timeout on every request, at most `per_host_concurrency` requests in flight per host,
+    and retries with exponential backoff (plus jitter) on connection errors and RETRY_STATUSES.
+    A Retry-After header on 429/503 responses takes precedence over the computed backoff.
+    An optional RateLimiter caps the request rate of everything sent through the client, retries included.
+
+    Safe to share between threads; fetch_many uses that to download several URLs in parallel.
+    """
+
+    def __init__(self, headers=None, timeout=(5, 60), max_retries=4, backoff_factor=1.0, max_backoff=60, per_host_concurrency=4, pool_size=16, rate_limiter: RateLimiter = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.per_host_concurrency = per_host_concurrency
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host_concurrency))
+        self._host_slots_lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        with self._host_slots_lock:
+            return self._host_slots[urlsplit(url).netloc]
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return delay + random.uniform(0, self.backoff_factor)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request with retries and returns the final response, whatever its status.
+        Raises requests.exceptions.RequestException if the last attempt failed at the network level.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with self._host_slot(url):
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                        return response
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    delay = min(self.max_backoff, retry_after) if retry_after is not None else self._backoff(attempt)
+                    response.close()
+            # wait outside the host slot so other requests to the host can proceed
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def fetch_many(self, items, fetch, max_workers: int = 8):
+        """
+        Runs `fetch(item)` for every item on a thread pool and yields (item, result) pairs as they
+        complete, so callers can process the fastest downloads while slower ones are still running.
+        At most 2 * max_workers fetches are pending at once, so a slow consumer holds a bounded
+        number of results in memory however many items there are.
+        A fetch that raises yields (item, None). Per-host limits still apply across workers.
+        """
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            while True:
+                for item in itertools.islice(items, 2 * max_workers - len(futures)):
+                    futures[executor.submit(fetch, item)] = item
+                if not futures:
+                    return
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Failed to fetch {item}: {e}")
+                        result = None
+                    yield item, result
@@ -0,0 +1,95 @@
+import functools
+from repo.utils.dedup import commit_saved_games
+from repo.utils.lichess.api import LICHESS_API
+from repo.utils.lichess.ledger import mark_round_ingested, scan_rounds_to_ingest
+from repo.utils.pgn import iter_games_from_pgn
+from repo.utils.pipeline import IngestJob, ingest_jobs
+from repo.utils.raw_archive import iter_raw_fetches, read_raw_fetch
+from repo.utils.save import DEFAULT_SAVE_BATCH_SIZE, save_games_batch
+
+
+def _add_counts(counts, batch_counts):
+    for status, count in batch_counts.items():
+        counts[status] += count
+
+
+def ingest_pgn(pgn_source, source, stdout_writer, tournament_name=None, prefilter=None, source_info="", batch_size=DEFAULT_SAVE_BATCH_SIZE, on_saved=None, parse_workers=None):
+    """
+    Parses, dedups and saves every new game of a PGN source (str, file-like object or chunk iterator).
+    With `parse_workers` > 1 the parsing runs in a process pool (see iter_games_from_pgn).
+    Games are written in batches with save_games_batch and their hashes are committed to the
+    dedup cache only once the batch is in the database, so a failed write never hides a game.
+    `on_saved` is an optional extra callback receiving each list of saved game dicts.
+
+    Returns:
+        dict: counts of 'created', 'updated', 'skipped' and 'error' games.
+    """
+    def saved(games_data):
+        commit_saved_games(games_data)
+        if on_saved is not None:
+            on_saved(games_data)
+
+    counts = {'created': 0, 'updated': 0, 'skipped': 0, 'error': 0}
+    batch = []
+    for game_data in iter_games_from_pgn(pgn_source, source, tournament_name, prefilter, batch_size=batch_size, workers=parse_workers):
+        batch.append(game_data)
+        if len(batch) >= batch_size:
+            _add_counts(counts, save_games_batch(batch, stdout_writer, source_info, batch_size, on_saved=saved))
+            batch = []
+    if batch:
+        _add_counts(counts, save_games_batch(batch, stdout_writer, source_info, batch_size, on_saved=saved))
+    return counts
+
+
+def ingest_lichess_broadcasts(stdout_writer, max_workers=8, prefilter=None, full_scan=False, parse_processes=0):
+    """
+    Ingests the lichess broadcast rounds that the round ledger says still need fetching: newly
+    finished rounds and recently finished ones in their re-check window (see scan_rounds_to_ingest).
+    Rounds go through the staged pipeline (repo.utils.pipeline.ingest_jobs): `max_workers` round
+    PGNs are downloaded in parallel while earlier ones are parsed and saved. A round is marked
+    ingested only if all of its games were saved.
+
+    Returns:
+        dict: counts of 'created', 'updated', 'skipped' and 'error' games.
+    """
+    lichess_api = LICHESS_API()
+
+    def round_job(broadcast_round):
+        def done(counts):
+            if counts['error'] == 0:
+                mark_round_ingested(broadcast_round)
+
+        return IngestJob(
+            functools.partial(lichess_api.get_round_pgn, broadcast_round.round_id), 'lichess',
+            tournament_name=broadcast_round.tour_name,
+            prefilter=prefilter,
+            source_info=f"lichess round {broadcast_round.round_id} ({broadcast_round.tour_name})",
+            on_done=done,
+            url=lichess_api.round_pgn_url(broadcast_round.round_id),
+        )
+
+    rounds = scan_rounds_to_ingest(lichess_api, full_scan=full_scan)
+    return ingest_jobs(
+        (round_job(broadcast_round) for broadcast_round in rounds), stdout_writer,
+        fetch_workers=max_workers, parse_processes=parse_processes,
+    )
+
+
+def replay_raw_archive(stdout_writer, source=None, since=None, until=None, latest_only=True, read_workers=2, parse_processes=0):
+    """
+    Feeds archived payloads (see repo.utils.raw_archive) back through the ingestion pipeline without
+    touching the network, e.g. to pick up games a since-fixed parser had dropped.
+    Replayed payloads are not archived again.
+
+    Returns:
+        dict: counts of 'created', 'updated', 'skipped' and 'error' games.
+    """
+    jobs = (
+        IngestJob(
+            functools.partial(read_raw_fetch, raw_fetch), raw_fetch.source,
+            tournament_name=raw_fetch.tournament_name,
+            source_info=f"replay of {raw_fetch}",
+        )
+        for raw_fetch in iter_raw_fetches(source, since, until, latest_only)
+    )
+    return ingest_jobs(jobs, stdout_writer, fetch_workers=read_workers, parse_processes=parse_processes)
@@ -1,60 +1,52 @@
-import requests
 import json
+from repo.utils.http import HttpClient
 
 class LICHESS_API:
+    # One pooled client shared by every instance, so keep-alive connections and
+    # per-host limits apply across the whole process
+    _http = None
+
     def __init__(self):
         self.BASE_URL = "https://lichess.org/api"
         self.HEADERS = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        if LICHESS_API._http is None:
+            LICHESS_API._http = HttpClient(headers=self.HEADERS)
+        self.http = LICHESS_API._http
 
     def get_broadcast_top(self) -> dict | None:
         url = f"{self.BASE_URL}/broadcast/top"
-        response = requests.get(url, headers=self.HEADERS)
+        response = self.http.get(url)
         if response.status_code == 200:
             return response.json()
         else:
             return None
 
-    def get_finished_rounds_from_broadcast(self) -> dict:
+    def iter_broadcasts(self):
         """
-        Fetches all tournaments and their finished rounds from the broadcast endpoint.
-        Returns a dictionary with tournament names as keys and lists of finished round IDs as values.
+        Streams the /api/broadcast NDJSON list and yields one dict per broadcast (with its 'tour'
+        and 'rounds'), as the lines arrive. Lichess lists ongoing broadcasts first, then finished
+        ones by most recent activity, so a caller can stop iterating once it reaches old tours.
         """
         url = f"{self.BASE_URL}/broadcast"
-        result = {}
-        
-        with requests.get(url, headers=self.HEADERS, stream=True) as response:
+        with self.http.get(url, stream=True) as response:
             if response.status_code != 200:
-                return result
-                
+                return
             # Process the NDJSON stream
-            buffer = ""
             for chunk in response.iter_lines(decode_unicode=True):
                 if chunk:
                     try:
-                        broadcast_data = json.loads(chunk)
-                        tour_name = broadcast_data.get('tour', {}).get('name')
-                        
-                        if tour_name:
-                            # Get all finished rounds for this tournament
-                            finished_rounds = [
-                                round_data.get('id')
-                                for round_data in broadcast_data.get('rounds', [])
-                                if round_data.get('finished', False)
-                            ]
-                            
-                            if finished_rounds:  # Only add tournaments with finished rounds
-                                result[tour_name] = finished_rounds
-                                    
+                        yield json.loads(chunk)
                     except json.JSONDecodeError:
                         pass  # Skip invalid JSON
-        
-        return result
+
+    def round_pgn_url(self, round_id: str) -> str:
+        return f"{self.BASE_URL}/broadcast/round/{round_id}.pgn"
 
     def get_round_pgn(self, round_id: str) -> str | None:
-        url = f"{self.BASE_URL}/broadcast/round/{round_id}.pgn"
-        response = requests.get(url, headers=self.HEADERS)
+        url = self.round_pgn_url(round_id)
+        response = self.http.get(url)
         if response.status_code == 200:
             return response.text
         else:
@@ -65,7 +57,7 @@ class LICHESS_API:
         Fetches the PGN for an entire tournament/broadcast by its ID.
         """
         url = f"{self.BASE_URL}/broadcast/{tournament_id}.pgn"
-        response = requests.get(url, headers=self.HEADERS)
+        response = self.http.get(url)
         if response.status_code == 200:
             return response.text
         else:
@@ -73,9 +65,13 @@ class LICHESS_API:
             return None
 
     def get_player_fide_profile(self, fide_id: str) -> dict | None:
+        """
+        Returns the FIDE profile of a player, or None if lichess does not know the FIDE ID (404).
+        Any other failure raises, so it is not mistaken for a missing player.
+        """
         url = f"{self.BASE_URL}/fide/player/{fide_id}"
-        response = requests.get(url, headers=self.HEADERS)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
\ No newline at end of file
+        response = self.http.get(url)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
\ No newline at end of file
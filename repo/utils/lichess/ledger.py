@@ -0,0 +1,87 @@
+import datetime
+from django.conf import settings
+from django.utils import timezone
+from repo.models import BroadcastRound
+
+
+def _finished_at(round_data, now):
+    finished_at = round_data.get('finishedAt')
+    if finished_at:
+        return datetime.datetime.fromtimestamp(finished_at / 1000, tz=datetime.timezone.utc)
+    # not reported by the API: count from when we first saw the round finished
+    return now
+
+
+def scan_rounds_to_ingest(lichess_api, stop_after: int = None, full_scan: bool = False) -> list[BroadcastRound]:
+    """
+    Walks the lichess broadcast list, records newly finished rounds in the ledger as pending,
+    and returns the rounds that need fetching: pending ones and re-check ones.
+
+    Unless `full_scan` is set, the scan stops after `stop_after` consecutive tours whose rounds
+    are all finished and ingested, since older broadcasts come after them in the list. A tour
+    without rounds yet (just announced) does not count as ingested.
+    """
+    stop_after = settings.LICHESS_BROADCAST_STOP_AFTER if stop_after is None else stop_after
+    now = timezone.now()
+    to_ingest = []
+    ingested_streak = 0
+
+    for broadcast_data in lichess_api.iter_broadcasts():
+        tour = broadcast_data.get('tour', {})
+        if not tour.get('name'):
+            continue
+        rounds = broadcast_data.get('rounds', [])
+        finished_rounds = {
+            round_data['id']: round_data
+            for round_data in rounds
+            if round_data.get('finished', False) and round_data.get('id')
+        }
+
+        known = {
+            broadcast_round.round_id: broadcast_round
+            for broadcast_round in BroadcastRound.objects.filter(round_id__in=finished_rounds)
+        }
+        new_rounds = [
+            BroadcastRound(
+                round_id=round_id,
+                tour_id=tour.get('id', ''),
+                tour_name=tour['name'],
+                finished_at=_finished_at(round_data, now),
+            )
+            for round_id, round_data in finished_rounds.items()
+            if round_id not in known
+        ]
+        if new_rounds:
+            BroadcastRound.objects.bulk_create(new_rounds, ignore_conflicts=True)
+            # re-read: ignore_conflicts does not set primary keys on every backend
+            to_ingest.extend(BroadcastRound.objects.filter(round_id__in=[r.round_id for r in new_rounds]))
+        to_ingest.extend(
+            broadcast_round for broadcast_round in known.values()
+            if broadcast_round.status != BroadcastRound.STATUS_INGESTED
+        )
+
+        fully_ingested = (
+            bool(rounds)
+            and len(finished_rounds) == len(rounds)
+            and len(known) == len(finished_rounds)
+            and all(broadcast_round.status == BroadcastRound.STATUS_INGESTED for broadcast_round in known.values())
+        )
+        ingested_streak = ingested_streak + 1 if fully_ingested else 0
+        if not full_scan and stop_after and ingested_streak >= stop_after:
+            break
+
+    return to_ingest
+
+
+def mark_round_ingested(broadcast_round: BroadcastRound):
+    """
+    Records a successful fetch of a round. Rounds that finished within LICHESS_ROUND_RECHECK_HOURS
+    stay in re-check and are fetched again by the next runs, for games that were still being
+    played or not relayed yet (stored finished games are not fetched again, see
+    dedup_parsed_games); older ones are done for good.
+    """
+    now = timezone.now()
+    recheck_until = (broadcast_round.finished_at or now) + datetime.timedelta(hours=settings.LICHESS_ROUND_RECHECK_HOURS)
+    broadcast_round.status = BroadcastRound.STATUS_RECHECK if now < recheck_until else BroadcastRound.STATUS_INGESTED
+    broadcast_round.ingested_at = now
+    broadcast_round.save(update_fields=['status', 'ingested_at'])
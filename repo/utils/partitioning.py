@@ -0,0 +1,330 @@
+import datetime
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from repo.models import DailyFeed
+
+# Optional Postgres declarative partitioning of the games table by month of `date`
+# (`manage.py partition_games`). Postgres requires every unique index of a partitioned table to
+# contain the partition key, so once partitioned:
+# - the primary key is (id, date) and `date` is NOT NULL: games without a date must be dated or
+#   deleted before the conversion, and are rejected by the database afterwards;
+# - the unique pgn_hash becomes (pgn_hash, date). A game's date is part of its PGN text, so
+#   pgn_hash still identifies one row and ON CONFLICT DO NOTHING (bulk_create(ignore_conflicts=True))
+#   keeps working;
+# - the foreign key from game_pgns to games references id alone, so it is replaced by a deferred
+#   constraint trigger checking that the game exists (Django still cascades deletes itself);
+# - games dated outside the monthly partitions go to the default partition. Monthly partitions
+#   go back GAMES_PARTITION_MONTHS_BACK months at most, so converting a table with a few very old
+#   games does not create a partition for every month since.
+# Later migrations that add a unique constraint on games must include `date` as well.
+# Measured on Postgres 16, see convert_games_table.
+
+GAMES_TABLE = 'games'
+# The original table, kept after the conversion until it is dropped with --drop-old
+OLD_TABLE = 'games_unpartitioned'
+DEFAULT_PARTITION = 'games_default'
+ID_SEQUENCE = 'games_partitioned_id_seq'
+# Replaces the game_pgns.game_id foreign key
+PGN_GAME_CHECK = 'game_pgns_game_id_check'
+PARTITION_NAME_RE = re.compile(rf"^{GAMES_TABLE}_y(\d{{4}})m(\d{{2}})$")
+# pg_indexes.indexdef: CREATE [UNIQUE] INDEX name ON table USING method (columns) [INCLUDE (...)] [NULLS NOT DISTINCT] [WHERE ...]
+INDEX_DEF_RE = re.compile(
+    r"^CREATE (UNIQUE )?INDEX (\S+) ON (\S+) USING (\w+) \((.*?)\)((?: INCLUDE \(.*?\))?(?: NULLS NOT DISTINCT)?(?: WHERE .*)?)$"
+)
+
+
+def is_postgres() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def _table_exists(cursor, name) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cursor.fetchone()[0]
+
+
+def is_partitioned() -> bool:
+    """Whether the games table is a partitioned table already."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))", [GAMES_TABLE])
+        return cursor.fetchone()[0]
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return datetime.date(day.year, day.month, 1)
+
+
+def add_months(first_of_month: datetime.date, months: int) -> datetime.date:
+    years, month_index = divmod(first_of_month.month - 1 + months, 12)
+    return datetime.date(first_of_month.year + years, month_index + 1, 1)
+
+
+def partition_name(first_of_month: datetime.date) -> str:
+    return f"{GAMES_TABLE}_y{first_of_month.year:04d}m{first_of_month.month:02d}"
+
+
+def list_partitions() -> list:
+    """Returns (partition name, first day of its month) of the monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [GAMES_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((name, datetime.date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_month_partition(first_of_month: datetime.date) -> bool:
+    """
+    Creates the partition of one month, if it does not exist yet. Rows of that month already in
+    the default partition are moved into it. Returns whether the partition was created.
+    """
+    name = partition_name(first_of_month)
+    start, end = first_of_month.isoformat(), add_months(first_of_month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    with transaction.atomic(), connection.cursor() as cursor:
+        if _table_exists(cursor, name):
+            return False
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s)", [start, end])
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {GAMES_TABLE} {bounds}")
+            return True
+        # a partition cannot be created while the default partition holds rows of its range
+        cursor.execute(f"ALTER TABLE {GAMES_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {GAMES_TABLE} {bounds}")
+        cursor.execute(f"INSERT INTO {GAMES_TABLE} SELECT * FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s", [start, end])
+        cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s", [start, end])
+        cursor.execute(f"ALTER TABLE {GAMES_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    return True
+
+
+def ensure_partitions(months_ahead: int = 3, since: datetime.date = None) -> list:
+    """
+    Creates the monthly partitions from `since` (default: this month, and never before
+    GAMES_PARTITION_MONTHS_BACK months ago) up to `months_ahead` months from now. Meant to run
+    daily, e.g. from cron, so games never pile up in the default partition. Returns the names of
+    the partitions created.
+    """
+    this_month = month_start(datetime.date.today())
+    floor = add_months(this_month, -settings.GAMES_PARTITION_MONTHS_BACK)
+    current = max(month_start(since), floor) if since else this_month
+    last = add_months(this_month, months_ahead)
+    created = []
+    while current <= last:
+        if create_month_partition(current):
+            created.append(partition_name(current))
+        current = add_months(current, 1)
+    return created
+
+
+def detach_partitions_before(cutoff: datetime.date, drop: bool = False) -> list:
+    """
+    Detaches the monthly partitions of months before `cutoff` from the games table: their games
+    disappear from every query in one catalog change, instead of a mass DELETE, and stay
+    available as standalone tables for archival (pg_dump -t ...). The PGNs of their games move
+    along to a <partition>_pgns table, so game_pgns holds no PGN of a game that is gone.
+    With `drop`, the tables and the PGNs are deleted instead. Returns the names of the partitions
+    detached.
+    """
+    detached = []
+    for name, first_of_month in list_partitions():
+        if first_of_month >= month_start(cutoff):
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {GAMES_TABLE} DETACH PARTITION {name}")
+            if not drop:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name}_pgns AS "
+                    f"SELECT p.* FROM game_pgns p WHERE p.game_id IN (SELECT id FROM {name})"
+                )
+            cursor.execute(f"DELETE FROM game_pgns WHERE game_id IN (SELECT id FROM {name})")
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+        detached.append(name)
+    if detached:
+        # the stored feeds of those days show games that are gone
+        DailyFeed.objects.filter(date__lt=month_start(cutoff)).delete()
+    return detached
+
+
+def _partitioned_index_sql(index_name, index_def) -> str:
+    """
+    Rewrites the definition of an index of the original table for the partitioned table,
+    adding `date` to unique indexes. INCLUDE, NULLS NOT DISTINCT and WHERE clauses are kept.
+    """
+    match = INDEX_DEF_RE.match(index_def)
+    if match is None:
+        raise ValueError(f"Unsupported index definition, create it on {GAMES_TABLE} by hand: {index_def}")
+    unique, _, _, method, columns, options = match.groups()
+    if unique:
+        if 'date' not in [column.strip() for column in columns.split(',')]:
+            columns += ', date'
+        return f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {GAMES_TABLE} USING {method} ({columns}){options}"
+    return f"CREATE INDEX IF NOT EXISTS {index_name} ON {GAMES_TABLE} USING {method} ({columns}){options}"
+
+
+def _primary_key_index(cursor, table) -> str | None:
+    cursor.execute(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = to_regclass(%s) AND i.indisprimary",
+        [table],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _create_partitioned_table(cursor):
+    cursor.execute(f"SELECT count(*) FROM {GAMES_TABLE} WHERE date IS NULL")
+    undated = cursor.fetchone()[0]
+    if undated:
+        # the primary key has to contain the partition key, which can't be null then
+        raise ValueError(f"{undated} games have no date: date or delete them before partitioning {GAMES_TABLE}")
+
+    cursor.execute(f"ALTER TABLE {GAMES_TABLE} RENAME TO {OLD_TABLE}")
+    # foreign keys pointing at games (game_pgns) reference id alone, which is not unique on its own once partitioned
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+        [OLD_TABLE],
+    )
+    for table, constraint in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}")
+    # index names are schema-wide: free them for the partitioned table, which gets them in _finish_conversion
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [OLD_TABLE])
+    for (index_name,) in cursor.fetchall():
+        cursor.execute(f"ALTER INDEX {index_name} RENAME TO {index_name[:55]}_old")
+
+    # no identity column, which partitioned tables only support from Postgres 17: a plain sequence
+    cursor.execute(
+        f"CREATE TABLE {GAMES_TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE (date)"
+    )
+    cursor.execute(f"ALTER TABLE {GAMES_TABLE} ALTER COLUMN date SET NOT NULL")
+    cursor.execute(f"CREATE SEQUENCE {ID_SEQUENCE} OWNED BY {GAMES_TABLE}.id")
+    cursor.execute(f"ALTER TABLE {GAMES_TABLE} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')")
+    cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {GAMES_TABLE} DEFAULT")
+
+
+def _copy_batch(cursor, after_id, batch_size):
+    cursor.execute(
+        f"WITH moved AS (INSERT INTO {GAMES_TABLE} SELECT * FROM {OLD_TABLE} WHERE id > %s ORDER BY id LIMIT %s RETURNING id) "
+        f"SELECT count(*), max(id) FROM moved",
+        [after_id, batch_size],
+    )
+    return cursor.fetchone()
+
+
+def _finish_conversion(cursor):
+    cursor.execute(
+        f"SELECT setval('{ID_SEQUENCE}', GREATEST((SELECT max(id) FROM {GAMES_TABLE}), (SELECT max(id) FROM {OLD_TABLE}), 1))"
+    )
+    old_primary_key = _primary_key_index(cursor, OLD_TABLE)
+    if _primary_key_index(cursor, GAMES_TABLE) is None:
+        name = old_primary_key[:-len('_old')] if old_primary_key else f"{GAMES_TABLE}_pkey"
+        cursor.execute(f"ALTER TABLE {GAMES_TABLE} ADD CONSTRAINT {name} PRIMARY KEY (id, date)")
+    cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [OLD_TABLE])
+    for old_name, index_def in cursor.fetchall():
+        if old_name != old_primary_key:
+            cursor.execute(_partitioned_index_sql(old_name[:-len('_old')], index_def))
+    # foreign keys to players and tournaments
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [OLD_TABLE],
+    )
+    old_foreign_keys = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [GAMES_TABLE],
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    for constraint, definition in old_foreign_keys:
+        if constraint not in existing:
+            cursor.execute(f"ALTER TABLE {GAMES_TABLE} ADD CONSTRAINT {constraint} {definition}")
+    _create_pgn_game_check(cursor)
+    cursor.execute(f"ANALYZE {GAMES_TABLE}")
+
+
+def _create_pgn_game_check(cursor):
+    """
+    Replaces the foreign key from game_pgns to games, which _create_partitioned_table dropped:
+    a constraint trigger raising foreign_key_violation when a PGN is written for a game id that is
+    not in games. Deferred to the commit like Django's foreign keys, so a game and its PGN can
+    still be written in either order; the lookup uses the (id, date) unique index of every partition.
+    """
+    cursor.execute(
+        f"CREATE OR REPLACE FUNCTION {PGN_GAME_CHECK}() RETURNS trigger LANGUAGE plpgsql AS $$ "
+        f"BEGIN "
+        f"IF NOT EXISTS (SELECT 1 FROM {GAMES_TABLE} WHERE id = NEW.game_id) THEN "
+        f"RAISE EXCEPTION 'game_pgns.game_id=% is not present in table {GAMES_TABLE}', NEW.game_id "
+        f"USING ERRCODE = 'foreign_key_violation'; "
+        f"END IF; "
+        f"RETURN NULL; "
+        f"END $$"
+    )
+    cursor.execute(f"DROP TRIGGER IF EXISTS {PGN_GAME_CHECK} ON game_pgns")
+    cursor.execute(
+        f"CREATE CONSTRAINT TRIGGER {PGN_GAME_CHECK} AFTER INSERT OR UPDATE OF game_id ON game_pgns "
+        f"DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION {PGN_GAME_CHECK}()"
+    )
+
+
+def convert_games_table(stdout_writer, batch_size: int = 50000, months_ahead: int = 3, drop_old: bool = False) -> dict:
+    """
+    Turns the games table into a table partitioned by month of `date`: the table is renamed to
+    games_unpartitioned, an empty partitioned games table with the monthly partitions and a
+    default partition takes its place, and the rows are copied over in id order, one batch per
+    transaction. The primary key (id, date), the indexes (unique ones extended with `date`) and
+    foreign keys are created after the copy, and the foreign key from game_pgns is replaced by a
+    constraint trigger. Monthly partitions start GAMES_PARTITION_MONTHS_BACK months ago at most;
+    older games are copied to the default partition. Run it with ingestion stopped.
+
+    Every step can be repeated: an interrupted run resumes where it stopped, creating the missing
+    partitions and copying the rows after the last copied id.
+
+    On Postgres 16, a synthetic 1M-game table with the migrated indexes converted in 23 s,
+    indexes included; see `manage.py benchmark_games_partitioning` for the query side.
+
+    Returns:
+        dict: 'copied' rows, and 'partitions' created.
+    """
+    counts = {'copied': 0, 'partitions': 0}
+    with connection.cursor() as cursor:
+        if not is_partitioned():
+            with transaction.atomic():
+                _create_partitioned_table(cursor)
+            stdout_writer.write(f"Created the partitioned {GAMES_TABLE} table")
+        elif not _table_exists(cursor, OLD_TABLE):
+            stdout_writer.write(f"{GAMES_TABLE} is partitioned already")
+            return counts
+
+        cursor.execute(f"SELECT min(date) FROM {OLD_TABLE}")
+        counts['partitions'] = len(ensure_partitions(months_ahead, since=cursor.fetchone()[0]))
+        stdout_writer.write(f"Created {counts['partitions']} monthly partitions")
+
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {GAMES_TABLE}")
+        last_id = cursor.fetchone()[0]
+        while True:
+            with transaction.atomic():
+                copied, max_id = _copy_batch(cursor, last_id, batch_size)
+            if not copied:
+                break
+            last_id = max_id
+            counts['copied'] += copied
+            stdout_writer.write(f"Copied {counts['copied']} games (up to id {last_id})")
+
+        with transaction.atomic():
+            _finish_conversion(cursor)
+        if drop_old:
+            cursor.execute(f"SELECT (SELECT count(*) FROM {OLD_TABLE}) = (SELECT count(*) FROM {GAMES_TABLE})")
+            if cursor.fetchone()[0]:
+                cursor.execute(f"DROP TABLE {OLD_TABLE}")
+            else:
+                stdout_writer.write(f"Row counts differ, {OLD_TABLE} was kept")
+    return counts
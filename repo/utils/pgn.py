@@ -1,11 +1,27 @@
 import re
 import chess
 import chess.pgn
+import codecs
+import collections
+import datetime
 import hashlib
 import io
-from django.core.cache import cache
-from repo.utils.save import get_or_create_chesscom_player, get_or_create_lichess_player
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+import django
+from repo.utils.dedup import find_cross_source_duplicates, find_new_identities, find_new_pgn_hashes, find_unfinished_identities
+from repo.utils.save import (
+    get_or_create_chesscom_player,
+    get_or_create_lichess_player,
+    resolve_chesscom_players,
+    resolve_lichess_players,
+)
 
+# Number of raw games looked up together against Redis/the database by iter_games_from_pgn
+DEDUP_BATCH_SIZE = 500
+
+# A game after the CPU-bound parsing work, holding only picklable data so it can come back from a worker process
+ParsedGame = collections.namedtuple('ParsedGame', ['headers', 'pgn_string', 'pgn_hash', 'move_key', 'ply_count'])
 
 def extract_opening_from_chesscom_ecourl(eco_url: str | None) -> str:
         """Extracts opening name from ECOUrl."""
@@ -97,58 +113,321 @@ def determine_game_format(pgn_string: str) -> str | None:
         else:
             return "classical"
 
-# check if a pgn_string is already potentially in the database (at least cached in redis)
-# if pgn hash is a key in the redis cache, return False
-# if pgn hash is not a key in the redis cache, add it to the redis cache and return True
-def is_new_game(pgn_string: str) -> bool:
-    pgn_hash = generate_pgn_hash(pgn_string)
-    if cache.get(pgn_hash):
-        return False
-    cache.set(pgn_hash, True, timeout=60 * 60 * 24 * 32)  # 32 days TTL
-    return pgn_hash
-
-def pgn_to_dict(pgn_string: str, source: str, pgn_hash: str, tournament_name: str = None) -> dict:
-    """Converts a chess.pgn.Game object to a standardized dictionary."""
-    game = chess.pgn.read_game(io.StringIO(pgn_string))
-    headers = game.headers
-    # Determine game format
-    game_format = determine_game_format(pgn_string)
-    
+def determine_format_from_timecontrol(timecontrol: str | None) -> str | None:
+    """
+    Estimates the game format from the TimeControl header alone, without touching the moves.
+    Uses the usual "base + 40 * increment" estimate and the same thresholds as determine_game_format.
+
+    Returns:
+        str | None: The game format or None if the header is missing or not understood
+        (e.g. "-" or daily "1/86400" time controls).
+    """
+    if not timecontrol or timecontrol == "-":
+        return None
+    # Multi-period controls like "40/5400+30:1800+30" -> use the first period
+    period = timecontrol.split(":")[0]
+    if "/" in period:
+        moves, _, period = period.partition("/")
+        if moves == "1":  # daily / correspondence, one move per period
+            return None
+    base, _, increment = period.partition("+")
+    try:
+        total_minutes = (float(base) + 40 * float(increment or 0)) / 60
+    except ValueError:
+        return None
+
+    if total_minutes < 3:
+        return "bullet"
+    elif total_minutes < 10:
+        return "blitz"
+    elif total_minutes <= 15:
+        return "rapid"
+    else:
+        return "classical"
+
+
+def parse_elo(value: str | None) -> int | None:
+    """Returns a PGN Elo header as an int, or None for missing/unknown values like "" or "?"."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Largest rating stored in the integer rating columns, anything above is a bogus header
+MAX_RATING = 32767
+
+
+def rating_fields(white_elo: str | None, black_elo: str | None) -> dict:
+    """
+    Returns the integer rating columns of a game from its Elo header values: white_rating and
+    black_rating (None when missing or unparsable, like "?") and combined_rating, their sum with
+    an unknown rating counted as 0, which the daily listing is ordered by.
+    """
+    ratings = {}
+    for field, value in (("white_rating", white_elo), ("black_rating", black_elo)):
+        elo = parse_elo(value)
+        ratings[field] = elo if elo is not None and 0 <= elo <= MAX_RATING else None
+    ratings["combined_rating"] = (ratings["white_rating"] or 0) + (ratings["black_rating"] or 0)
+    return ratings
+
+
+def parse_pgn_datetime(date_value: str | None, time_value: str | None) -> datetime.datetime | None:
+    """Combines PGN date ("YYYY.MM.DD") and time ("HH:MM:SS") values into an aware UTC datetime, or None."""
+    if not date_value or not time_value:
+        return None
+    try:
+        return datetime.datetime.strptime(
+            f"{date_value.replace('-', '.')} {time_value}", "%Y.%m.%d %H:%M:%S"
+        ).replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+        return None
+
+
+def game_end_datetime(headers) -> datetime.datetime | None:
+    """When the game ended, from EndDate/EndTime (chess.com) or UTCDate/UTCTime (lichess)."""
+    return parse_pgn_datetime(
+        headers.get("EndDate") or headers.get("UTCDate"),
+        headers.get("EndTime") or headers.get("UTCTime"),
+    )
+
+
+class PgnPrefilter:
+    """
+    Declarative header-level rules evaluated before a game is fully parsed or saved.
+    Every rule is optional and a game passes when it satisfies all configured rules.
+
+    Args:
+        min_elo: both players must be rated at least this much (unrated players fail).
+        titled_only: at least one player must carry a WhiteTitle/BlackTitle header (BOT excluded).
+        formats: allowed formats ("bullet", "blitz", "rapid", "classical"), estimated from TimeControl.
+            Games whose format cannot be estimated from the headers are let through.
+        variants: allowed variants, compared case-insensitively. A missing Variant header means "Standard".
+        players: usernames/names of which at least one must be playing, compared case-insensitively.
+        ended_after: only games that ended at or after this aware datetime (a sync watermark).
+            Games without an end time are let through.
+    """
+
+    def __init__(self, min_elo=None, titled_only=False, formats=None, variants=None, players=None, ended_after=None):
+        self.min_elo = min_elo
+        self.titled_only = titled_only
+        self.formats = {f.lower() for f in formats} if formats else None
+        self.variants = {v.lower() for v in variants} if variants else None
+        self.players = {p.lower() for p in players} if players else None
+        self.ended_after = ended_after
+
+    def matches(self, headers) -> bool:
+        if self.min_elo is not None:
+            for elo_header in ("WhiteElo", "BlackElo"):
+                elo = parse_elo(headers.get(elo_header))
+                if elo is None or elo < self.min_elo:
+                    return False
+
+        if self.titled_only:
+            titles = [headers.get("WhiteTitle", ""), headers.get("BlackTitle", "")]
+            if not any(title and title != "BOT" for title in titles):
+                return False
+
+        if self.formats is not None:
+            game_format = determine_format_from_timecontrol(headers.get("TimeControl"))
+            if game_format is not None and game_format not in self.formats:
+                return False
+
+        if self.variants is not None:
+            if (headers.get("Variant") or "Standard").lower() not in self.variants:
+                return False
+
+        if self.players is not None:
+            names = {headers.get("White", "").lower(), headers.get("Black", "").lower()}
+            if not names & self.players:
+                return False
+
+        if self.ended_after is not None:
+            ended_at = game_end_datetime(headers)
+            if ended_at is not None and ended_at < self.ended_after:
+                return False
+
+        return True
+
+
+def is_finished_game(headers) -> bool:
+    return headers.get("Result", "*") != "*"
+
+
+def generate_game_identity(headers) -> str:
+    """
+    Returns a stable identity hash for a game computed from its headers only, so it is available
+    before the moves are parsed. It stays the same while a live game grows, which lets a longer
+    or finished version of a game update the stored row instead of adding another one.
+    Prefers the source's own game URL (chess.com "Link", lichess "GameUrl") and falls back to
+    Site/Event/Round/players/date.
+    """
+    game_url = headers.get("Link") or headers.get("GameUrl")
+    if game_url:
+        identity = game_url.strip()
+    else:
+        identity = "|".join(
+            headers.get(name, "")
+            for name in ("Site", "Event", "Round", "White", "Black")
+        ) + "|" + (headers.get("Date") or headers.get("UTCDate", ""))
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def normalize_player_name(name: str | None) -> str:
+    """
+    Reduces a player name to a form shared across sources, for the canonical hash:
+    accents stripped, lowercased, surname only ("Carlsen, Magnus" and "Magnus Carlsen" -> "carlsen").
+    """
+    if not name:
+        return ""
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    name = name.split(",")[0] if "," in name else (name.split() or [""])[-1]
+    return re.sub(r'[^a-z0-9]', '', name)
+
+
+def normalize_pgn_date(headers) -> str:
+    """Returns the game date as YYYY.MM.DD from Date (or UTCDate), or "" when unknown."""
+    for name in ("Date", "UTCDate"):
+        value = (headers.get(name) or "").replace("-", ".")
+        if value and "?" not in value:
+            return value
+    return ""
+
+
+def generate_move_key(game: chess.pgn.Game) -> str | None:
+    """
+    Returns a hash of the mainline moves (3 bytes each: from square, to square, promotion piece)
+    and of the starting position when it is not the standard one, or None for games without moves.
+    The part of the canonical hash that needs the parsed game, computed in the parse workers.
+    """
+    moves = bytes(
+        byte
+        for move in game.mainline_moves()
+        for byte in (move.from_square, move.to_square, move.promotion or 0)
+    )
+    if not moves:
+        return None
+    board = game.board()
+    start = "" if board.fen() == chess.STARTING_FEN else board.fen()
+    return hashlib.sha256(f"{start}|".encode('utf-8') + moves).hexdigest()
+
+
+def canonical_player_name(player, header_name: str | None) -> str:
+    """
+    The source-neutral name of a player for the canonical hash: the name of the resolved Player
+    (chess.com profile name, FIDE name) when it is known, the PGN header otherwise, normalized to
+    the surname. A chess.com username only matches its FIDE name once the player is enriched.
+    """
+    return normalize_player_name((player.name if player is not None else None) or header_name)
+
+
+def generate_canonical_hash(move_key: str | None, headers, white_player=None, black_player=None) -> str | None:
+    """
+    Returns a cross-source identity hash computed from the game itself rather than its PGN text:
+    the move key (see generate_move_key), the source-neutral player names (see canonical_player_name)
+    and the game date. Comments, clocks, annotations and the other headers do not change it, so the
+    same game relayed on lichess and mirrored on chess.com (or re-annotated) gets the same hash.
+    Rematches with the same moves on one day share it too; they are told apart by their
+    identity_hash (see find_cross_source_duplicates).
+    Returns None for games without moves or without identifiable players.
+    Stored hashes are recomputed with `manage.py backfill_canonical_hash --recompute`.
+    """
+    white = canonical_player_name(white_player, headers.get("White"))
+    black = canonical_player_name(black_player, headers.get("Black"))
+    if not move_key or not (white and black):
+        return None
+    identity = f"{white}|{black}|{normalize_pgn_date(headers)}|{move_key}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def derive_game_metadata(pgn_string: str, source: str, headers=None) -> dict:
+    """
+    Returns the fields pgn_to_dict derives from a game's PGN instead of copying a header:
+    'format', 'opening' and 'tournament_url', plus 'tournament' for chess.com games (lichess games
+    take theirs from the broadcast they were fetched from, which the PGN does not record).
+    Used again by `manage.py reprocess_games` to refresh stored rows when this logic changes.
+    """
+    if headers is None:
+        headers = chess.pgn.read_headers(io.StringIO(pgn_string)) or chess.pgn.Headers()
+    metadata = {"format": determine_game_format(pgn_string)}
+    if source == "chesscom":
+        if headers.get("Opening"):
+            metadata["opening"] = headers.get("Opening", "")
+        elif headers.get("ECOUrl"):
+            metadata["opening"] = extract_opening_from_chesscom_ecourl(headers.get("ECOUrl"))
+        else:
+            metadata["opening"] = ""
+        # extracting tournament name from the tournament headers
+        if headers.get("Tournament"):
+            metadata["tournament"] = extract_chesscom_tournament_name(headers.get("Tournament"))
+        else:
+            # fallback to Event if tournament is not available
+            # tournament_name = extract_tournament_name(headers.get("Event", ""))
+            # for now, just go with Online Chess and add variant if present
+            metadata["tournament"] = f"Online Chess{' (' + headers.get('Variant') + ')' if headers.get('Variant') else ''}"
+        # the Tournament header is the URL of the edition, e.g. ...-may-06-2025-5632457
+        tournament_header = headers.get("Tournament", "")
+        metadata["tournament_url"] = tournament_header if "chess.com/tournament" in tournament_header else None
+    else:
+        metadata["opening"] = headers.get("Opening", "")
+        metadata["tournament_url"] = lichess_broadcast_tournament_url(headers.get("BroadcastURL"))
+    return metadata
+
+
+def lichess_broadcast_tournament_url(broadcast_url):
+    """
+    The URL of the broadcast a lichess game belongs to, from its BroadcastURL header, which points
+    at the round: https://lichess.org/broadcast/<tournament slug>/<round slug>/<round id>.
+    """
+    if not broadcast_url or "/broadcast/" not in broadcast_url:
+        return None
+    base, path = broadcast_url.split("/broadcast/", 1)
+    slug = path.strip("/").split("/")[0]
+    return f"{base}/broadcast/{slug}" if slug else None
+
+
+def pgn_to_dict(pgn_string: str, source: str, pgn_hash: str, tournament_name: str = None, game: chess.pgn.Game = None, move_key: str = None, players: dict = None, headers=None, ply_count: int = None) -> dict:
+    """
+    Converts a chess.pgn.Game object to a standardized dictionary.
+    Pass the already parsed `game` (and its move key, if computed) to avoid doing the work twice,
+    or the `headers`, `ply_count` and `move_key` of a ParsedGame instead of the game itself.
+    `players` is an optional map from chess.com username / FIDE ID to Player built by
+    resolve_players_for_games; without it each player is looked up individually.
+    """
+    if game is None and (headers is None or ply_count is None):
+        game = chess.pgn.read_game(io.StringIO(pgn_string))
+    if game is not None:
+        headers = game.headers
+        ply_count = game.end().ply()
+        if move_key is None:
+            move_key = generate_move_key(game)
     if source=="chesscom":
             
             white_username = headers.get("White", "")
             black_username = headers.get("Black", "")
-            white_player = get_or_create_chesscom_player(white_username)
-            black_player = get_or_create_chesscom_player(black_username)
-
-            if headers.get("Opening"):
-                opening_name = headers.get("Opening", "")
-            elif headers.get("ECOUrl"):
-                opening_name = extract_opening_from_chesscom_ecourl(headers.get("ECOUrl"))
-            else:
-                opening_name = ""
-            # extracting tournament name from the tournament headers
-            tournament_name = ""
-            if headers.get("Tournament"):
-                tournament_name = extract_chesscom_tournament_name(headers.get("Tournament"))
+            if players is not None:
+                white_player = players[white_username]
+                black_player = players[black_username]
             else:
-                # fallback to Event if tournament is not available
-                # tournament_name = extract_tournament_name(headers.get("Event", ""))
-                # for now, just go with Online Chess and add variant if present
-                tournament_name = f"Online Chess{' (' + headers.get('Variant') + ')' if headers.get('Variant') else ''}"
+                white_player = get_or_create_chesscom_player(white_username)
+                black_player = get_or_create_chesscom_player(black_username)
+
+            metadata = derive_game_metadata(pgn_string, source, headers)
             return {
                 "white": white_player,
                 "black": black_player,
                 "white_username": white_username,
                 "black_username": black_username,
                 "result": headers.get("Result", ""),
-                "opening": opening_name,
+                "opening": metadata["opening"],
                 "eco": headers.get("ECO", ""),
                 "whiteelo": headers.get("WhiteElo", ""),
                 "blackelo": headers.get("BlackElo", ""),
+                **rating_fields(headers.get("WhiteElo"), headers.get("BlackElo")),
                 "event": headers.get("Event", ""),
                 "site": headers.get("Site", ""),
-                "tournament": tournament_name,
+                "tournament": metadata["tournament"],
+                "tournament_url": metadata["tournament_url"],
                 "round": headers.get("Round", ""),
                 "date": headers.get("Date", ""), # Assuming chess.com dates are usually well-formed or handled by model
                 "enddate": headers.get("EndDate", headers.get("Date", "")), # Fallback to Date if EndDate is missing
@@ -156,9 +435,12 @@ def pgn_to_dict(pgn_string: str, source: str, pgn_hash: str, tournament_name: st
                 "timecontrol": headers.get("TimeControl", ""),
                 "variant": headers.get("Variant", ""),
                 "link": headers.get("Link", ""),
-                "format": game_format,
+                "format": metadata["format"],
                 "pgn": pgn_string,
                 "pgn_hash": pgn_hash,
+                "identity_hash": generate_game_identity(headers),
+                "canonical_hash": generate_canonical_hash(move_key, headers, white_player, black_player),
+                "ply_count": ply_count,
                 "source": source,
             }
     elif source=="lichess":
@@ -188,10 +470,15 @@ def pgn_to_dict(pgn_string: str, source: str, pgn_hash: str, tournament_name: st
         # final_model_endtime is simply the cleaned_utc_time
         final_model_endtime = cleaned_utc_time
 
+        metadata = derive_game_metadata(pgn_string, source, headers)
         white_fide_id = headers.get("WhiteFideId", "")
         black_fide_id = headers.get("BlackFideId", "")
-        white_player = get_or_create_lichess_player(white_fide_id)
-        black_player = get_or_create_lichess_player(black_fide_id)
+        if players is not None:
+            white_player = players[white_fide_id]
+            black_player = players[black_fide_id]
+        else:
+            white_player = get_or_create_lichess_player(white_fide_id)
+            black_player = get_or_create_lichess_player(black_fide_id)
 
         return {
             "white": white_player,
@@ -199,46 +486,318 @@ def pgn_to_dict(pgn_string: str, source: str, pgn_hash: str, tournament_name: st
             "white_username": headers.get("White", ""),
             "black_username": headers.get("Black", ""),
             "result": headers.get("Result", ""),
-            "opening": headers.get("Opening", ""),
+            "opening": metadata["opening"],
             "eco": headers.get("ECO", ""),
             "whiteelo": headers.get("WhiteElo", ""),
             "blackelo": headers.get("BlackElo", ""),
+            **rating_fields(headers.get("WhiteElo"), headers.get("BlackElo")),
             "event": headers.get("Event", ""), # Lichess PGNs use "Event" for the tournament/event name
             "site": headers.get("Site", ""),
             "tournament": tournament_name or headers.get("Event", ""), # Use provided tournament_name if available
+            "tournament_url": metadata["tournament_url"],
             "round": headers.get("Round", ""),
             "date": final_model_date,
             "enddate": final_model_enddate,
             "endtime": final_model_endtime,
             "variant": headers.get("Variant", ""),
             "link": headers.get("GameUrl", ""),
-            "format": game_format,
+            "format": metadata["format"],
             "pgn": pgn_string,
             "pgn_hash": pgn_hash,
+            "identity_hash": generate_game_identity(headers),
+            "canonical_hash": generate_canonical_hash(move_key, headers, white_player, black_player),
+            "ply_count": ply_count,
             "source": source,
         }
 
 
-def extract_games_from_pgn_string(pgn_string: str, source: str, tournament_name: str = None) -> list[dict]:
+def _iter_lines(pgn_source):
     """
-    generic method to Parse a PGN string and extracts all games into the standardized dictionary format.
-    This method is generic and can be used for PGNs from any source.
+    Yields text lines from a PGN source, which may be a str, a text or binary file-like object,
+    or any iterator of str/bytes chunks (e.g. requests' response.iter_content()).
+    Chunks do not need to end on line boundaries.
     """
-    if not pgn_string:
-        return []
+    if isinstance(pgn_source, str):
+        pgn_source = (pgn_source,)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = ""
+    for chunk in pgn_source:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        buffer += chunk
+        if '\n' not in chunk:
+            continue
+        lines = buffer.split('\n')
+        buffer = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield buffer
+
+
+# A tag pair line such as [Event "..."]; a movetext line starting with "[" (e.g. "[%clk ...]") is not one
+TAG_PAIR_RE = re.compile(r'^\[[A-Za-z0-9_]+\s+"')
+RESULT_TOKENS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+def _comment_open_after(line: str, in_comment: bool) -> bool:
+    """Whether a { } comment is still open at the end of a movetext line (a ; comment runs to the end of the line)."""
+    for char in line:
+        if in_comment:
+            if char == '}':
+                in_comment = False
+        elif char == '{':
+            in_comment = True
+        elif char == ';':
+            break
+    return in_comment
+
+
+def iter_pgn_texts(pgn_source):
+    """
+    Splits a PGN source into the raw text of each game without parsing the moves.
+    A new game starts at a tag pair line after a game's movetext, if that line follows a blank
+    line or a result token and no { } comment is open: a wrapped comment or an annotation
+    line starting with "[" stays in its game.
+    """
+    lines = []
+    in_movetext = False
+    in_comment = False
+    at_boundary = False  # the previous line was blank or ended the movetext with a result
+    for line in _iter_lines(pgn_source):
+        stripped = line.strip().lstrip('\ufeff')
+        if in_movetext and at_boundary and not in_comment and TAG_PAIR_RE.match(stripped):
+            yield ''.join(lines)
+            lines = []
+            in_movetext = False
+        if in_movetext or (stripped and not stripped.startswith('[')):
+            in_movetext = True
+            in_comment = _comment_open_after(stripped, in_comment)
+        if not in_comment:
+            at_boundary = not stripped or stripped.split()[-1] in RESULT_TOKENS
+        if lines or stripped:
+            lines.append(line)
+    if lines:
+        yield ''.join(lines)
+
+
+def resolve_players_for_games(games, source: str) -> dict:
+    """
+    Collects every chess.com username (or lichess FIDE ID) of a batch of parsed games (chess.pgn.Game
+    or ParsedGame, anything with .headers) and resolves
+    them all at once, returning the map pgn_to_dict expects in its `players` argument.
+    """
+    if source == "chesscom":
+        usernames = {game.headers.get(color, "") for game in games for color in ("White", "Black")}
+        return resolve_chesscom_players(usernames)
+    elif source == "lichess":
+        fide_ids = {game.headers.get(color, "") for game in games for color in ("WhiteFideId", "BlackFideId")}
+        return resolve_lichess_players(fide_ids)
+    return {}
+
+
+def _scan_headers(game_texts, prefilter: PgnPrefilter = None) -> list:
+    """
+    Phase 1, headers only: returns (game_text, identity) for the games passing the prefilter.
+    identity is None for unfinished games, which can't be skipped on it: they may be longer than the stored row.
+    """
+    candidates = []
+    for game_text in game_texts:
+        try:
+            headers = chess.pgn.read_headers(io.StringIO(game_text))
+        except Exception as e:
+            continue
+        if headers is None:
+            continue
+        if prefilter is not None and not prefilter.matches(headers):
+            continue
+        candidates.append((game_text, generate_game_identity(headers) if is_finished_game(headers) else None))
+    return candidates
+
+
+def _parse_candidates(candidates) -> list:
+    """Phase 2, full parse: returns (identity, ParsedGame) for every (game_text, identity) that parses."""
+    parsed = []
+    for game_text, identity in candidates:
+        try:
+            game = chess.pgn.read_game(io.StringIO(game_text))
+        except Exception as e:
+            continue
+        if game is None:
+            continue
+        pgn_string = str(game)
+        parsed.append((identity, ParsedGame(
+            game.headers, pgn_string, generate_pgn_hash(pgn_string), generate_move_key(game), game.end().ply(),
+        )))
+    return parsed
+
+
+def parse_game_texts(game_texts, prefilter: PgnPrefilter = None) -> list:
+    """
+    All the CPU-bound work for a batch of raw game texts, without touching the cache or the database:
+    both parsing phases for every game passing the prefilter. Runs in the worker processes of
+    iter_parsed_batches, returning (identity, ParsedGame) pairs.
+    """
+    return _parse_candidates(_scan_headers(game_texts, prefilter))
+
+
+def iter_pgn_text_batches(pgn_source, batch_size: int):
+    """Groups the game texts of iter_pgn_texts into lists of up to `batch_size` games."""
+    batch = []
+    for game_text in iter_pgn_texts(pgn_source):
+        batch.append(game_text)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_batches_in_pool(executor, batches, prefilter: PgnPrefilter = None, window: int = 2):
+    """
+    Runs parse_game_texts on each batch of game texts in `executor` (a process pool) and yields
+    the parsed batches in order, with at most `window` batches submitted ahead of the one being consumed.
+    """
+    pending = collections.deque()
+    for batch in batches:
+        pending.append(executor.submit(parse_game_texts, batch, prefilter))
+        if len(pending) > window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_parsed_batches(pgn_source, prefilter: PgnPrefilter = None, batch_size: int = DEDUP_BATCH_SIZE, workers: int = 2):
+    """
+    Splits a PGN source at game boundaries into batches of `batch_size` games and runs
+    parse_game_texts on each batch in a pool of `workers` processes.
+    Yields the parsed batches in the order of the source; at most 2 * workers batches are
+    submitted ahead of the one being consumed, so memory stays bounded on large files.
+    With a single worker the batches are parsed in this process.
+    """
+    if workers <= 1:
+        for batch in iter_pgn_text_batches(pgn_source, batch_size):
+            yield parse_game_texts(batch, prefilter)
+        return
+    # django.setup lets worker processes import this module under the "spawn" start method too
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        yield from parse_batches_in_pool(executor, iter_pgn_text_batches(pgn_source, batch_size), prefilter, 2 * workers)
+
+
+def dedup_parsed_games(parsed) -> list:
+    """
+    Returns the ParsedGames of a batch of (identity, ParsedGame) pairs that are not stored yet:
+    one cache/database lookup for all identities, then one for all pgn hashes.
+    A finished game whose identity is stored as an unfinished game is kept even when its PGN
+    matches the stored row: it is the finished version of a live game, which save_games_batch upserts.
+    Copies of a game from the other source are dropped later, once the players are resolved
+    (see parsed_games_to_dicts).
+    """
+    new_identities = find_new_identities(identity for identity, _ in parsed if identity)
+    parsed = [(identity, parsed_game) for identity, parsed_game in parsed if identity is None or identity in new_identities]
+
+    new_hashes = find_new_pgn_hashes(parsed_game.pgn_hash for _, parsed_game in parsed)
+    # only games about to be dropped as duplicates need the extra lookup
+    unfinished_identities = find_unfinished_identities(
+        identity for identity, parsed_game in parsed
+        if identity and parsed_game.pgn_hash not in new_hashes
+    )
+    new_games = []
+    for identity, parsed_game in parsed:
+        if identity in unfinished_identities:
+            new_games.append(parsed_game)
+            continue
+        if parsed_game.pgn_hash not in new_hashes:
+            continue
+        new_hashes.discard(parsed_game.pgn_hash)  # the same game twice in one batch
+        new_games.append(parsed_game)
+    return new_games
 
-    pgn_io = io.StringIO(pgn_string)
+
+def drop_cross_source_duplicates(games_data, source: str) -> list:
+    """
+    Drops the game dicts of a batch whose canonical hash is stored for a game of the other source
+    (the same game relayed on lichess and mirrored on chess.com). A game whose identity is stored
+    as an unfinished game is kept, it is the finished version of a live game.
+    """
+    duplicates = find_cross_source_duplicates(
+        (game_data['canonical_hash'] for game_data in games_data if game_data.get('canonical_hash')), source,
+    )
+    if not duplicates:
+        return games_data
+    unfinished_identities = find_unfinished_identities(
+        game_data['identity_hash'] for game_data in games_data
+        if game_data.get('canonical_hash') in duplicates and game_data.get('identity_hash')
+    )
+    return [
+        game_data for game_data in games_data
+        if game_data.get('canonical_hash') not in duplicates or game_data.get('identity_hash') in unfinished_identities
+    ]
+
+
+def parsed_games_to_dicts(parsed_games, source: str, tournament_name: str = None) -> list[dict]:
+    """
+    Converts ParsedGames to standardized dictionaries, resolving the players of the whole batch
+    in one query instead of two get_or_create per game. The canonical hashes need those players,
+    so the copies of games stored from the other source are dropped here.
+    """
+    players = resolve_players_for_games(parsed_games, source)
     extracted_games = []
-    while True:
+    for parsed_game in parsed_games:
         try:
-            game = chess.pgn.read_game(pgn_io)
-            if game is None:
-                break
-            pgn_string = str(game)
-            pgn_hash = is_new_game(pgn_string)
-            if pgn_hash is False:
-                continue
-            extracted_games.append(pgn_to_dict(pgn_string, source, pgn_hash, tournament_name))
+            extracted_games.append(pgn_to_dict(
+                parsed_game.pgn_string, source, parsed_game.pgn_hash, tournament_name,
+                move_key=parsed_game.move_key, players=players,
+                headers=parsed_game.headers, ply_count=parsed_game.ply_count,
+            ))
         except Exception as e:
-            continue 
-    return extracted_games
\ No newline at end of file
+            continue
+    return drop_cross_source_duplicates(extracted_games, source)
+
+
+def _extract_batch(game_texts, source: str, tournament_name: str = None, prefilter: PgnPrefilter = None) -> list[dict]:
+    """
+    Runs a batch of raw game texts through the two parsing phases with batched dedup. Games whose
+    identity is already stored are dropped after phase 1, before paying for the full parse.
+    """
+    candidates = _scan_headers(game_texts, prefilter)
+    new_identities = find_new_identities(identity for _, identity in candidates if identity)
+    candidates = [
+        (game_text, identity) for game_text, identity in candidates
+        if identity is None or identity in new_identities
+    ]
+    return parsed_games_to_dicts(dedup_parsed_games(_parse_candidates(candidates)), source, tournament_name)
+
+
+def iter_games_from_pgn(pgn_source, source: str, tournament_name: str = None, prefilter: PgnPrefilter = None, batch_size: int = DEDUP_BATCH_SIZE, workers: int = None):
+    """
+    Streaming counterpart of extract_games_from_pgn_string.
+    Reads games from a str, file-like object or chunk iterator (see _iter_lines) in batches of
+    `batch_size`, parses each game exactly once and yields the standardized dictionaries of new games,
+    so memory stays bounded by the size of a batch.
+
+    Parsing is two-phase: headers are scanned first (moves skipped) to apply the optional
+    prefilter and the identity dedup, and only games that survive get a full move-tree parse.
+    With `workers` > 1 the parsing runs in that many processes (see iter_parsed_batches) and the
+    identity dedup happens after the parse; the games still come out in source order.
+
+    Nothing is marked as seen here: save the games with save_games_batch and commit them with
+    repo.utils.dedup.commit_saved_games once written (repo.utils.ingest.ingest_pgn does both).
+    """
+    if workers and workers > 1:
+        for parsed in iter_parsed_batches(pgn_source, prefilter, batch_size, workers):
+            yield from parsed_games_to_dicts(dedup_parsed_games(parsed), source, tournament_name)
+        return
+    for batch in iter_pgn_text_batches(pgn_source, batch_size):
+        yield from _extract_batch(batch, source, tournament_name, prefilter)
+
+
+def extract_games_from_pgn_string(pgn_string: str, source: str, tournament_name: str = None, prefilter: PgnPrefilter = None, workers: int = None) -> list[dict]:
+    """
+    generic method to Parse a PGN string and extracts all games into the standardized dictionary format.
+    This method is generic and can be used for PGNs from any source.
+    """
+    if not pgn_string:
+        return []
+    return list(iter_games_from_pgn(pgn_string, source, tournament_name, prefilter, workers=workers))
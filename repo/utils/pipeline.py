@@ -0,0 +1,253 @@
+import multiprocessing
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import connections
+
+from repo.utils.dedup import commit_saved_games
+from repo.utils.pgn import (
+    DEDUP_BATCH_SIZE,
+    dedup_parsed_games,
+    iter_pgn_text_batches,
+    parse_batches_in_pool,
+    parse_game_texts,
+    parsed_games_to_dicts,
+)
+from repo.utils.raw_archive import store_raw_fetch
+from repo.utils.save import save_games_batch
+
+# Marks the end of a queue's input; every worker of the reading stage gets one
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline: `func(item)` is called for every input item and returns an iterable
+    of items for the next stage (or None). `workers` threads run it concurrently.
+    """
+
+    def __init__(self, name: str, func, workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class Pipeline:
+    """
+    Runs a chain of Stages on threads connected by bounded queues.
+
+    A stage whose output queue is full blocks until the next stage catches up, so a fast stage
+    can never pile up more than `queue_size` items in front of a slow one, and the source is
+    only read as fast as the first stage consumes it. An exception in a stage function is
+    written to `stdout_writer` and counted, and only the item that raised is dropped.
+
+    run() returns once every item has gone through every stage. An interrupt of run stops
+    reading the source; the items already in the pipeline are still drained.
+    """
+
+    def __init__(self, stages, stdout_writer, queue_size: int = 4):
+        self.stages = list(stages)
+        self.stdout_writer = stdout_writer
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self.stats = {stage.name: Counter() for stage in self.stages}
+        self._lock = threading.Lock()
+        self._running_workers = [stage.workers for stage in self.stages]
+
+    def _count(self, stage: Stage, key: str):
+        with self._lock:
+            self.stats[stage.name][key] += 1
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+        try:
+            while True:
+                item = inbox.get()
+                if item is _STOP:
+                    break
+                self._count(stage, 'in')
+                try:
+                    for output in stage.func(item) or ():
+                        if outbox is not None:
+                            outbox.put(output)
+                        self._count(stage, 'out')
+                except Exception as e:
+                    self._count(stage, 'error')
+                    self.stdout_writer.write(f"Pipeline stage '{stage.name}' failed: {e}")
+        finally:
+            # database connections are per thread
+            connections.close_all()
+            with self._lock:
+                self._running_workers[index] -= 1
+                last_worker = self._running_workers[index] == 0
+            if last_worker and outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    outbox.put(_STOP)
+
+    def run(self, items) -> dict:
+        """Feeds `items` through the pipeline and returns the per-stage 'in' / 'out' / 'error' counts."""
+        threads = [
+            threading.Thread(target=self._work, args=(index,), name=f"pipeline-{stage.name}-{number}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for number in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for item in items:
+                self.queues[0].put(item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.queues[0].put(_STOP)
+            for thread in threads:
+                thread.join()
+        return self.stats
+
+
+class IngestJob:
+    """
+    One PGN to ingest through ingest_jobs. `fetch()` returns the PGN text, or None if there is
+    nothing to ingest. The other arguments are as for repo.utils.ingest.ingest_pgn.
+    When `url` is given, the fetched payload is kept in the raw archive (repo.utils.raw_archive).
+    `on_done(counts)`, if given, is called once every game of the PGN has been through the save stage.
+    A job that failed to fetch, or lost a batch to a stage error, is never done.
+    """
+
+    def __init__(self, fetch, source: str, tournament_name: str = None, prefilter=None, source_info: str = "", on_saved=None, on_done=None, url: str = None):
+        self.fetch = fetch
+        self.url = url
+        self.source = source
+        self.tournament_name = tournament_name
+        self.prefilter = prefilter
+        self.source_info = source_info
+        self.on_saved = on_saved
+        self.on_done = on_done
+        self.counts = {'created': 0, 'updated': 0, 'skipped': 0, 'error': 0}
+        self.done = False
+        self._pending_batches = 0
+        self._parsed = False
+        self._lock = threading.Lock()
+
+    def _batch_started(self):
+        with self._lock:
+            self._pending_batches += 1
+
+    def _batch_saved(self, counts=None):
+        with self._lock:
+            if counts:
+                for status, count in counts.items():
+                    self.counts[status] += count
+            self._pending_batches -= 1
+        self._check_done()
+
+    def _parse_finished(self):
+        with self._lock:
+            self._parsed = True
+        self._check_done()
+
+    def _check_done(self):
+        with self._lock:
+            if self.done or not self._parsed or self._pending_batches:
+                return
+            self.done = True
+        if self.on_done is not None:
+            self.on_done(self.counts)
+
+
+def ingest_jobs(jobs, stdout_writer, fetch_workers: int = 4, parse_workers: int = None, parse_processes: int = 0, dedup_workers: int = 1, resolve_workers: int = 1, save_workers: int = 1, queue_size: int = 4, batch_size: int = DEDUP_BATCH_SIZE) -> dict:
+    """
+    Ingests IngestJobs through a Pipeline of five stages, so downloads, parsing and database work overlap:
+
+        fetch    job.fetch()                       (network)
+        parse    parse_game_texts per batch        (CPU, in `parse_processes` processes if > 0,
+                                                    each PGN keeping up to 2 batches per process in flight)
+        dedup    dedup_parsed_games                (cache / database)
+        resolve  parsed_games_to_dicts             (database: players, copies from the other source)
+        save     save_games_batch, then commit_saved_games
+
+    Every stage has its own worker count; `parse_workers` defaults to one per parse process, so
+    several small PGNs (e.g. broadcast rounds) are parsed at once. A PGN is handed on in batches
+    of `batch_size` games, and at most `queue_size` batches wait between two stages.
+
+    Returns:
+        dict: counts of 'created', 'updated', 'skipped' and 'error' games over all jobs.
+    """
+    executor = None
+    if parse_processes > 0:
+        # "spawn": forking while the stage threads run could copy a lock held by one of them
+        executor = ProcessPoolExecutor(max_workers=parse_processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+
+    def fetch(job):
+        pgn = job.fetch()
+        if pgn is None:
+            return
+        if job.url:
+            try:
+                store_raw_fetch(job.source, job.url, pgn, job.tournament_name)
+            except Exception as e:
+                # the archive is a convenience, a full disk must not stop the ingestion
+                stdout_writer.write(f"Could not archive {job.url}: {e}")
+        yield job, pgn
+
+    def parse(item):
+        job, pgn = item
+        batches = iter_pgn_text_batches(pgn, batch_size)
+        if executor is not None:
+            parsed_batches = parse_batches_in_pool(executor, batches, job.prefilter, 2 * parse_processes)
+        else:
+            parsed_batches = (parse_game_texts(batch, job.prefilter) for batch in batches)
+        for parsed in parsed_batches:
+            job._batch_started()
+            yield job, parsed
+        job._parse_finished()
+
+    def dedup(item):
+        job, parsed = item
+        yield job, dedup_parsed_games(parsed)
+
+    def resolve(item):
+        job, parsed_games = item
+        yield job, parsed_games_to_dicts(parsed_games, job.source, job.tournament_name)
+
+    def save(item):
+        job, games_data = item
+
+        def saved(games_data):
+            commit_saved_games(games_data)
+            if job.on_saved is not None:
+                job.on_saved(games_data)
+
+        counts = save_games_batch(games_data, stdout_writer, job.source_info, on_saved=saved) if games_data else None
+        job._batch_saved(counts)
+        return ()
+
+    pipeline = Pipeline([
+        Stage('fetch', fetch, fetch_workers),
+        Stage('parse', parse, parse_workers or parse_processes),
+        Stage('dedup', dedup, dedup_workers),
+        Stage('resolve', resolve, resolve_workers),
+        Stage('save', save, save_workers),
+    ], stdout_writer, queue_size=queue_size)
+
+    fed_jobs = []
+
+    def feed():
+        for job in jobs:
+            fed_jobs.append(job)
+            yield job
+
+    try:
+        pipeline.run(feed())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    counts = {'created': 0, 'updated': 0, 'skipped': 0, 'error': 0}
+    for job in fed_jobs:
+        for status, count in job.counts.items():
+            counts[status] += count
+    return counts
@@ -0,0 +1,98 @@
+import datetime
+import gzip
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.utils import timezone
+
+from repo.models import RawFetch
+
+
+def _blob_path(sha256: str) -> str:
+    return os.path.join(settings.RAW_ARCHIVE_DIR, sha256[:2], f"{sha256}.pgn.gz")
+
+
+def store_raw_fetch(source: str, url: str, payload: str, tournament_name: str = None) -> RawFetch | None:
+    """
+    Archives a fetched PGN payload: the body is written once per distinct content, gzip-compressed,
+    under its sha256, and a RawFetch row records the source, URL and fetch time.
+    Does nothing (returns None) when RAW_ARCHIVE_ENABLED is off.
+    """
+    if not settings.RAW_ARCHIVE_ENABLED:
+        return None
+    data = payload.encode('utf-8')
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = _blob_path(sha256)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so a crash or a concurrent writer never leaves a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as raw_file, gzip.GzipFile(fileobj=raw_file, mode='wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return RawFetch.objects.create(
+        source=source, url=url, fetched_at=timezone.now(),
+        sha256=sha256, size=len(data), tournament_name=tournament_name,
+    )
+
+
+def read_raw_fetch(raw_fetch: RawFetch) -> str:
+    """Returns the archived payload of a RawFetch."""
+    with gzip.open(_blob_path(raw_fetch.sha256), 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def iter_raw_fetches(source: str = None, since=None, until=None, latest_only: bool = True):
+    """
+    Yields archived fetches in URL then fetch time order, filtered by source and fetch time.
+    With `latest_only`, only the most recent fetch of each URL is yielded: later fetches of a
+    chess.com month or a lichess round contain the earlier ones.
+    """
+    raw_fetches = RawFetch.objects.order_by('source', 'url', '-fetched_at')
+    if source:
+        raw_fetches = raw_fetches.filter(source=source)
+    if since:
+        raw_fetches = raw_fetches.filter(fetched_at__gte=since)
+    if until:
+        raw_fetches = raw_fetches.filter(fetched_at__lt=until)
+
+    last_key = None
+    for raw_fetch in raw_fetches.iterator(chunk_size=1000):
+        key = (raw_fetch.source, raw_fetch.url)
+        if latest_only and key == last_key:
+            continue
+        last_key = key
+        yield raw_fetch
+
+
+
+def prune_raw_archive(retention_days: int = None, dry_run: bool = False) -> dict:
+    """
+    Deletes the fetches older than `retention_days` (default RAW_ARCHIVE_RETENTION_DAYS, 0 keeps
+    everything), and the payloads no remaining fetch refers to.
+
+    Returns:
+        dict: counts of deleted 'fetches' and 'payloads', and the 'bytes' freed on disk.
+    """
+    retention_days = settings.RAW_ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    counts = {'fetches': 0, 'payloads': 0, 'bytes': 0}
+    if retention_days <= 0:
+        return counts
+    expired = RawFetch.objects.filter(fetched_at__lt=timezone.now() - datetime.timedelta(days=retention_days))
+    hashes = set(expired.values_list('sha256', flat=True))
+    counts['fetches'] = expired.count()
+    # payloads are shared between identical fetches, a recent one may still need it
+    kept = set(RawFetch.objects.filter(sha256__in=hashes).exclude(id__in=expired.values('id')).values_list('sha256', flat=True))
+    if not dry_run:
+        expired.delete()
+    for sha256 in hashes - kept:
+        path = _blob_path(sha256)
+        if not os.path.exists(path):
+            continue
+        counts['payloads'] += 1
+        counts['bytes'] += os.path.getsize(path)
+        if not dry_run:
+            os.remove(path)
+    return counts
@@ -0,0 +1,139 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import transaction
+
+from repo.models import Game, GamePgn, JobCheckpoint
+from repo.utils.compact_pgn import PGN_COLUMNS, decode_pgn
+from repo.utils.feed import update_daily_feeds
+from repo.utils.pgn import derive_game_metadata
+from repo.utils.tournaments import relink_tournament_games
+
+# Game fields refreshed by reprocess_games (see repo.utils.pgn.derive_game_metadata)
+REPROCESS_FIELDS = ['format', 'opening', 'tournament', 'tournament_url']
+# Game fields the Tournament of a game is resolved from, and its counters are kept from
+TOURNAMENT_FIELDS = ['date', 'tournament_group', 'white', 'black', 'white_rating', 'black_rating']
+# JobCheckpoint of reprocess_games
+CHECKPOINT_NAME = 'reprocess_games'
+
+
+def rederive_rows(rows) -> list:
+    """
+    Re-derives the metadata of a chunk of (id, source, pgn, pgn_moves, pgn_clocks, pgn_layout)
+    rows, decoding the compact PGNs first (see Game.pgn_text). Pure CPU work, so it can run in a
+    worker process. Returns (id, metadata) pairs.
+    """
+    rederived = []
+    for game_id, source, pgn, moves, clocks, layout in rows:
+        try:
+            if moves is not None:
+                pgn = decode_pgn(moves, clocks, layout)
+            rederived.append((game_id, derive_game_metadata(pgn, source)))
+        except Exception as e:
+            continue
+    return rederived
+
+
+def _iter_chunks(after_id: int, chunk_size: int):
+    """Yields the games after `after_id` as lists of Game, in id order, by keyset pagination."""
+    while True:
+        chunk = list(
+            Game.objects.filter(id__gt=after_id)
+            .select_related('pgn_data')
+            .order_by('id')
+            .only('id', 'source', *TOURNAMENT_FIELDS, *PGN_COLUMNS, *REPROCESS_FIELDS)[:chunk_size]
+        )
+        if not chunk:
+            return
+        after_id = chunk[-1].id
+        yield chunk
+
+
+def _apply(chunk, rederived):
+    """
+    Sets the re-derived fields on the games of a chunk. Returns the games that changed, and
+    {game id: previous tournament} of those whose tournament or tournament_url changed.
+    """
+    metadata_by_id = dict(rederived)
+    changed, old_tournaments = [], {}
+    for game in chunk:
+        metadata = metadata_by_id.get(game.id)
+        if metadata is None:
+            continue
+        if any(getattr(game, field) != value for field, value in metadata.items()):
+            if any(getattr(game, field) != metadata.get(field, getattr(game, field)) for field in ('tournament', 'tournament_url')):
+                old_tournaments[game.id] = game.tournament
+            for field, value in metadata.items():
+                setattr(game, field, value)
+            changed.append(game)
+    return changed, old_tournaments
+
+
+def reprocess_games(stdout_writer, chunk_size: int = 1000, processes: int = 0, resume: bool = False, after_id: int = 0) -> dict:
+    """
+    Walks every stored game in id order and re-derives format, opening, tournament URL and
+    (chess.com) tournament from its stored PGN, writing back only the rows that changed with one
+    bulk_update per chunk. Games whose tournament changed are moved to their new Tournament, and
+    the stored daily feeds of both groups are updated, in the same transaction.
+
+    With `processes` > 0 the PGN decoding and the derivation run in a process pool while the next
+    chunks are read; chunks are still written back in id order. The id of the last written chunk
+    is checkpointed in the database (JobCheckpoint), with the chunk, and `resume` starts after it
+    instead of after `after_id`.
+
+    Returns:
+        dict: counts of 'processed' and 'updated' games, and the 'last_id' reached.
+    """
+    if resume:
+        after_id = JobCheckpoint.objects.filter(name=CHECKPOINT_NAME).values_list('last_id', flat=True).first() or after_id
+    counts = {'processed': 0, 'updated': 0, 'last_id': after_id}
+
+    def write(chunk, rederived):
+        changed, old_tournaments = _apply(chunk, rederived)
+        moved = [game for game in changed if game.id in old_tournaments]
+        with transaction.atomic():
+            Game.objects.bulk_update(changed, REPROCESS_FIELDS)
+            previous = relink_tournament_games(moved, old_tournaments)
+            # the stored daily feeds group games by tournament: the groups they left and joined
+            update_daily_feeds(moved + previous)
+            JobCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'last_id': chunk[-1].id})
+        counts['processed'] += len(chunk)
+        counts['updated'] += len(changed)
+        counts['last_id'] = chunk[-1].id
+        stdout_writer.write(f"Processed {counts['processed']} games (up to id {counts['last_id']}), {counts['updated']} updated")
+
+    def rows(chunk):
+        # the stored fields, decoded by rederive_rows in the worker (bytes: memoryviews don't pickle)
+        rows = []
+        for game in chunk:
+            try:
+                pgn_data = game.pgn_data
+            except GamePgn.DoesNotExist:
+                rows.append((game.id, game.source, '', None, None, None))
+                continue
+            moves, clocks = pgn_data.pgn_moves, pgn_data.pgn_clocks
+            rows.append((
+                game.id, game.source, pgn_data.pgn,
+                None if moves is None else bytes(moves), None if clocks is None else bytes(clocks), pgn_data.pgn_layout,
+            ))
+        return rows
+
+    if processes <= 0:
+        for chunk in _iter_chunks(after_id, chunk_size):
+            write(chunk, rederive_rows(rows(chunk)))
+    else:
+        # django.setup lets worker processes import the models under the "spawn" start method too
+        with ProcessPoolExecutor(max_workers=processes, initializer=django.setup) as executor:
+            pending = collections.deque()
+            for chunk in _iter_chunks(after_id, chunk_size):
+                pending.append((chunk, executor.submit(rederive_rows, rows(chunk))))
+                if len(pending) > 2 * processes:
+                    chunk, future = pending.popleft()
+                    write(chunk, future.result())
+            while pending:
+                chunk, future = pending.popleft()
+                write(chunk, future.result())
+
+    JobCheckpoint.objects.filter(name=CHECKPOINT_NAME).delete()
+    return counts
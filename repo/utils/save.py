@@ -1,13 +1,109 @@
-from django.db import IntegrityError
-from repo.models import Game, Player
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from repo.models import Game, GamePgn, Player
+from repo.utils.compact_pgn import COMPACT_FIELDS
+from repo.utils.feed import update_daily_feeds
+from repo.utils.tournaments import game_edition, record_tournament_games, replace_tournament_games, resolve_tournaments
+
+# Number of games written per bulk_create / transaction when saving in batches
+DEFAULT_SAVE_BATCH_SIZE = 500
+# Columns of a stored game its tournament counters and daily feed groups were built from
+STORED_VERSION_FIELDS = ['date', 'tournament', 'tournament_group_id', 'white_id', 'black_id', 'white_rating', 'black_rating']
+
+
+def _write_error(stdout_writer, error_message):
+    # Ensure stdout_writer has style attribute, typical for Django commands
+    if hasattr(stdout_writer, 'style') and hasattr(stdout_writer.style, 'ERROR'):
+        stdout_writer.write(stdout_writer.style.ERROR(error_message))
+    else: # Fallback if style is not available (e.g. plain print)
+        print(f"ERROR: {error_message}")
+
+def _is_newer_version(game_data, stored):
+    """
+    Whether `game_data` supersedes the stored game with the same identity_hash: a finished game
+    replaces an unfinished one, otherwise the version with more half-moves wins.
+    """
+    incoming_finished = game_data.get('result', '*') != '*'
+    stored_finished = stored['result'] != '*'
+    if incoming_finished != stored_finished:
+        return incoming_finished
+    return (game_data.get('ply_count') or 0) > (stored['ply_count'] or 0)
+
+
+def _stored_versions(identities):
+    """
+    Returns {identity_hash: {'id', 'result', 'ply_count', *STORED_VERSION_FIELDS}} of the longest
+    stored game per identity.
+    """
+    stored = {}
+    rows = Game.objects.filter(identity_hash__in=list(identities)).values(
+        'id', 'identity_hash', 'result', 'ply_count', *STORED_VERSION_FIELDS
+    )
+    for row in rows:
+        current = stored.get(row['identity_hash'])
+        if current is None or _is_newer_version(row, current):
+            stored[row['identity_hash']] = row
+    return stored
+
+
+def _previous_version(stored):
+    """The stored version of an upserted game, as a Game holding what its counters were built from."""
+    return Game(id=stored['id'], **{field: stored[field] for field in STORED_VERSION_FIELDS})
+
+
+def _split_pgn(game_data, tournaments):
+    """
+    Splits a game dict into its Game fields and its PGN text, which is stored in GamePgn.
+    The fields get the game's Tournament from `tournaments` (see resolve_tournaments).
+    """
+    fields = dict(game_data)
+    edition = game_edition(game_data)
+    fields['tournament_group'] = tournaments[edition[0]] if edition else None
+    return fields, fields.pop('pgn', '')
+
+
+def _resolve_game_tournaments(games_data):
+    return resolve_tournaments(game_edition(game_data) for game_data in games_data)
+
+
+def _write_pgns(pgns_by_id):
+    """
+    Stores {game id: PGN text} in GamePgn with one statement, replacing the stored PGN of
+    games that already have one (a compact one included).
+    """
+    GamePgn.objects.bulk_create(
+        [GamePgn(game_id=game_id, pgn=pgn) for game_id, pgn in pgns_by_id.items()],
+        update_conflicts=True, unique_fields=['game'], update_fields=['pgn', *COMPACT_FIELDS],
+    )
+
 
 def save_game_data(game_data, stdout_writer, source_info=""):
     """
     Saves a single game's data to the database.
+    A game whose identity_hash is already stored updates that row when it is a newer version
+    (see _is_newer_version) and is skipped otherwise.
     Handles IntegrityError by skipping and logs other errors.
     """
     try:
-        Game.objects.create(**game_data)
+        identity = game_data.get('identity_hash')
+        stored = _stored_versions([identity]).get(identity) if identity else None
+        with transaction.atomic():
+            fields, pgn = _split_pgn(game_data, _resolve_game_tournaments([game_data]))
+            if stored is not None:
+                if not _is_newer_version(game_data, stored):
+                    return 'skipped'
+                Game.objects.filter(pk=stored['id']).update(**fields, updated_at=timezone.now())
+                _write_pgns({stored['id']: pgn})
+                game = Game(id=stored['id'], **fields)
+                previous = _previous_version(stored)
+                replace_tournament_games([previous], [game])
+                update_daily_feeds([game, previous])
+                return 'updated'
+            game = Game.objects.create(**fields)
+            _write_pgns({game.id: pgn})
+            record_tournament_games([game])
+            update_daily_feeds([game])
         return 'created'
     except IntegrityError:
         # Game with this pgn_hash likely already exists, skip silently (although it should not happen often as we are using redis cache now to check while processing PGN if it already exists in the database)
@@ -17,45 +113,198 @@ def save_game_data(game_data, stdout_writer, source_info=""):
         if source_info:
             error_message += f" from {source_info}"
         error_message += f": {e} - Data: {game_data}"
-        # Ensure stdout_writer has style attribute, typical for Django commands
-        if hasattr(stdout_writer, 'style') and hasattr(stdout_writer.style, 'ERROR'):
-            stdout_writer.write(stdout_writer.style.ERROR(error_message))
-        else: # Fallback if style is not available (e.g. plain print)
-            print(f"ERROR: {error_message}")
+        _write_error(stdout_writer, error_message)
         return 'error'
-    
-def get_or_create_chesscom_player(username):
-    from repo.utils.chesscom.api import CHESSCOM_API
-    player, created = Player.objects.get_or_create(chesscom_username=username)
 
-    # Only fetch details if newly created or missing name
-    if created or not player.name:
+
+def save_games_batch(games_data, stdout_writer, source_info="", batch_size=DEFAULT_SAVE_BATCH_SIZE, on_saved=None):
+    """
+    Saves a list of game dicts (as returned by extract_games_from_pgn_string) in chunks.
+    Each chunk is written with a single bulk_create(ignore_conflicts=True) inside its own
+    transaction, so duplicates on pgn_hash are skipped by the database instead of raising.
+    Games whose identity_hash is already stored are upserts: a newer version of the game
+    (a live broadcast game that grew or finished) overwrites the stored row with one bulk_update,
+    an older or equal one is skipped. The PGNs go to GamePgn, in the same transaction; an
+    overwritten game gets its new PGN as text, even if the old one was stored compactly.
+    New games are linked to their Tournament and added to its counters, overwritten games move from
+    the counters of their stored version to those of the new one (which may be another tournament,
+    or other ratings), and the stored daily feeds of the dates they belong to are updated, in the
+    same transaction.
+    If a chunk fails for any other reason it is retried row by row with save_game_data,
+    so one bad game does not cost the rest of the chunk.
+    `on_saved`, if given, is called after each chunk with the games that are now in the database
+    (created, updated or already present), e.g. to mark them as seen in the dedup cache.
+
+    Returns:
+        dict: counts of 'created', 'updated', 'skipped' and 'error' games.
+    """
+    counts = {'created': 0, 'updated': 0, 'skipped': 0, 'error': 0}
+    games_data = list(games_data)
+
+    for start in range(0, len(games_data), batch_size):
+        chunk = games_data[start:start + batch_size]
+
+        # Drop duplicates inside the chunk itself: first occurrence wins per pgn_hash,
+        # the newest version wins per identity
+        unique_games = {}
+        for game_data in chunk:
+            unique_games.setdefault(game_data['pgn_hash'], game_data)
+        latest_versions = {}
+        for pgn_hash, game_data in unique_games.items():
+            key = game_data.get('identity_hash') or pgn_hash
+            current = latest_versions.get(key)
+            if current is None or _is_newer_version(game_data, current):
+                latest_versions[key] = game_data
+        counts['skipped'] += len(chunk) - len(latest_versions)
+        unique_games = {game_data['pgn_hash']: game_data for game_data in latest_versions.values()}
+
         try:
-            chesscom_api = CHESSCOM_API()
-            player_data = chesscom_api.get_player_profile(username)
-            player.name = player_data.get('name', '')
-            player.country = player_data.get('country', '').split('/')[-1] if player_data.get('country') else None
-            player.title = player_data.get('title', '')
-            player.save()
+            with transaction.atomic():
+                existing_hashes = set(
+                    Game.objects.filter(pgn_hash__in=list(unique_games.keys()))
+                    .values_list('pgn_hash', flat=True)
+                )
+                stored = _stored_versions(
+                    game_data['identity_hash'] for pgn_hash, game_data in unique_games.items()
+                    if game_data.get('identity_hash') and pgn_hash not in existing_hashes
+                )
+                tournaments = _resolve_game_tournaments(unique_games.values())
+                new_games, updated_games, previous_versions, skipped = [], [], [], len(existing_hashes)
+                pgns_by_hash, pgns_by_id = {}, {}
+                for pgn_hash, game_data in unique_games.items():
+                    if pgn_hash in existing_hashes:
+                        continue
+                    fields, pgn = _split_pgn(game_data, tournaments)
+                    stored_game = stored.get(game_data.get('identity_hash'))
+                    if stored_game is None:
+                        new_games.append(Game(**fields))
+                        pgns_by_hash[pgn_hash] = pgn
+                    elif _is_newer_version(game_data, stored_game):
+                        updated_games.append(Game(id=stored_game['id'], updated_at=timezone.now(), **fields))
+                        previous_versions.append(_previous_version(stored_game))
+                        pgns_by_id[stored_game['id']] = pgn
+                    else:
+                        skipped += 1
+                Game.objects.bulk_create(new_games, ignore_conflicts=True)
+                if updated_games:
+                    Game.objects.bulk_update(updated_games, [*_split_pgn(chunk[0], tournaments)[0].keys(), 'updated_at'])
+                # ignore_conflicts leaves the new games without ids, read them back by pgn_hash. Rows
+                # without a GamePgn yet are the ones inserted here (a committed game always has its PGN);
+                # the games a concurrent ingest saved first were dropped by the insert and are skipped.
+                inserted = dict(
+                    Game.objects.filter(pgn_hash__in=list(pgns_by_hash), pgn_data__isnull=True).values_list('pgn_hash', 'id')
+                )
+                for game in new_games:
+                    game.id = inserted.get(game.pgn_hash)
+                    if game.id is not None:
+                        pgns_by_id[game.id] = pgns_by_hash[game.pgn_hash]
+                skipped += len(new_games) - len(inserted)
+                new_games = [game for game in new_games if game.id is not None]
+                _write_pgns(pgns_by_id)
+                record_tournament_games(new_games)
+                replace_tournament_games(previous_versions, updated_games)
+                update_daily_feeds(new_games + updated_games + previous_versions)
+            counts['created'] += len(new_games)
+            counts['updated'] += len(updated_games)
+            counts['skipped'] += skipped
+            saved_games = list(unique_games.values())
         except Exception as e:
-            print(f"Failed to fetch data for {username}: {e}")
+            error_message = f"Bulk save failed"
+            if source_info:
+                error_message += f" for {source_info}"
+            error_message += f": {e} - falling back to per-game saves for {len(unique_games)} games"
+            _write_error(stdout_writer, error_message)
+            saved_games = []
+            for game_data in unique_games.values():
+                status = save_game_data(game_data, stdout_writer, source_info)
+                counts[status] += 1
+                if status != 'error':
+                    saved_games.append(game_data)
 
-    return player
+        if on_saved is not None and saved_games:
+            on_saved(saved_games)
+
+    return counts
+
+
+def get_or_create_chesscom_player(username):
+    # Profile details are filled in later by the enrichment queue (repo.utils.enrichment),
+    # usernames match case-insensitively (see resolve_chesscom_players)
+    return resolve_chesscom_players([username])[username]
 
 
 def get_or_create_lichess_player(fide_id):
-    from repo.utils.lichess.api import LICHESS_API
-    player, created = Player.objects.get_or_create(fide_id=fide_id)
-    # Only fetch details if newly created or missing name
-    if created or not player.name:
-        try:
-            lichess_api = LICHESS_API()
-            player_data = lichess_api.get_player_fide_profile(fide_id)
-            player.name = player_data.get('name', '')
-            player.fide_id = fide_id
-            player.country = player_data.get('federation', '')
-            player.title = player_data.get('title', '')
-            player.save()
-        except Exception as e:
-            print(f"Failed to fetch data for {fide_id}: {e}")
+    # untagged lichess games all share the fide_id="" placeholder, which is never enriched
+    player, created = Player.objects.get_or_create(
+        fide_id=fide_id,
+        defaults={'needs_enrichment': bool(fide_id)},
+    )
     return player
+
+
+def _resolve_players(field, keys):
+    """
+    Returns {key: Player} for every key of a batch, looked up by `field` with one __in query.
+    Missing players are bulk created (ignore_conflicts covers concurrent ingests) and re-read
+    with a second query. They are flagged needs_enrichment; no profile HTTP happens here.
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+    players = {getattr(player, field): player for player in Player.objects.filter(**{f"{field}__in": keys})}
+
+    missing = keys - players.keys()
+    if missing:
+        Player.objects.bulk_create(
+            [Player(**{field: key}, needs_enrichment=bool(key)) for key in missing],
+            ignore_conflicts=True,
+        )
+        players.update({
+            getattr(player, field): player
+            for player in Player.objects.filter(**{f"{field}__in": missing})
+        })
+    return players
+
+
+def find_chesscom_players(usernames) -> dict:
+    """
+    Returns {lowercased username: Player} of the stored players with one of `usernames`, in any case:
+    chess.com usernames are case-insensitive, PGN headers carry the display case ("MagnusCarlsen")
+    and profile URLs the lowercase one ("magnuscarlsen"). An exact match wins over the others.
+    """
+    usernames = set(usernames)
+    players = {}
+    rows = Player.objects.annotate(username_key=Lower('chesscom_username')).filter(
+        username_key__in={username.lower() for username in usernames}
+    )
+    for player in rows:
+        if player.username_key not in players or player.chesscom_username in usernames:
+            players[player.username_key] = player
+    return players
+
+
+def resolve_chesscom_players(usernames):
+    """
+    Batch counterpart of get_or_create_chesscom_player: returns {username: Player}.
+    Usernames match case-insensitively, and a player stored lowercased (e.g. by the players
+    crawler) takes the case of the PGN.
+    """
+    usernames = set(usernames)
+    stored = find_chesscom_players(usernames)
+    players, renamed = {}, []
+    for username in usernames:
+        player = stored.get(username.lower())
+        if player is None:
+            continue
+        if player.chesscom_username != username and player.chesscom_username == username.lower():
+            player.chesscom_username = username
+            renamed.append(player)
+        players[username] = player
+    Player.objects.bulk_update(renamed, ['chesscom_username'])
+    players.update(_resolve_players('chesscom_username', usernames - players.keys()))
+    return players
+
+
+def resolve_lichess_players(fide_ids):
+    """Batch counterpart of get_or_create_lichess_player: returns {fide_id: Player}."""
+    return _resolve_players('fide_id', fide_ids)
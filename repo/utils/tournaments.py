@@ -0,0 +1,325 @@
+import collections
+import math
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from repo.models import Game, Player, Tournament
+
+TITLE_WEIGHTS = {
+    'GM': 100,
+    'WGM': 90,
+    'IM': 80,
+    'WIM': 70,
+    'FM': 60,
+    'WFM': 50,
+    'CM': 40,
+    'WCM': 30,
+    'NM': 20,
+}
+# Tournament fields maintained by record_tournament_games / adjust_title_weights
+COUNTER_FIELDS = ['game_count', 'player_count', 'rating_sum', 'rating_count', 'title_weight_sum', 'strength']
+
+
+def get_title_weight(title):
+    """
+    Returns a numerical weight for player titles.
+    Higher weights for stronger titles.
+    """
+    return TITLE_WEIGHTS.get(title, 0)
+
+
+def tournament_strength(title_weight_sum, player_count, game_count):
+    """
+    The average title weight per player, scaled down for tournaments with few games:
+    strength = average weight * (1 - e^(-games/2)).
+    """
+    base_strength = title_weight_sum / player_count if player_count > 0 else 0
+    return base_strength * (1 - math.exp(-game_count / 2))
+
+
+def calculate_tournament_strength(tournament_games):
+    """
+    Calculate the weighted average strength of a tournament based on player titles,
+    with a penalty factor for tournaments with few games.
+    Returns a score that can be used for sorting.
+    Stored tournaments keep this score up to date in Tournament.strength; this is for the
+    games that have no Tournament (yet).
+    """
+    if not tournament_games:
+        return 0
+    
+    total_weight = 0
+    player_count = 0
+    game_count = len(tournament_games)
+    
+    # Track unique players to avoid counting the same player multiple times
+    seen_players = set()
+    
+    for game in tournament_games:
+        # Process white player
+        white_id = game['white']['id']
+        white_title = game['white']['title']
+        if white_id and white_id not in seen_players:
+            total_weight += get_title_weight(white_title)
+            seen_players.add(white_id)
+            player_count += 1
+            
+        # Process black player
+        black_id = game['black']['id']
+        black_title = game['black']['title']
+        if black_id and black_id not in seen_players:
+            total_weight += get_title_weight(black_title)
+            seen_players.add(black_id)
+            player_count += 1
+    
+    # Average weight per player, scaled down for tournaments with 1-2 games
+    return tournament_strength(total_weight, player_count, game_count)
+
+
+def tournament_name(tournament):
+    """The Tournament name a Game.tournament value is grouped under, or None for no tournament."""
+    return (tournament or '').strip() or None
+
+
+def tournament_edition(tournament, tournament_url=None, date=None):
+    """
+    Returns the (key, name) of the Tournament edition a game belongs to, or None for no tournament.
+    The name alone would merge every edition of a recurring event ("Late Titled Tuesday Blitz",
+    "Online Chess"), so the key is the source's tournament URL when the game has one, and
+    otherwise the name and the game's date (a PGN date string or a date).
+    """
+    name = tournament_name(tournament)
+    if name is None:
+        return None
+    if tournament_url and tournament_url.strip():
+        return tournament_url.strip(), name
+    try:
+        date = Game._meta.get_field('date').to_python(date or None)
+    except ValidationError:
+        date = None
+    return (f"{name}|{date.isoformat()}" if date else name), name
+
+
+def game_edition(game):
+    """tournament_edition of a Game or a game dict (as returned by pgn_to_dict)."""
+    if isinstance(game, dict):
+        return tournament_edition(game.get('tournament'), game.get('tournament_url'), game.get('date'))
+    return tournament_edition(game.tournament, game.tournament_url, game.date)
+
+
+def resolve_tournaments(editions):
+    """
+    Returns {key: Tournament} for every (key, name) edition of a batch (None entries are skipped),
+    with one __in query. Missing tournaments are bulk created (ignore_conflicts covers concurrent
+    ingests) and re-read.
+    """
+    names = dict(edition for edition in editions if edition)
+    if not names:
+        return {}
+    tournaments = {tournament.key: tournament for tournament in Tournament.objects.filter(key__in=names)}
+
+    missing = names.keys() - tournaments.keys()
+    if missing:
+        Tournament.objects.bulk_create([Tournament(key=key, name=names[key]) for key in missing], ignore_conflicts=True)
+        tournaments.update({
+            tournament.key: tournament
+            for tournament in Tournament.objects.filter(key__in=missing)
+        })
+    return tournaments
+
+
+def link_tournaments(games):
+    """
+    Sets tournament_group on Game instances from their tournament, tournament_url and date,
+    resolving the editions of the whole batch at once (see resolve_tournaments).
+    """
+    tournaments = resolve_tournaments(game_edition(game) for game in games)
+    for game in games:
+        edition = game_edition(game)
+        game.tournament_group = tournaments[edition[0]] if edition else None
+
+
+def _lock_tournaments(tournament_ids):
+    # row locks, so concurrent ingests add to the counters one after the other (call in a transaction)
+    return list(Tournament.objects.select_for_update().filter(id__in=tournament_ids).order_by('id'))
+
+
+def record_tournament_games(games):
+    """
+    Adds newly saved games (Game instances, saved or not) to the counters of their tournaments:
+    game count, unique players and their title weights, ratings, and the strength derived from them.
+    Must run in the transaction that saves the games.
+    """
+    games_by_tournament = collections.defaultdict(list)
+    for game in games:
+        if game.tournament_group_id:
+            games_by_tournament[game.tournament_group_id].append(game)
+    if not games_by_tournament:
+        return
+
+    tournaments = _lock_tournaments(games_by_tournament)
+    players_by_tournament = {
+        tournament_id: {player_id for game in tournament_games for player_id in (game.white_id, game.black_id) if player_id}
+        for tournament_id, tournament_games in games_by_tournament.items()
+    }
+    TournamentPlayer = Tournament.players.through
+    known = set(
+        TournamentPlayer.objects.filter(
+            tournament_id__in=players_by_tournament,
+            player_id__in=set().union(*players_by_tournament.values()),
+        ).values_list('tournament_id', 'player_id')
+    )
+    new_entries = [
+        (tournament_id, player_id)
+        for tournament_id, player_ids in players_by_tournament.items()
+        for player_id in player_ids
+        if (tournament_id, player_id) not in known
+    ]
+    TournamentPlayer.objects.bulk_create(
+        [TournamentPlayer(tournament_id=tournament_id, player_id=player_id) for tournament_id, player_id in new_entries],
+        ignore_conflicts=True,
+    )
+    titles = dict(Player.objects.filter(id__in={player_id for _, player_id in new_entries}).values_list('id', 'title'))
+    new_players = collections.defaultdict(list)
+    for tournament_id, player_id in new_entries:
+        new_players[tournament_id].append(player_id)
+
+    for tournament in tournaments:
+        tournament_games = games_by_tournament[tournament.id]
+        ratings = [
+            rating
+            for game in tournament_games
+            for rating in (game.white_rating, game.black_rating)
+            if rating is not None
+        ]
+        tournament.game_count += len(tournament_games)
+        tournament.rating_sum += sum(ratings)
+        tournament.rating_count += len(ratings)
+        tournament.player_count += len(new_players[tournament.id])
+        tournament.title_weight_sum += sum(get_title_weight(titles.get(player_id)) for player_id in new_players[tournament.id])
+        tournament.strength = tournament_strength(tournament.title_weight_sum, tournament.player_count, tournament.game_count)
+    Tournament.objects.bulk_update(tournaments, COUNTER_FIELDS)
+
+
+def remove_tournament_games(games):
+    """
+    Takes games (Game instances whose tournament_group_id is the tournament they leave) out of the
+    counters of their tournaments, the counterpart of record_tournament_games. Players without
+    another game in a tournament leave it. Must run in a transaction, after the games were relinked.
+    """
+    games_by_tournament = collections.defaultdict(list)
+    for game in games:
+        if game.tournament_group_id:
+            games_by_tournament[game.tournament_group_id].append(game)
+    if not games_by_tournament:
+        return
+
+    tournaments = _lock_tournaments(games_by_tournament)
+    pairs = {
+        (tournament_id, player_id)
+        for tournament_id, tournament_games in games_by_tournament.items()
+        for game in tournament_games
+        for player_id in (game.white_id, game.black_id)
+        if player_id
+    }
+    player_ids = {player_id for _, player_id in pairs}
+    remaining = set()
+    rows = Game.objects.filter(tournament_group_id__in=games_by_tournament).filter(
+        Q(white_id__in=player_ids) | Q(black_id__in=player_ids)
+    ).values_list('tournament_group_id', 'white_id', 'black_id')
+    for tournament_id, white_id, black_id in rows:
+        remaining.update({(tournament_id, white_id), (tournament_id, black_id)})
+    leaving = pairs - remaining
+
+    TournamentPlayer = Tournament.players.through
+    entries = TournamentPlayer.objects.filter(
+        tournament_id__in=games_by_tournament, player_id__in=player_ids,
+    ).values_list('id', 'tournament_id', 'player_id')
+    TournamentPlayer.objects.filter(
+        id__in=[entry_id for entry_id, tournament_id, player_id in entries if (tournament_id, player_id) in leaving]
+    ).delete()
+    titles = dict(Player.objects.filter(id__in={player_id for _, player_id in leaving}).values_list('id', 'title'))
+    left_players = collections.defaultdict(list)
+    for tournament_id, player_id in leaving:
+        left_players[tournament_id].append(player_id)
+
+    for tournament in tournaments:
+        tournament_games = games_by_tournament[tournament.id]
+        ratings = [
+            rating
+            for game in tournament_games
+            for rating in (game.white_rating, game.black_rating)
+            if rating is not None
+        ]
+        tournament.game_count -= len(tournament_games)
+        tournament.rating_sum -= sum(ratings)
+        tournament.rating_count -= len(ratings)
+        tournament.player_count -= len(left_players[tournament.id])
+        tournament.title_weight_sum -= sum(get_title_weight(titles.get(player_id)) for player_id in left_players[tournament.id])
+        tournament.strength = tournament_strength(tournament.title_weight_sum, tournament.player_count, tournament.game_count)
+    Tournament.objects.bulk_update(tournaments, COUNTER_FIELDS)
+
+
+def replace_tournament_games(old_games, games):
+    """
+    Moves stored games from the counters their previous versions were recorded in (`old_games`,
+    Game instances holding the previous tournament_group_id, players and ratings) to those of their
+    new versions (`games`), e.g. when an upsert changed a game's tournament or ratings.
+    Must run in the transaction that saves the new versions.
+    """
+    # both sides locked at once and in id order, like a single ingest would
+    _lock_tournaments({game.tournament_group_id for game in [*old_games, *games]} - {None})
+    remove_tournament_games(old_games)
+    record_tournament_games(games)
+
+
+def relink_tournament_games(games, old_tournaments):
+    """
+    Links stored games whose tournament or tournament_url changed to their Tournament again (the
+    resolution saving uses) and moves them between the counters of the old and new tournaments.
+    `old_tournaments` maps game ids to their previous Game.tournament value.
+    Returns the previous versions of the games, as Game instances holding their old tournament
+    fields, e.g. to update the groups they left on the daily feeds. Must run in a transaction.
+    """
+    old_games = {
+        game.id: Game(
+            id=game.id, date=game.date, tournament=old_tournaments[game.id], tournament_group_id=game.tournament_group_id,
+            white_id=game.white_id, black_id=game.black_id,
+            white_rating=game.white_rating, black_rating=game.black_rating,
+        )
+        for game in games
+    }
+    link_tournaments(games)
+    moved = [game for game in games if game.tournament_group_id != old_games[game.id].tournament_group_id]
+    Game.objects.bulk_update(moved, ['tournament_group'])
+    replace_tournament_games([old_games[game.id] for game in moved], moved)
+    return list(old_games.values())
+
+
+def adjust_title_weights(title_changes):
+    """
+    Updates the strength of every tournament of players whose title changed (e.g. by profile
+    enrichment, which usually happens after their games were saved).
+    `title_changes` maps player ids to (old title, new title). Must run in a transaction.
+    Returns the ids of the tournaments whose strength changed.
+    """
+    deltas = {
+        player_id: get_title_weight(new_title) - get_title_weight(old_title)
+        for player_id, (old_title, new_title) in title_changes.items()
+    }
+    deltas = {player_id: delta for player_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+
+    tournament_deltas = collections.Counter()
+    entries = Tournament.players.through.objects.filter(player_id__in=deltas).values_list('tournament_id', 'player_id')
+    for tournament_id, player_id in entries:
+        tournament_deltas[tournament_id] += deltas[player_id]
+
+    tournaments = _lock_tournaments(tournament_deltas)
+    for tournament in tournaments:
+        tournament.title_weight_sum += tournament_deltas[tournament.id]
+        tournament.strength = tournament_strength(tournament.title_weight_sum, tournament.player_count, tournament.game_count)
+    Tournament.objects.bulk_update(tournaments, COUNTER_FIELDS)
+    return list(tournament_deltas)